@@ -0,0 +1,241 @@
+from quart import Blueprint, request, jsonify, g, Response
+from app.api.validation import parse_recommend_args, validate_behavior, parse_items, request_budget
+from app.api.responses import recommendation_body, grouped_recommendation_body, fallback_header, json_response
+from app.services.service_loader import services, ServicesUnavailable
+from config.settings import METRICS_CONFIG, ADMISSION_CONFIG, STARTUP_CONFIG
+from utils.admission import Overloaded, set_deadline, reset_deadline
+from utils.metrics import registry, start_request_timing, finish_request_timing, server_timing_header
+import logging
+
+logger = logging.getLogger(__name__)
+async_recommend_bp = Blueprint('async_recommend', __name__)
+
+# 不需要推荐服务的接口，服务加载期间也可以访问
+LIGHTWEIGHT_ENDPOINTS = {'async_recommend.metrics', 'async_recommend.health', 'async_recommend.ready'}
+
+def _service():
+    """当前进程的异步推荐服务"""
+    return services.async_service()
+
+@async_recommend_bp.before_request
+async def start_timing():
+    """开始收集本次请求的各阶段耗时，并按请求头或默认预算设置截止时间"""
+    g.timing_token = start_request_timing()
+    g.deadline_token = set_deadline(request_budget(request.headers))
+
+@async_recommend_bp.before_request
+async def require_services():
+    """服务尚未加载完成时，除健康检查和监控指标外的接口返回 503（加载在 before_serving 中开始，不阻塞事件循环）"""
+    if request.endpoint not in LIGHTWEIGHT_ENDPOINTS and not services.ready:
+        status = services.status()
+        raise ServicesUnavailable(f"{status['state']} (phase: {status['phase']}, error: {status['error']})")
+
+@async_recommend_bp.errorhandler(ServicesUnavailable)
+async def services_unavailable(e):
+    logger.warning(f"Rejecting request while services are unavailable: {str(e)}")
+    failed = services.state == services.FAILED
+    return jsonify({
+        'code': 503,
+        'message': 'Service loading failed, please retry later' if failed else 'Service is starting, please retry later'
+    }), 503, {'Retry-After': str(STARTUP_CONFIG['retry_after'])}
+
+@async_recommend_bp.after_request
+async def add_server_timing(response):
+    """在响应头中返回各阶段耗时"""
+    token = g.pop('timing_token', None)
+    if token is not None:
+        timings = finish_request_timing(token)
+        if METRICS_CONFIG['server_timing'] and timings:
+            response.headers['Server-Timing'] = server_timing_header(timings)
+    deadline_token = g.pop('deadline_token', None)
+    if deadline_token is not None:
+        reset_deadline(deadline_token)
+    return response
+
+@async_recommend_bp.route('/metrics', methods=['GET'])
+async def metrics():
+    """以 Prometheus 文本格式导出监控指标"""
+    if not METRICS_CONFIG['enabled']:
+        return jsonify({
+            'code': 404,
+            'message': 'Metrics disabled'
+        }), 404
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+@async_recommend_bp.route('/health', methods=['GET'])
+async def health():
+    """存活检查（同 routes.health）"""
+    if services.gave_up:
+        return jsonify({
+            'code': 503,
+            'message': 'Service loading failed',
+            'data': {'status': 'failed', 'error': services.error}
+        }), 503, {'Retry-After': str(STARTUP_CONFIG['retry_after'])}
+    return jsonify({
+        'code': 200,
+        'message': 'Success',
+        'data': {'status': 'ok'}
+    })
+
+@async_recommend_bp.route('/ready', methods=['GET'])
+async def ready():
+    """就绪检查（同 routes.ready）"""
+    status = services.status()
+    if not services.ready:
+        return jsonify({
+            'code': 503,
+            'message': 'Service is not ready',
+            'data': status
+        }), 503, {'Retry-After': str(STARTUP_CONFIG['retry_after'])}
+    return jsonify({
+        'code': 200,
+        'message': 'Success',
+        'data': status
+    })
+
+@async_recommend_bp.route('/recommend', methods=['GET'])
+async def get_recommendations():
+    """获取推荐内容（异步版本，参数与返回格式同 routes.get_recommendations）"""
+    try:
+        # 获取并验证请求参数
+        params, error = parse_recommend_args(request.args)
+        if error:
+            return jsonify({
+                'code': 400,
+                'message': error
+            }), 400
+        
+        # 获取推荐结果，未指定 fields 时直接拼接原始文档
+        fields = params.pop('fields')
+        cursor = params.pop('cursor')
+        paginate = params.pop('paginate')
+        recommend_types = params.pop('recommend_types')
+        if recommend_types is not None:
+            # 多种类型：用户状态和查询向量只计算一次，结果按类型分组
+            ranked_by_type = await _service().rank_many(
+                params['user_id'], recommend_types, params['limit'], diversity_lambda=params['diversity_lambda'])
+            response = json_response(
+                grouped_recommendation_body(ranked_by_type, fields),
+                Response,
+                accept_encoding=request.headers.get('Accept-Encoding')
+            )
+            fallback = fallback_header(ranked_by_type)
+            if fallback:
+                response.headers['X-Recommendation-Fallback'] = fallback
+            return response
+        
+        next_cursor = None
+        if cursor is not None:
+            # 翻页：直接从缓存的排序结果中读取
+            ranked, next_cursor = _service().service.next_page(cursor, params['limit'])
+            if ranked is None:
+                return jsonify({
+                    'code': 410,
+                    'message': 'Cursor expired or invalid'
+                }), 410
+        elif paginate:
+            ranked, next_cursor = await _service().start_feed(**params)
+        else:
+            ranked = await _service().rank_candidates(**params)
+        
+        response = json_response(
+            recommendation_body(ranked, fields, next_cursor),
+            Response,
+            accept_encoding=request.headers.get('Accept-Encoding')
+        )
+        if ranked.get('fallback'):
+            # 过载降级的结果
+            response.headers['X-Recommendation-Fallback'] = ranked['fallback']
+        return response
+    
+    except Overloaded as e:
+        logger.warning(f"Rejecting recommendation request: {str(e)}")
+        return jsonify({
+            'code': 503,
+            'message': 'Service overloaded, please retry later'
+        }), 503, {'Retry-After': str(ADMISSION_CONFIG['retry_after'])}
+    
+    except Exception as e:
+        logger.error(f"Error getting recommendations: {str(e)}")
+        return jsonify({
+            'code': 500,
+            'message': 'Internal server error'
+        }), 500
+
+@async_recommend_bp.route('/behavior', methods=['POST'])
+async def track_behavior():
+    """记录用户行为（异步版本，参数与返回格式同 routes.track_behavior）"""
+    try:
+        data = await request.get_json()
+        
+        error = validate_behavior(data)
+        if error:
+            return jsonify({
+                'code': 400,
+                'message': error
+            }), 400
+        
+        # 记录用户行为
+        behavior = await _service().add_user_behavior(
+            user_id=data['user_id'],
+            item_id=data['item_id'],
+            action=data['action'],
+            description=data.get('description'),
+            source=data.get('source'),
+            item_type=data.get('item_type')
+        )
+        
+        if behavior:
+            return jsonify({
+                'code': 200,
+                'message': 'Success',
+                'data': {
+                    'behavior_id': behavior['id'],
+                    'timestamp': behavior['timestamp']
+                }
+            })
+        else:
+            return jsonify({
+                'code': 500,
+                'message': 'Failed to record behavior'
+            }), 500
+    
+    except Exception as e:
+        logger.error(f"Error tracking behavior: {str(e)}")
+        return jsonify({
+            'code': 500,
+            'message': 'Internal server error'
+        }), 500
+
+@async_recommend_bp.route('/items', methods=['POST'])
+async def add_items():
+    """增量导入条目（异步版本，参数与返回格式同 routes.add_items）"""
+    try:
+        params, error = parse_items(await request.get_json())
+        if error:
+            return jsonify({
+                'code': 400,
+                'message': error
+            }), 400
+        
+        data_type, items = params
+        result = await _service().add_items(items, data_type)
+        return jsonify({
+            'code': 200,
+            'message': 'Success',
+            'data': result
+        })
+    
+    except Overloaded as e:
+        logger.warning(f"Rejecting item ingestion: {str(e)}")
+        return jsonify({
+            'code': 503,
+            'message': 'Service overloaded, please retry later'
+        }), 503, {'Retry-After': str(ADMISSION_CONFIG['retry_after'])}
+    
+    except Exception as e:
+        logger.error(f"Error adding items: {str(e)}")
+        return jsonify({
+            'code': 500,
+            'message': 'Internal server error'
+        }), 500
\ No newline at end of file
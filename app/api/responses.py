@@ -0,0 +1,130 @@
+import gzip
+from typing import Any, Dict, List, Optional
+
+from config.settings import RESPONSE_CONFIG
+from utils.serialization import dumps
+
+try:
+    import brotli
+except ImportError:  # brotli 为可选依赖，未安装时只提供 gzip
+    brotli = None
+
+_SUCCESS_PREFIX = b'{"code":200,"message":"Success","data":['
+_SUCCESS_SUFFIX = b']}'
+
+
+def select_fields(items: List[Dict[str, Any]], fields: List[str]) -> List[Dict[str, Any]]:
+    """只保留指定字段，条目中不存在的字段直接忽略"""
+    return [{field: item[field] for field in fields if field in item} for item in items]
+
+
+def recommendation_body(ranked: Dict[str, Any], fields: Optional[List[str]] = None,
+                        next_cursor: Optional[str] = None) -> bytes:
+    """生成推荐接口的响应体
+
+    未指定 fields 时直接拼接向量库中保存的原始 JSON 文档，不再对每个条目重新序列化；
+    指定 fields 时只序列化所需字段。
+
+    Args:
+        ranked (Dict[str, Any]): RecommendationService.rank_candidates 的返回值
+        fields (List[str], optional): 需要返回的字段
+        next_cursor (str, optional): 分页请求的下一页游标，设置时写入 next_cursor 字段
+
+    Returns:
+        bytes: 与 {"code": 200, "message": "Success", "data": [...]} 等价的 JSON
+    """
+    if fields:
+        payload = {'code': 200, 'message': 'Success', 'data': select_fields(ranked['items'], fields)}
+        if next_cursor is not None:
+            payload['next_cursor'] = next_cursor
+        return dumps(payload)
+    documents = [doc if isinstance(doc, bytes) else doc.encode('utf-8') for doc in ranked['documents']]
+    suffix = _SUCCESS_SUFFIX
+    if next_cursor is not None:
+        suffix = b'],"next_cursor":' + dumps(next_cursor) + b'}'
+    return _SUCCESS_PREFIX + b','.join(documents) + suffix
+
+
+def grouped_recommendation_body(ranked_by_type: Dict[str, Dict[str, Any]], fields: Optional[List[str]] = None) -> bytes:
+    """生成多类型推荐的响应体，data 为推荐类型到条目列表的映射
+
+    与 recommendation_body 相同，未指定 fields 时直接拼接原始 JSON 文档。
+
+    Args:
+        ranked_by_type (Dict[str, Dict[str, Any]]): RecommendationService.rank_many 的返回值
+        fields (List[str], optional): 需要返回的字段
+
+    Returns:
+        bytes: 与 {"code": 200, "message": "Success", "data": {"news": [...], ...}} 等价的 JSON
+    """
+    if fields:
+        return dumps({
+            'code': 200,
+            'message': 'Success',
+            'data': {t: select_fields(ranked['items'], fields) for t, ranked in ranked_by_type.items()}
+        })
+    groups = []
+    for recommend_type, ranked in ranked_by_type.items():
+        documents = [doc if isinstance(doc, bytes) else doc.encode('utf-8') for doc in ranked['documents']]
+        groups.append(dumps(recommend_type) + b':[' + b','.join(documents) + b']')
+    return b'{"code":200,"message":"Success","data":{' + b','.join(groups) + b'}}'
+
+
+def fallback_header(ranked_by_type: Dict[str, Dict[str, Any]]) -> Optional[str]:
+    """多类型推荐中降级的类型，格式为 "news=precomputed, weibo=default"，没有降级时返回 None"""
+    parts = [f"{t}={ranked['fallback']}" for t, ranked in ranked_by_type.items() if ranked.get('fallback')]
+    return ', '.join(parts) or None
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """根据 Accept-Encoding 选择压缩方式，优先 br，其次 gzip，都不接受时返回 None"""
+    if not accept_encoding:
+        return None
+    accepted = {}
+    for part in accept_encoding.split(','):
+        name, _, params = part.partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+
+    supported = (['br'] if brotli is not None else []) + ['gzip']
+    for encoding in supported:
+        if accepted.get(encoding, accepted.get('*', 0)) > 0:
+            return encoding
+    return None
+
+
+def compress(body: bytes, encoding: Optional[str]) -> bytes:
+    """按指定方式压缩响应体"""
+    if encoding == 'br':
+        return brotli.compress(body, quality=RESPONSE_CONFIG['brotli_quality'])
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=RESPONSE_CONFIG['gzip_level'])
+    return body
+
+
+def json_response(body: bytes, response_class, accept_encoding: Optional[str] = None, status: int = 200):
+    """构造 JSON 响应，响应体超过 compress_min_size 且客户端支持时压缩
+
+    Args:
+        body (bytes): 已序列化的 JSON
+        response_class: Flask 或 Quart 的 Response 类
+        accept_encoding (str, optional): 请求的 Accept-Encoding 头
+        status (int): 状态码
+
+    Returns:
+        Response: 响应对象
+    """
+    headers = {'Vary': 'Accept-Encoding'}
+    encoding = None
+    if len(body) >= RESPONSE_CONFIG['compress_min_size']:
+        encoding = negotiate_encoding(accept_encoding)
+    if encoding is not None:
+        body = compress(body, encoding)
+        headers['Content-Encoding'] = encoding
+    return response_class(body, status=status, headers=headers, mimetype='application/json')
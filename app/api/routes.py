@@ -1,17 +1,100 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, g, Response
 from flasgger import swag_from
-from app.services.recommendation_service import RecommendationService
-from app.services.database_service import DatabaseService
-from config.settings import CONTENT_TYPES, RECOMMENDATION_CONFIG
+from app.services.service_loader import services, ServicesUnavailable
+from app.api.validation import parse_recommend_args, validate_behavior, parse_items, request_budget
+from app.api.responses import recommendation_body, grouped_recommendation_body, fallback_header, json_response
+from config.settings import CONTENT_TYPES, RECOMMENDATION_CONFIG, METRICS_CONFIG, ADMISSION_CONFIG, STARTUP_CONFIG
+from utils.admission import Overloaded, set_deadline, reset_deadline
+from utils.metrics import registry, start_request_timing, finish_request_timing, server_timing_header
 import logging
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 recommend_bp = Blueprint('recommend', __name__)
 
-# 初始化服务
-db_service = DatabaseService()
-recommendation_service = RecommendationService(db_service)
+# 不需要推荐服务的接口，服务加载期间也可以访问
+LIGHTWEIGHT_ENDPOINTS = {'recommend.metrics', 'recommend.health', 'recommend.ready'}
+
+@recommend_bp.before_request
+def start_timing():
+    """开始收集本次请求的各阶段耗时，并按请求头或默认预算设置截止时间"""
+    g.timing_token = start_request_timing()
+    g.deadline_token = set_deadline(request_budget(request.headers))
+
+@recommend_bp.before_request
+def require_services():
+    """服务尚未加载完成时，除健康检查和监控指标外的接口返回 503"""
+    if request.endpoint not in LIGHTWEIGHT_ENDPOINTS:
+        services.get()
+
+@recommend_bp.errorhandler(ServicesUnavailable)
+def services_unavailable(e):
+    logger.warning(f"Rejecting request while services are unavailable: {str(e)}")
+    failed = services.state == services.FAILED
+    return jsonify({
+        'code': 503,
+        'message': 'Service loading failed, please retry later' if failed else 'Service is starting, please retry later'
+    }), 503, {'Retry-After': str(STARTUP_CONFIG['retry_after'])}
+
+@recommend_bp.after_request
+def add_server_timing(response):
+    """在响应头中返回各阶段耗时"""
+    token = g.pop('timing_token', None)
+    if token is not None:
+        timings = finish_request_timing(token)
+        if METRICS_CONFIG['server_timing'] and timings:
+            response.headers['Server-Timing'] = server_timing_header(timings)
+    deadline_token = g.pop('deadline_token', None)
+    if deadline_token is not None:
+        reset_deadline(deadline_token)
+    return response
+
+@recommend_bp.teardown_request
+def release_session(exc):
+    """归还当前请求线程的数据库连接"""
+    if services.ready:
+        services.db_service.close()
+
+@recommend_bp.route('/metrics', methods=['GET'])
+def metrics():
+    """以 Prometheus 文本格式导出监控指标"""
+    if not METRICS_CONFIG['enabled']:
+        return jsonify({
+            'code': 404,
+            'message': 'Metrics disabled'
+        }), 404
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+@recommend_bp.route('/health', methods=['GET'])
+def health():
+    """存活检查：进程能够处理请求即返回 200，不依赖模型和向量库；服务加载失败且重试次数用完时返回 503"""
+    if services.gave_up:
+        return jsonify({
+            'code': 503,
+            'message': 'Service loading failed',
+            'data': {'status': 'failed', 'error': services.error}
+        }), 503, {'Retry-After': str(STARTUP_CONFIG['retry_after'])}
+    return jsonify({
+        'code': 200,
+        'message': 'Success',
+        'data': {'status': 'ok'}
+    })
+
+@recommend_bp.route('/ready', methods=['GET'])
+def ready():
+    """就绪检查：服务加载完成时返回 200，否则返回 503 和当前加载阶段、各阶段耗时"""
+    status = services.status()
+    if not services.ready:
+        return jsonify({
+            'code': 503,
+            'message': 'Service is not ready',
+            'data': status
+        }), 503, {'Retry-After': str(STARTUP_CONFIG['retry_after'])}
+    return jsonify({
+        'code': 200,
+        'message': 'Success',
+        'data': status
+    })
 
 @recommend_bp.route('/recommend', methods=['GET'])
 @swag_from({
@@ -31,8 +114,9 @@ recommendation_service = RecommendationService(db_service)
             'in': 'query',
             'type': 'string',
             'required': True,
-            'description': '推荐类型',
-            'enum': list(CONTENT_TYPES.keys())
+            'description': '推荐类型。传入逗号分隔的多个类型（如 academic,news）或 all 时一次返回多种类型，'
+                           'data 为类型到条目列表的映射，limit 为每种类型的数量（不支持分页）',
+            'example': 'academic'
         },
         {
             'name': 'limit',
@@ -43,6 +127,43 @@ recommendation_service = RecommendationService(db_service)
             'default': RECOMMENDATION_CONFIG['default_results'],
             'minimum': RECOMMENDATION_CONFIG['min_results'],
             'maximum': RECOMMENDATION_CONFIG['max_results']
+        },
+        {
+            'name': 'diversity_lambda',
+            'in': 'query',
+            'type': 'number',
+            'required': False,
+            'description': 'MMR 多样化参数（0~1），越小结果越多样，1 表示不做多样化',
+            'minimum': 0,
+            'maximum': 1
+        },
+        {
+            'name': 'fields',
+            'in': 'query',
+            'type': 'string',
+            'required': False,
+            'description': '逗号分隔的返回字段（如 id,title,date），不指定时返回完整条目'
+        },
+        {
+            'name': 'paginate',
+            'in': 'query',
+            'type': 'boolean',
+            'required': False,
+            'description': '开启分页：排序结果在服务端缓存，响应中返回 next_cursor'
+        },
+        {
+            'name': 'cursor',
+            'in': 'query',
+            'type': 'string',
+            'required': False,
+            'description': '上一页返回的 next_cursor，翻页时只需要 cursor 和 limit'
+        },
+        {
+            'name': ADMISSION_CONFIG['deadline_header'],
+            'in': 'header',
+            'type': 'integer',
+            'required': False,
+            'description': '调用方剩余的时间预算（毫秒），服务端各阶段的等待不会超过该时间'
         }
     ],
     'responses': {
@@ -61,9 +182,14 @@ recommendation_service = RecommendationService(db_service)
                     },
                     'data': {
                         'type': 'array',
+                        'description': '推荐条目；请求多种类型时为推荐类型到条目列表的映射',
                         'items': {
                             '$ref': '#/definitions/Content'
                         }
+                    },
+                    'next_cursor': {
+                        'type': 'string',
+                        'description': '下一页游标，仅分页请求返回，没有更多结果时不返回'
                     }
                 }
             }
@@ -74,6 +200,19 @@ recommendation_service = RecommendationService(db_service)
                 '$ref': '#/definitions/Error'
             }
         },
+        '410': {
+            'description': '分页游标无效或已过期，需要重新发起分页请求',
+            'schema': {
+                '$ref': '#/definitions/Error'
+            }
+        },
+        '503': {
+            'description': '服务过载且没有可用的降级结果，按 Retry-After 重试（返回降级结果时状态码为 200，'
+                           '并带有 X-Recommendation-Fallback 响应头）',
+            'schema': {
+                '$ref': '#/definitions/Error'
+            }
+        },
         '500': {
             'description': '服务器内部错误',
             'schema': {
@@ -85,43 +224,64 @@ recommendation_service = RecommendationService(db_service)
 def get_recommendations():
     """获取推荐内容"""
     try:
-        # 获取请求参数
-        user_id = request.args.get('user_id')
-        recommend_type = request.args.get('recommend_type')
-        limit = request.args.get('limit', RECOMMENDATION_CONFIG['default_results'], type=int)
-        
-        # 参数验证
-        if not user_id or not recommend_type:
-            return jsonify({
-                'code': 400,
-                'message': 'Missing required parameters'
-            }), 400
-            
-        if recommend_type not in CONTENT_TYPES:
-            return jsonify({
-                'code': 400,
-                'message': f'Invalid recommend_type. Must be one of: {", ".join(CONTENT_TYPES.keys())}'
-            }), 400
-            
-        if not RECOMMENDATION_CONFIG['min_results'] <= limit <= RECOMMENDATION_CONFIG['max_results']:
+        # 获取并验证请求参数
+        params, error = parse_recommend_args(request.args)
+        if error:
             return jsonify({
                 'code': 400,
-                'message': f'Limit must be between {RECOMMENDATION_CONFIG["min_results"]} and {RECOMMENDATION_CONFIG["max_results"]}'
+                'message': error
             }), 400
         
-        # 获取推荐结果
-        recommendations = recommendation_service.get_recommendations(
-            user_id=user_id,
-            recommend_type=recommend_type,
-            limit=limit
-        )
+        # 获取推荐结果，未指定 fields 时直接拼接原始文档
+        fields = params.pop('fields')
+        cursor = params.pop('cursor')
+        paginate = params.pop('paginate')
+        recommend_types = params.pop('recommend_types')
+        if recommend_types is not None:
+            # 多种类型：用户状态和查询向量只计算一次，结果按类型分组
+            ranked_by_type = services.recommendation_service.rank_many(
+                params['user_id'], recommend_types, params['limit'], diversity_lambda=params['diversity_lambda'])
+            response = json_response(
+                grouped_recommendation_body(ranked_by_type, fields),
+                Response,
+                accept_encoding=request.headers.get('Accept-Encoding')
+            )
+            fallback = fallback_header(ranked_by_type)
+            if fallback:
+                response.headers['X-Recommendation-Fallback'] = fallback
+            return response
         
-        return jsonify({
-            'code': 200,
-            'message': 'Success',
-            'data': recommendations
-        })
+        next_cursor = None
+        if cursor is not None:
+            # 翻页：直接从缓存的排序结果中读取
+            ranked, next_cursor = services.recommendation_service.next_page(cursor, params['limit'])
+            if ranked is None:
+                return jsonify({
+                    'code': 410,
+                    'message': 'Cursor expired or invalid'
+                }), 410
+        elif paginate:
+            ranked, next_cursor = services.recommendation_service.start_feed(**params)
+        else:
+            ranked = services.recommendation_service.rank_candidates(**params)
         
+        response = json_response(
+            recommendation_body(ranked, fields, next_cursor),
+            Response,
+            accept_encoding=request.headers.get('Accept-Encoding')
+        )
+        if ranked.get('fallback'):
+            # 过载降级的结果
+            response.headers['X-Recommendation-Fallback'] = ranked['fallback']
+        return response
+    
+    except Overloaded as e:
+        logger.warning(f"Rejecting recommendation request: {str(e)}")
+        return jsonify({
+            'code': 503,
+            'message': 'Service overloaded, please retry later'
+        }), 503, {'Retry-After': str(ADMISSION_CONFIG['retry_after'])}
+    
     except Exception as e:
         logger.error(f"Error getting recommendations: {str(e)}")
         return jsonify({
@@ -169,6 +329,12 @@ def get_recommendations():
                         'type': 'string',
                         'description': '行为来源（可选），如 web、app 等',
                         'example': 'web'
+                    },
+                    'item_type': {
+                        'type': 'string',
+                        'description': '内容类型（可选），不同类型的内容ID可能相同，传入后已看过滤和热度统计只作用于该类型的内容，不传时不计入热门列表',
+                        'enum': list(CONTENT_TYPES.keys()),
+                        'example': 'news'
                     }
                 }
             },
@@ -269,30 +435,21 @@ def track_behavior():
     try:
         data = request.get_json()
         
-        # 验证必需字段
-        required_fields = ['user_id', 'item_id', 'action']
-        for field in required_fields:
-            if field not in data:
-                return jsonify({
-                    'code': 400,
-                    'message': f'Missing required field: {field}'
-                }), 400
-        
-        # 验证行为类型
-        valid_actions = ['view', 'like', 'share', 'comment', 'save']
-        if data['action'] not in valid_actions:
+        error = validate_behavior(data)
+        if error:
             return jsonify({
                 'code': 400,
-                'message': f'Invalid action. Must be one of: {", ".join(valid_actions)}'
+                'message': error
             }), 400
         
         # 记录用户行为
-        behavior = db_service.add_user_behavior(
+        behavior = services.db_service.add_user_behavior(
             user_id=data['user_id'],
             item_id=data['item_id'],
             action=data['action'],
             description=data.get('description'),
-            source=data.get('source')
+            source=data.get('source'),
+            item_type=data.get('item_type')
         )
         
         if behavior:
@@ -309,9 +466,144 @@ def track_behavior():
                 'code': 500,
                 'message': 'Failed to record behavior'
             }), 500
-            
+    
     except Exception as e:
         logger.error(f"Error tracking behavior: {str(e)}")
+        return jsonify({
+            'code': 500,
+            'message': 'Internal server error'
+        }), 500
+
+@recommend_bp.route('/items', methods=['POST'])
+@swag_from({
+    'tags': ['items'],
+    'summary': '增量导入条目',
+    'description': '导入一个或多个同类型的新条目，写入向量库和本地索引后立即可以被推荐，已存在的条目会被跳过',
+    'parameters': [
+        {
+            'name': 'body',
+            'in': 'body',
+            'required': True,
+            'description': '条目数据',
+            'schema': {
+                'type': 'object',
+                'required': ['type', 'items'],
+                'properties': {
+                    'type': {
+                        'type': 'string',
+                        'description': '内容类型',
+                        'enum': list(CONTENT_TYPES.keys()),
+                        'example': 'news'
+                    },
+                    'items': {
+                        'type': 'array',
+                        'description': '条目列表（也可以是单个条目对象），字段与对应数据文件中的条目一致',
+                        'items': {
+                            'type': 'object'
+                        },
+                        'example': [
+                            {
+                                'title': '国家语委发布年度语言生活状况报告',
+                                'content': '报告显示……',
+                                'date': '2024-01-05'
+                            }
+                        ]
+                    }
+                }
+            }
+        }
+    ],
+    'responses': {
+        '200': {
+            'description': '导入完成',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'code': {
+                        'type': 'integer',
+                        'example': 200
+                    },
+                    'message': {
+                        'type': 'string',
+                        'example': 'Success'
+                    },
+                    'data': {
+                        'type': 'object',
+                        'properties': {
+                            'ids': {
+                                'type': 'array',
+                                'items': {
+                                    'type': 'string'
+                                },
+                                'description': '与请求中的条目一一对应的条目ID'
+                            },
+                            'added': {
+                                'type': 'integer',
+                                'description': '新增的条目数量'
+                            },
+                            'skipped': {
+                                'type': 'integer',
+                                'description': '已存在而跳过的条目数量'
+                            },
+                            'deferred': {
+                                'type': 'integer',
+                                'description': '超过请求截止时间而未导入的条目数量，重新提交即可（已导入的条目会被跳过）'
+                            }
+                        }
+                    }
+                }
+            }
+        },
+        '400': {
+            'description': '请求参数错误',
+            'schema': {
+                '$ref': '#/definitions/Error'
+            }
+        },
+        '503': {
+            'description': '服务过载，按 Retry-After 重试',
+            'schema': {
+                '$ref': '#/definitions/Error'
+            }
+        },
+        '500': {
+            'description': '服务器内部错误',
+            'schema': {
+                '$ref': '#/definitions/Error'
+            }
+        }
+    }
+})
+def add_items():
+    """增量导入条目"""
+    try:
+        params, error = parse_items(request.get_json())
+        if error:
+            return jsonify({
+                'code': 400,
+                'message': error
+            }), 400
+        
+        # 导入有单独的准入名额，不占用推荐请求的名额；分批处理，超过截止时间后剩余条目计入 deferred
+        data_type, items = params
+        recommendation_service = services.recommendation_service
+        with recommendation_service.admit_ingest():
+            result = recommendation_service.chroma_service.add_items(items, data_type)
+        return jsonify({
+            'code': 200,
+            'message': 'Success',
+            'data': result
+        })
+    
+    except Overloaded as e:
+        logger.warning(f"Rejecting item ingestion: {str(e)}")
+        return jsonify({
+            'code': 503,
+            'message': 'Service overloaded, please retry later'
+        }), 503, {'Retry-After': str(ADMISSION_CONFIG['retry_after'])}
+    
+    except Exception as e:
+        logger.error(f"Error adding items: {str(e)}")
         return jsonify({
             'code': 500,
             'message': 'Internal server error'
@@ -0,0 +1,143 @@
+from config.settings import CONTENT_TYPES, RECOMMENDATION_CONFIG, RESPONSE_CONFIG, ADMISSION_CONFIG, INGEST_CONFIG
+
+VALID_ACTIONS = ['view', 'like', 'share', 'comment', 'save']
+
+
+def _get_arg(args, name: str, arg_type=str, default=None):
+    """从查询参数中读取并转换类型，转换失败时返回 default（与 werkzeug MultiDict.get 行为一致）"""
+    value = args.get(name)
+    if value is None:
+        return default
+    try:
+        return arg_type(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def request_budget(headers) -> float:
+    """读取客户端传入的剩余时间预算（秒）
+
+    请求头缺失或无效时使用默认预算，超过 max_budget 时按 max_budget 处理。
+    """
+    budget_ms = _get_arg(headers, ADMISSION_CONFIG['deadline_header'], float)
+    if budget_ms is None or budget_ms <= 0:
+        return ADMISSION_CONFIG['request_budget']
+    return min(budget_ms / 1000, ADMISSION_CONFIG['max_budget'])
+
+
+def parse_recommend_args(args) -> tuple:
+    """解析并校验推荐接口的查询参数
+
+    Args:
+        args: 请求的查询参数（Flask / Quart 的 request.args）
+
+    Returns:
+        tuple: (参数字典, 错误信息)，校验通过时错误信息为 None
+    """
+    user_id = args.get('user_id')
+    recommend_type = args.get('recommend_type')
+    limit = _get_arg(args, 'limit', int, RECOMMENDATION_CONFIG['default_results'])
+    diversity_lambda = _get_arg(args, 'diversity_lambda', float)
+    fields = [field.strip() for field in (args.get('fields') or '').split(',') if field.strip()] or None
+    cursor = args.get('cursor') or None
+    paginate = (args.get('paginate') or '').lower() in ('1', 'true', 'yes')
+
+    # 参数验证（带游标的翻页请求只需要 cursor）
+    if cursor is None and (not user_id or not recommend_type):
+        return None, 'Missing required parameters'
+
+    # 逗号分隔的多个类型或 all：一次请求推荐多种类型，结果按类型分组
+    recommend_types = None
+    if cursor is None and (recommend_type == 'all' or ',' in recommend_type):
+        if recommend_type == 'all':
+            recommend_types = list(CONTENT_TYPES)
+        else:
+            recommend_types = list(dict.fromkeys(t.strip() for t in recommend_type.split(',') if t.strip()))
+        recommend_type = None
+        if not recommend_types or any(t not in CONTENT_TYPES for t in recommend_types):
+            return None, f'Invalid recommend_type. Must be "all" or one or more of: {", ".join(CONTENT_TYPES.keys())}'
+        if paginate:
+            return None, 'paginate is not supported for multiple recommend types'
+
+    if cursor is None and recommend_types is None and recommend_type not in CONTENT_TYPES:
+        return None, f'Invalid recommend_type. Must be one of: {", ".join(CONTENT_TYPES.keys())}'
+
+    if not RECOMMENDATION_CONFIG['min_results'] <= limit <= RECOMMENDATION_CONFIG['max_results']:
+        return None, f'Limit must be between {RECOMMENDATION_CONFIG["min_results"]} and {RECOMMENDATION_CONFIG["max_results"]}'
+
+    if diversity_lambda is not None and not 0 <= diversity_lambda <= 1:
+        return None, 'diversity_lambda must be between 0 and 1'
+
+    if fields is not None and len(fields) > RESPONSE_CONFIG['max_fields']:
+        return None, f'At most {RESPONSE_CONFIG["max_fields"]} fields can be selected'
+
+    return {
+        'user_id': user_id,
+        'recommend_type': recommend_type,
+        'recommend_types': recommend_types,
+        'limit': limit,
+        'diversity_lambda': diversity_lambda,
+        'fields': fields,
+        'cursor': cursor,
+        'paginate': paginate
+    }, None
+
+
+def validate_behavior(data) -> str:
+    """校验用户行为数据
+
+    Args:
+        data (dict): 请求体
+
+    Returns:
+        str: 错误信息，校验通过时返回 None
+    """
+    if not isinstance(data, dict):
+        return 'Request body must be a JSON object'
+
+    # 验证必需字段
+    required_fields = ['user_id', 'item_id', 'action']
+    for field in required_fields:
+        if field not in data:
+            return f'Missing required field: {field}'
+
+    # 验证行为类型
+    if data['action'] not in VALID_ACTIONS:
+        return f'Invalid action. Must be one of: {", ".join(VALID_ACTIONS)}'
+
+    # 内容类型可选，用于热度统计
+    if data.get('item_type') is not None and data['item_type'] not in CONTENT_TYPES:
+        return f'Invalid item_type. Must be one of: {", ".join(CONTENT_TYPES.keys())}'
+
+    return None
+
+
+def parse_items(data) -> tuple:
+    """解析并校验条目导入请求
+
+    请求体为 {"type": "news", "items": [...]}，items 也可以是单个条目对象。
+
+    Args:
+        data (dict): 请求体
+
+    Returns:
+        tuple: ((数据类型, 条目列表), 错误信息)，校验通过时错误信息为 None
+    """
+    if not isinstance(data, dict):
+        return None, 'Request body must be a JSON object'
+
+    data_type = data.get('type')
+    if data_type not in CONTENT_TYPES:
+        return None, f'Invalid type. Must be one of: {", ".join(CONTENT_TYPES.keys())}'
+
+    items = data.get('items')
+    if isinstance(items, dict):
+        items = [items]
+    if not isinstance(items, list) or not items:
+        return None, 'items must be a non-empty list of objects'
+    if not all(isinstance(item, dict) and item for item in items):
+        return None, 'Each item must be a non-empty JSON object'
+    if len(items) > INGEST_CONFIG['max_items']:
+        return None, f'At most {INGEST_CONFIG["max_items"]} items can be added per request'
+
+    return (data_type, items), None
@@ -0,0 +1,43 @@
+from quart import Quart
+from app.api.async_routes import async_recommend_bp
+from app.services.service_loader import services
+from config.settings import STARTUP_CONFIG
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+def create_asgi_app(initialize: bool = None, preload: bool = None):
+    """创建 ASGI 应用
+    
+    与 run.py 中的 Flask 应用提供相同的接口，但视图是协程：
+    数据库和向量库调用被并发等待，模型推理在有界线程池中执行，
+    单个进程可以同时处理更多请求而不需要增加请求线程。
+    
+    用法：hypercorn "app.asgi:create_asgi_app()" --bind 0.0.0.0:8888
+    
+    Args:
+        initialize (bool, optional): 加载服务时是否导入数据文件，默认使用 STARTUP_CONFIG['initialize_data']
+        preload (bool, optional): 是否在开始接受请求前加载完服务，默认使用 STARTUP_CONFIG['preload']；
+            为 False 时服务在后台加载，期间 /health 可以访问，其他接口返回 503
+    """
+    app = Quart(__name__)
+    preload = STARTUP_CONFIG['preload'] if preload is None else preload
+    
+    @app.before_serving
+    async def load_services():
+        if preload:
+            # 在线程中加载，避免阻塞事件循环
+            await asyncio.get_running_loop().run_in_executor(None, services.load, initialize)
+            services.async_service()
+        else:
+            services.start(initialize)
+    
+    @app.after_serving
+    async def shutdown():
+        services.shutdown()
+    
+    # 注册蓝图
+    app.register_blueprint(async_recommend_bp, url_prefix='/api/v1')
+    
+    return app
\ No newline at end of file
@@ -0,0 +1,41 @@
+from sqlalchemy import Column, Integer, String, LargeBinary, DateTime, func
+from app.models.user_behavior import Base
+from utils.serialization import dumps, loads
+import zlib
+
+class PrecomputedRecommendation(Base):
+    """离线预计算的推荐结果（每个用户每种类型一行）"""
+    __tablename__ = 'precomputed_recommendation'
+    
+    user_id = Column(String(50), primary_key=True)
+    recommend_type = Column(String(20), primary_key=True)
+    payload = Column(LargeBinary, nullable=False)  # zlib 压缩的 JSON：{"ids": [...], "scores": [...]}
+    item_count = Column(Integer, nullable=False, default=0)
+    last_event_at = Column(DateTime, nullable=True)  # 计算时用户最新一条行为的时间
+    computed_at = Column(DateTime, nullable=True, default=func.now())
+    
+    @classmethod
+    def create(cls, user_id: str, recommend_type: str, ids: list, scores: list, last_event_at=None,
+               computed_at=None):
+        """由排序结果创建记录，ids 为向量库ID，scores 为对应的排序得分"""
+        payload = zlib.compress(dumps({'ids': list(ids), 'scores': [round(float(s), 5) for s in scores]}))
+        return cls(
+            user_id=user_id,
+            recommend_type=recommend_type,
+            payload=payload,
+            item_count=len(ids),
+            last_event_at=last_event_at,
+            computed_at=computed_at
+        )
+    
+    def to_dict(self):
+        """转换为字典格式（解压 ids 和 scores）"""
+        data = loads(zlib.decompress(self.payload))
+        return {
+            'user_id': self.user_id,
+            'recommend_type': self.recommend_type,
+            'ids': data['ids'],
+            'scores': data['scores'],
+            'last_event_at': self.last_event_at,
+            'computed_at': self.computed_at
+        }
\ No newline at end of file
@@ -3,6 +3,14 @@ from sqlalchemy.ext.declarative import declarative_base
 
 Base = declarative_base()
 
+def typed_item_key(item_id, item_type: str = None) -> str:
+    """条目在行为记录、已看过滤和热度统计中的键
+
+    各类型的条目ID分别从 1 开始编号，不同类型的条目可能有相同的ID，
+    已知类型时用 "类型:ID" 区分；类型未知的旧行为记录只能使用ID本身。
+    """
+    return f"{item_type}:{item_id}" if item_type else str(item_id)
+
 class UserBehavior(Base):
     """用户行为模型"""
     __tablename__ = 'user_behavior'
@@ -14,6 +22,7 @@ class UserBehavior(Base):
     description = Column(Text, nullable=True)
     timestamp = Column(DateTime, nullable=True, default=func.now())
     source = Column(String(50), nullable=True)
+    item_type = Column(String(20), nullable=True)
     
     def to_dict(self):
         """转换为字典格式"""
@@ -24,7 +33,8 @@ class UserBehavior(Base):
             'action': self.action,
             'description': self.description,
             'timestamp': self.timestamp.isoformat() if self.timestamp else None,
-            'source': self.source
+            'source': self.source,
+            'item_type': self.item_type
         }
         
     @staticmethod
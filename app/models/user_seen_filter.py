@@ -0,0 +1,11 @@
+from sqlalchemy import Column, Integer, String, LargeBinary, DateTime, func
+from app.models.user_behavior import Base
+
+class UserSeenFilter(Base):
+    """用户已看条目的布隆过滤器"""
+    __tablename__ = 'user_seen_filter'
+    
+    user_id = Column(String(50), primary_key=True)
+    bits = Column(LargeBinary, nullable=False)
+    item_count = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, nullable=True, default=func.now(), onupdate=func.now())
\ No newline at end of file
@@ -0,0 +1,340 @@
+from app.services.recommendation_service import RecommendationService
+from config.settings import (
+    RECOMMENDATION_CONFIG, ASYNC_CONFIG, CONCURRENCY_CONFIG, PAGINATION_CONFIG, PRECOMPUTE_CONFIG
+)
+from utils.admission import Overloaded, remaining
+from utils.metrics import timed, register_executor
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from functools import partial
+import asyncio
+import contextvars
+import logging
+
+logger = logging.getLogger(__name__)
+
+class AsyncRecommendationService:
+    def __init__(self, recommendation_service: RecommendationService):
+        """初始化异步推荐服务
+
+        复用同步服务的数据库、向量库和排序组件：数据库与向量库调用在 I/O 线程池中并发等待，
+        模型推理放到容量有限的 CPU 线程池中执行，事件循环本身不会被阻塞。
+
+        Args:
+            recommendation_service (RecommendationService): 同步推荐服务
+        """
+        self.service = recommendation_service
+        self.db_service = recommendation_service.db_service
+        self.chroma_service = recommendation_service.chroma_service
+        self.ranking_service = recommendation_service.ranking_service
+        self.io_executor = ThreadPoolExecutor(
+            max_workers=ASYNC_CONFIG['io_workers'],
+            thread_name_prefix='recommend-io'
+        )
+        self.cpu_executor = ThreadPoolExecutor(
+            max_workers=ASYNC_CONFIG['cpu_workers'],
+            thread_name_prefix='recommend-cpu'
+        )
+        register_executor('recommend-io', self.io_executor)
+        register_executor('recommend-cpu', self.cpu_executor)
+        self._cpu_slots = None
+
+    async def run_io(self, func, *args, **kwargs):
+        """在 I/O 线程池中执行阻塞调用（带上当前上下文，阶段耗时会计入本次请求）"""
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(
+            self.io_executor, partial(context.run, self.db_service.run_and_release, func, *args, **kwargs))
+
+    async def run_cpu(self, func, *args, **kwargs):
+        """在 CPU 线程池中执行推理，排队的任务数受 cpu_queue_size 限制"""
+        if self._cpu_slots is None:
+            self._cpu_slots = asyncio.Semaphore(ASYNC_CONFIG['cpu_queue_size'])
+        async with self._cpu_slots:
+            loop = asyncio.get_running_loop()
+            context = contextvars.copy_context()
+            return await loop.run_in_executor(self.cpu_executor, partial(context.run, func, *args, **kwargs))
+
+    async def get_recommendations(self, user_id: str, recommend_type: str, limit: int = None,
+                                  timings: dict = None, diversity_lambda: float = None) -> list:
+        """异步获取推荐内容，结果与 RecommendationService.get_recommendations 一致
+
+        Args:
+            user_id (str): 用户ID
+            recommend_type (str): 推荐类型
+            limit (int, optional): 返回结果数量
+            timings (dict, optional): 传入时写入各阶段耗时（毫秒）
+            diversity_lambda (float, optional): MMR 多样化参数
+
+        Returns:
+            list: 推荐内容列表
+        """
+        ranked = await self.rank_candidates(user_id, recommend_type, limit, timings, diversity_lambda)
+        return ranked['items']
+
+    async def rank_candidates(self, user_id: str, recommend_type: str, limit: int = None,
+                              timings: dict = None, diversity_lambda: float = None) -> dict:
+        """异步执行召回和排序，返回排序后的候选集（字段见 RankingService.rank）
+
+        在线召回受准入控制限制，过载时降级为 RecommendationService.rank_fallback 的结果，
+        没有可用的降级结果时抛出 Overloaded。
+        """
+        timings = timings if timings is not None else {}
+
+        if limit is None:
+            limit = RECOMMENDATION_CONFIG['default_results']
+        diversity_lambda = self.service.resolve_diversity(diversity_lambda)
+
+        with timed('recommend.total', timings, 'total'):
+            # 活跃用户优先使用离线预计算的结果
+            if PRECOMPUTE_CONFIG['enabled'] and diversity_lambda is None:
+                ranked = await self.run_io(self.service.rank_precomputed, user_id, recommend_type, limit, timings)
+                if ranked is not None:
+                    return ranked
+
+            try:
+                async with self.admit():
+                    ranked = await self._rank_online(user_id, recommend_type, limit, timings, diversity_lambda)
+            except Overloaded as e:
+                logger.warning(f"Recommendation overloaded, serving fallback: {str(e)}")
+                ranked = await self.run_io(self.service.rank_fallback, user_id, recommend_type, limit, timings)
+
+        return ranked
+
+    def admit(self):
+        """获取在线召回的执行名额，未启用准入控制时不做限制"""
+        self.service.memory_budget.maybe_check()
+        admission = self.service.admission
+        return admission.async_slot() if admission is not None else nullcontext()
+
+    def admit_ingest(self):
+        """获取条目导入的执行名额（与在线召回分开限制）"""
+        self.service.memory_budget.maybe_check()
+        admission = self.service.ingest_admission
+        return admission.async_slot() if admission is not None else nullcontext()
+
+    async def _rank_online(self, user_id: str, recommend_type: str, limit: int, timings: dict,
+                           diversity_lambda: float = None) -> dict:
+        """在线多路召回并排序"""
+        include_embeddings = diversity_lambda is not None
+        # 获取用户行为数据和已看过滤器
+        with timed('recommend.behavior', timings, 'behavior'):
+            try:
+                user_behavior, seen_filter = await self._with_timeout(
+                    'behavior', self.run_io(self.service.load_user_state, user_id))
+            except asyncio.TimeoutError:
+                # 读取超时时按冷启动用户处理
+                logger.warning("Stage behavior timed out, continuing as cold-start user")
+                user_behavior, seen_filter = [], None
+
+        # 一次批量推理生成所有召回来源的查询向量（默认召回命中缓存时跳过）
+        with timed('recommend.embedding', timings, 'embedding'):
+            pool_size = self.service.candidate_pool_size(limit, seen_filter)
+            default_key = self.chroma_service.default_cache_key(recommend_type, pool_size, include_embeddings)
+            cached_default = self.chroma_service.default_cache.get(default_key)
+
+            query_texts = self.chroma_service.build_query_texts(user_behavior, recommend_type)
+            trending = None
+            if cached_default is None:
+                # 与同步版本的 get_default_candidates 一致，热门条目足够时不再做默认召回的推理和检索
+                trending = await self.run_io(self.chroma_service.get_trending_candidates,
+                                             recommend_type, pool_size, include_embeddings)
+                if trending is not None and len(trending['ids']) >= pool_size:
+                    self.chroma_service.cache_default_candidates(default_key, trending)
+                    cached_default = trending
+            if cached_default is not None:
+                query_texts.pop('default')
+            sources = list(query_texts)
+            embeddings = []
+            if sources:
+                embeddings = await self.run_cpu(
+                    self.chroma_service.embedding_service.get_batch_embeddings,
+                    [query_texts[source] for source in sources]
+                )
+            source_queries = {source: [embedding] for source, embedding in zip(sources, embeddings)}
+            if user_behavior and 'collaborative' not in query_texts:
+                # 启用画像汇总时历史查询向量由交互条目的向量汇总（可能有多个兴趣向量）
+                history_embeddings = await self._history_query_embeddings(user_behavior)
+                if history_embeddings:
+                    source_queries['collaborative'] = history_embeddings
+            sources = list(source_queries)
+
+        # 并发查询各路候选
+        with timed('recommend.candidates', timings, 'candidates'):
+            results = await asyncio.gather(*[
+                self._with_timeout(source, self.run_io(
+                    self.chroma_service.query_candidates,
+                    source_queries[source], recommend_type, pool_size,
+                    source=source, include_embeddings=include_embeddings
+                ))
+                for source in sources
+            ], return_exceptions=True)
+
+            candidate_sets = [cached_default] if cached_default is not None else []
+            for source, result in zip(sources, results):
+                if isinstance(result, asyncio.TimeoutError):
+                    logger.warning(f"Stage {source} timed out, continuing without it")
+                    timings.setdefault('timeouts', []).append(source)
+                    continue
+                if isinstance(result, Exception):
+                    logger.error(f"Error getting {source} candidates: {str(result)}")
+                    continue
+                if source == 'default':
+                    # 热门条目排在语义召回结果之前
+                    result = self.chroma_service.with_trending(result, trending, pool_size, include_embeddings)
+                    self.chroma_service.cache_default_candidates(default_key, result)
+                candidate_sets.append(result)
+
+        # 合并与打分（打分会查询热度，放在 I/O 线程池中执行）
+        with timed('recommend.ranking', timings, 'ranking'):
+            return await self.run_io(self._rank, candidate_sets, user_behavior, seen_filter, limit, diversity_lambda)
+
+    async def rank_many(self, user_id: str, recommend_types: list, limit: int = None, timings: dict = None,
+                        diversity_lambda: float = None) -> dict:
+        """异步推荐多种类型，结果按类型分组（见 RecommendationService.rank_many）"""
+        timings = timings if timings is not None else {}
+
+        if limit is None:
+            limit = RECOMMENDATION_CONFIG['default_results']
+        diversity_lambda = self.service.resolve_diversity(diversity_lambda)
+
+        results = {}
+        with timed('recommend.total', timings, 'total'):
+            online = []
+            for recommend_type in recommend_types:
+                ranked = None
+                if PRECOMPUTE_CONFIG['enabled'] and diversity_lambda is None:
+                    ranked = await self.run_io(self.service.rank_precomputed, user_id, recommend_type, limit, timings)
+                if ranked is not None:
+                    results[recommend_type] = ranked
+                else:
+                    online.append(recommend_type)
+
+            if online:
+                try:
+                    async with self.admit():
+                        results.update(await self._rank_online_many(user_id, online, limit, timings, diversity_lambda))
+                except Overloaded as e:
+                    logger.warning(f"Recommendation overloaded, serving fallback: {str(e)}")
+                    for recommend_type in online:
+                        results[recommend_type] = await self.run_io(
+                            self.service.rank_fallback, user_id, recommend_type, limit, timings)
+
+        return {recommend_type: results[recommend_type] for recommend_type in recommend_types}
+
+    async def _rank_online_many(self, user_id: str, recommend_types: list, limit: int, timings: dict,
+                                diversity_lambda: float = None) -> dict:
+        """在线召回并排序多种类型"""
+        include_embeddings = diversity_lambda is not None
+        with timed('recommend.behavior', timings, 'behavior'):
+            try:
+                user_behavior, seen_filter = await self._with_timeout(
+                    'behavior', self.run_io(self.service.load_user_state, user_id))
+            except asyncio.TimeoutError:
+                logger.warning("Stage behavior timed out, continuing as cold-start user")
+                user_behavior, seen_filter = [], None
+
+        # 一次批量推理生成所有类型的查询向量（包括未命中缓存的默认召回）
+        with timed('recommend.embedding', timings, 'embedding'):
+            pool_size = self.service.candidate_pool_size(limit, seen_filter)
+            default_keys = {
+                recommend_type: self.chroma_service.default_cache_key(recommend_type, pool_size, include_embeddings)
+                for recommend_type in recommend_types
+            }
+            candidate_sets = {}
+            for recommend_type in recommend_types:
+                cached_default = self.chroma_service.default_cache.get(default_keys[recommend_type])
+                candidate_sets[recommend_type] = [cached_default] if cached_default is not None else []
+            missing = [recommend_type for recommend_type in recommend_types if not candidate_sets[recommend_type]]
+            # 热门条目足够的类型不再做默认召回的推理和检索
+            trending = dict(zip(missing, await asyncio.gather(*[
+                self.run_io(self.chroma_service.get_trending_candidates, recommend_type, pool_size, include_embeddings)
+                for recommend_type in missing
+            ])))
+            for recommend_type in missing:
+                if trending[recommend_type] is not None and len(trending[recommend_type]['ids']) >= pool_size:
+                    self.chroma_service.cache_default_candidates(default_keys[recommend_type], trending[recommend_type])
+                    candidate_sets[recommend_type].append(trending[recommend_type])
+            missing = [recommend_type for recommend_type in missing if not candidate_sets[recommend_type]]
+            queries = await self.run_cpu(
+                self.chroma_service.build_type_queries, user_behavior, recommend_types, missing, False)
+            if user_behavior and self.chroma_service.profile_builder is not None:
+                history_embeddings = await self._history_query_embeddings(user_behavior)
+                for recommend_type in recommend_types:
+                    queries.setdefault(recommend_type, []).extend(
+                        ('collaborative', embedding) for embedding in history_embeddings)
+                queries = {recommend_type: items for recommend_type, items in queries.items() if items}
+
+        # 每种类型一次检索请求，各类型并发执行
+        with timed('recommend.candidates', timings, 'candidates'):
+            queried = [recommend_type for recommend_type in recommend_types if recommend_type in queries]
+            results = await asyncio.gather(*[
+                self._with_timeout('content', self.run_io(
+                    self.chroma_service.query_sources,
+                    queries[recommend_type], recommend_type, pool_size, include_embeddings
+                ))
+                for recommend_type in queried
+            ], return_exceptions=True)
+
+            for recommend_type, result in zip(queried, results):
+                if isinstance(result, asyncio.TimeoutError):
+                    logger.warning(f"Stage candidates for {recommend_type} timed out, continuing without it")
+                    timings.setdefault('timeouts', []).append(recommend_type)
+                    continue
+                if isinstance(result, Exception):
+                    logger.error(f"Error getting {recommend_type} candidates: {str(result)}")
+                    continue
+                for candidates in result:
+                    if candidates['source'] == 'default':
+                        candidates = self.chroma_service.with_trending(candidates, trending[recommend_type], pool_size,
+                                                                       include_embeddings)
+                        self.chroma_service.cache_default_candidates(default_keys[recommend_type], candidates)
+                    candidate_sets[recommend_type].append(candidates)
+
+        with timed('recommend.ranking', timings, 'ranking'):
+            return await self.run_io(self.service.rank_sets, candidate_sets, user_behavior, seen_filter, limit,
+                                     diversity_lambda)
+
+    async def start_feed(self, user_id: str, recommend_type: str, limit: int = None, timings: dict = None,
+                         diversity_lambda: float = None) -> tuple:
+        """异步开始一次分页推荐，见 RecommendationService.start_feed"""
+        if limit is None:
+            limit = RECOMMENDATION_CONFIG['default_results']
+        ranked = await self.rank_candidates(user_id, recommend_type, max(PAGINATION_CONFIG['pool_size'], limit),
+                                            timings, diversity_lambda)
+        return self.service.create_feed(ranked, limit)
+
+    async def _history_query_embeddings(self, user_behavior: list) -> list:
+        """生成历史查询向量：读取条目向量等 I/O 在 I/O 线程池中执行，只有文本编码占用推理名额"""
+        loop = asyncio.get_running_loop()
+
+        def embed_texts(texts):
+            # 在 I/O 线程中调用，提交到事件循环，经推理名额限制后在 CPU 线程池中编码
+            return asyncio.run_coroutine_threadsafe(
+                self.run_cpu(self.chroma_service.embedding_service.get_batch_embeddings, texts), loop).result()
+
+        return await self.run_io(self.chroma_service.history_query_embeddings, user_behavior, embed_texts)
+
+    @staticmethod
+    async def _with_timeout(stage: str, awaitable):
+        """按 CONCURRENCY_CONFIG 中的阶段超时等待，且不超过请求的截止时间"""
+        return await asyncio.wait_for(awaitable, remaining(CONCURRENCY_CONFIG['stage_timeouts'].get(stage)))
+
+    def _rank(self, candidate_sets: list, user_behavior: list, seen_filter, limit: int, diversity_lambda: float) -> dict:
+        """合并候选集并排序"""
+        candidates = self.ranking_service.merge_candidates(candidate_sets, self.service.source_weights(user_behavior))
+        return self.ranking_service.rank(candidates, limit, seen_filter, diversity_lambda)
+
+    async def add_items(self, items: list, data_type: str) -> dict:
+        """异步增量导入条目（推理与写入在 CPU 线程池中执行），受导入的准入控制限制"""
+        async with self.admit_ingest():
+            return await self.run_cpu(self.chroma_service.add_items, items, data_type)
+
+    async def add_user_behavior(self, **kwargs) -> dict:
+        """异步记录用户行为"""
+        return await self.run_io(self.db_service.add_user_behavior, **kwargs)
+
+    def shutdown(self):
+        """关闭线程池"""
+        self.io_executor.shutdown(wait=False)
+        self.cpu_executor.shutdown(wait=False)
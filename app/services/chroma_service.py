@@ -1,18 +1,88 @@
 import chromadb
 from chromadb.config import Settings
-from config.settings import CHROMA_CONFIG, DATA_FILES, CONTENT_TYPES
-from utils.embeddings import EmbeddingService
+from config.settings import (
+    CHROMA_CONFIG, DATA_FILES, CONTENT_TYPES, VECTOR_INDEX_CONFIG, PROJECTION_CONFIG, CACHE_CONFIG,
+    POPULARITY_CONFIG, PROFILE_CONFIG, INGEST_CONFIG
+)
+from utils.embeddings import get_embedding_service
+from utils.vector_index import VectorIndex, normalize
+from utils.index_snapshots import IndexStore, SnapshotManager
+from utils.projection import EmbeddingProjector, recall_at_k
+from utils.profile import ProfileBuilder
+from utils.admission import expired
+from utils.cache import TTLCache
+from utils.metrics import timed, observe_batch, register_cache
+from utils.serialization import loads, iter_json_array
+from app.models.user_behavior import typed_item_key
+import numpy as np
 import json
 import logging
 import hashlib
-from typing import List, Dict, Any
+import threading
+import time
+from typing import List, Dict, Any, Optional
 
 logger = logging.getLogger(__name__)
 
 class ChromaService:
-    def __init__(self):
-        """初始化 Chroma 服务"""
-        self.client = chromadb.HttpClient(
+    def __init__(self, db_service=None, client=None, embedding_service=None):
+        """初始化 Chroma 服务
+        
+        Args:
+            db_service (DatabaseService, optional): 数据库服务，协同过滤推荐需要读取用户历史
+            client (optional): Chroma 客户端，默认按配置创建 HTTP 客户端（基准测试可传入本地替代实现）
+            embedding_service (EmbeddingService, optional): 嵌入服务，默认使用进程内共享的嵌入服务
+        """
+        self.client = client if client is not None else self._create_client()
+        self.collection_name = CHROMA_CONFIG['CHROMA_COLLECTION_NAME']
+        self._collection = None
+        self.upload_batch_bytes = CHROMA_CONFIG['BATCH_MAX_BYTES']
+        self.db_service = db_service
+        self.embedding_service = embedding_service if embedding_service is not None else get_embedding_service()
+        self.default_cache = TTLCache(**CACHE_CONFIG['default_recommendations'])
+        register_cache('default_recommendations', self.default_cache)
+        # 每种类型最近一次的默认候选集，不会过期，过载降级时使用
+        self.last_defaults = {}
+        # 其他进程通过 add_items 导入的条目按 added_at 元数据增量同步（条目ID -> added_at，只保留同步窗口内的条目）
+        self._added_cursor = time.time()
+        self._added_seen: Dict[str, float] = {}
+        self._added_synced_at = 0.0
+        self._added_lock = threading.Lock()
+        # 本地索引以不可变快照的形式使用，后台线程发现新版本后无停顿切换，并定期同步其他进程导入的条目
+        self.index_snapshots = SnapshotManager(
+            IndexStore(VECTOR_INDEX_CONFIG['path']) if VECTOR_INDEX_CONFIG['enabled'] else None,
+            mmap_rerank=VECTOR_INDEX_CONFIG['mmap_rerank'],
+            reload_interval=VECTOR_INDEX_CONFIG['reload_interval'],
+            on_swap=self._on_index_swap,
+            mmap_documents=VECTOR_INDEX_CONFIG['mmap_documents'],
+            sync=self.sync_added_items,
+            sync_interval=INGEST_CONFIG['sync_interval']
+        )
+        self._load_local_index()
+        self._added_cursor = self._index_exported_at()
+        # 长历史用户的画像由交互条目的向量加权汇总，未启用时使用拼接的历史文本
+        self.profile_builder = None
+        if PROFILE_CONFIG['enabled']:
+            self.profile_builder = ProfileBuilder(
+                self.embedding_service.get_batch_embeddings,
+                self.get_item_vectors,
+                resolve_vector_ids=self._resolve_vector_ids,
+                max_events=PROFILE_CONFIG['max_events'],
+                half_life_days=PROFILE_CONFIG['half_life_days'],
+                action_weights=PROFILE_CONFIG['action_weights'],
+                n_interests=PROFILE_CONFIG['n_interests'],
+                min_events_per_interest=PROFILE_CONFIG['min_events_per_interest'],
+                min_interest_share=PROFILE_CONFIG['min_interest_share'],
+                kmeans_iterations=PROFILE_CONFIG['kmeans_iterations'],
+                cache_size=PROFILE_CONFIG['cache_size'],
+                cache_ttl=PROFILE_CONFIG['cache_ttl'],
+                # 其他进程新导入的条目在同步间隔内可以读到
+                miss_ttl=INGEST_CONFIG['sync_interval']
+            )
+        
+    def _create_client(self):
+        """创建 Chroma HTTP 客户端"""
+        client = chromadb.HttpClient(
             host=CHROMA_CONFIG['CHROMA_HOST'],
             port=CHROMA_CONFIG['CHROMA_PORT'],
             ssl=False,
@@ -22,17 +92,64 @@ class ChromaService:
                 "X-Chroma-Database": CHROMA_CONFIG['CHROMA_DATABASE']
             }
         )
-        self.collection_name = CHROMA_CONFIG['CHROMA_COLLECTION_NAME']
-        self.embedding_service = EmbeddingService()
+        self._configure_connection_pool(client)
+        return client
+        
+    @staticmethod
+    def _configure_connection_pool(client):
+        """扩大客户端的长连接池
+        
+        chromadb 的 HTTP 客户端内部使用 requests.Session，默认每个主机只保留 10 个长连接，
+        并发查询超过 10 个时多出的请求每次都要重新建立连接。这里按 POOL_SIZE 重新挂载连接池，
+        并只对建立连接失败的情况做重试（请求已发出后不重试，避免重复写入）。
+        """
+        session = getattr(getattr(client, '_server', None), '_session', None)
+        if session is None or not hasattr(session, 'mount'):
+            logger.warning("Chroma client does not expose an HTTP session, using default connection pool")
+            return
+        try:
+            from requests.adapters import HTTPAdapter
+            from urllib3.util.retry import Retry
+            
+            adapter = HTTPAdapter(
+                pool_connections=1,
+                pool_maxsize=CHROMA_CONFIG['POOL_SIZE'],
+                max_retries=Retry(total=CHROMA_CONFIG['CONNECT_RETRIES'], read=0, status=0, backoff_factor=0.1)
+            )
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+        except Exception as e:
+            logger.warning(f"Error configuring Chroma connection pool: {str(e)}")
+        
+    def reset_client(self):
+        """重新创建客户端，fork 出的子进程不能复用父进程的 HTTP 连接"""
+        self.client = self._create_client()
+        self._collection = None
+        
+    @property
+    def local_index(self):
+        """当前快照的本地索引（未启用或不存在时为 None），查询时应通过 index_snapshots.acquire 使用"""
+        snapshot = self.index_snapshots.current
+        return snapshot.index if snapshot is not None else None
+        
+    @local_index.setter
+    def local_index(self, index: VectorIndex):
+        self.index_snapshots.swap(index)
+        
+    def _on_index_swap(self, snapshot):
+        """切换索引版本后清空按旧索引召回的默认候选缓存（降级用的 last_defaults 保留）
+        
+        增量段追加条目不经过这里，由 _apply_added_items 只清除对应类型的缓存。
+        """
+        self.default_cache.clear()
         
     def initialize_data(self):
         """初始化数据"""
         try:
-            collection = self._get_or_create_collection()
-            
-            for data_type, file_path in DATA_FILES.items():
-                logger.info(f"Processing {data_type} data from {file_path}")
-                self._process_file(file_path, collection, data_type)
+            self.ingest_data_files()
+                
+            if VECTOR_INDEX_CONFIG['enabled']:
+                self.build_local_index()
                 
         except Exception as e:
             logger.error(f"Error initializing data: {str(e)}")
@@ -40,117 +157,663 @@ class ChromaService:
             
     def get_default_recommendations(self, recommend_type: str, limit: int) -> List[Dict[str, Any]]:
         """获取默认推荐"""
-        try:
-            collection = self._get_collection()
+        return self.get_default_candidates(recommend_type, limit)['items']
             
-            # 构建查询文本
-            type_desc = CONTENT_TYPES.get(recommend_type, recommend_type)
-            query_text = f"推荐{type_desc}相关内容"
-            query_embedding = self.embedding_service.get_embedding(query_text)
+    def get_content_recommendations(self, user_behavior: List[Dict], recommend_type: str, limit: int) -> List[Dict[str, Any]]:
+        """基于内容的推荐"""
+        return self.get_content_candidates(user_behavior, recommend_type, limit)['items']
             
-            results = collection.query(
-                query_embeddings=[query_embedding.tolist()],
-                n_results=limit,
-                where={"type": recommend_type}
-            )
-            return [json.loads(doc) for doc in results['documents'][0]]
+    def get_collaborative_recommendations(self, user_id: str, recommend_type: str, limit: int) -> List[Dict[str, Any]]:
+        """基于协同过滤的推荐"""
+        # 获取用户历史行为
+        user_history = self.db_service.get_user_behavior(user_id) if self.db_service else []
+        if not user_history:
+            return self.get_default_recommendations(recommend_type, limit)
+        return self.get_collaborative_candidates(user_history, recommend_type, limit)['items']
+        
+    def get_default_candidates(self, recommend_type: str, limit: int, include_embeddings: bool = False) -> Dict[str, Any]:
+        """召回默认（冷启动）候选集，结果按类型缓存
+        
+        优先使用该类型当前的热门条目，不足 limit 个时用类型描述文本的语义召回结果补足。
+        
+        Args:
+            recommend_type (str): 推荐类型
+            limit (int): 候选数量
+            include_embeddings (bool): 是否返回候选向量
+            
+        Returns:
+            Dict[str, Any]: 候选集
+        """
+        cache_key = self.default_cache_key(recommend_type, limit, include_embeddings)
+        cached = self.default_cache.get(cache_key)
+        if cached is not None:
+            return cached
+            
+        try:
+            trending = self.get_trending_candidates(recommend_type, limit, include_embeddings)
+            if trending is not None and len(trending['ids']) >= limit:
+                candidates = trending
+            else:
+                # 构建查询文本
+                query_text = self._build_default_query_text(recommend_type)
+                query_embedding = self.embedding_service.get_embedding(query_text)
+                
+                candidates = self.query_candidates([query_embedding], recommend_type, limit, source='default',
+                                                    include_embeddings=include_embeddings)
+                candidates = self.with_trending(candidates, trending, limit, include_embeddings)
+            self.cache_default_candidates(cache_key, candidates)
+            return candidates
         except Exception as e:
             logger.error(f"Error getting default recommendations: {str(e)}")
-            return []
+            return self._empty_candidates('default')
             
-    def get_content_recommendations(self, user_behavior: Dict, recommend_type: str, limit: int) -> List[Dict[str, Any]]:
-        """基于内容的推荐"""
+    def get_trending_candidates(self, recommend_type: str, limit: int,
+                                include_embeddings: bool = False) -> Dict[str, Any]:
+        """读取该类型当前的热门条目作为默认候选集
+        
+        相似度为热度与最热门条目热度之比（0~1），合并时再按语义召回结果的相似度范围缩放。
+        
+        Returns:
+            Dict[str, Any]: 候选集，未启用热度统计或热门条目少于 min_trending 个时返回 None
+        """
+        tracker = self.db_service.popularity_tracker() if self.db_service is not None else None
+        if tracker is None:
+            return None
         try:
-            collection = self._get_collection()
+            trending = tracker.trending(recommend_type, limit)
+            if len(trending) < POPULARITY_CONFIG['min_trending'] or trending[0][1] <= 0:
+                return None
+            top = trending[0][1]
+            with timed('popularity.trending'):
+                candidates = self.get_candidates_by_ids(
+                    [tracker.vector_id(key) for key, _ in trending], 'default',
+                    [score / top for _, score in trending], include_embeddings=include_embeddings
+                )
+            return candidates if candidates['ids'] else None
+        except Exception as e:
+            logger.error(f"Error getting trending candidates: {str(e)}")
+            return None
+            
+    def with_trending(self, candidates: Dict[str, Any], trending: Dict[str, Any], limit: int,
+                      include_embeddings: bool = False) -> Dict[str, Any]:
+        """把热门条目排在语义召回的默认候选之前，合计不超过 limit 个
+        
+        Args:
+            candidates (Dict[str, Any]): 语义召回的默认候选集
+            trending (Dict[str, Any]): get_trending_candidates 的结果，None 时直接返回 candidates
+            limit (int): 候选数量
+            include_embeddings (bool): 是否保留候选向量
+        """
+        if trending is None:
+            return candidates
+        # 热门条目的相似度缩放到语义召回结果的最大相似度，合并排序时与语义召回的结果可比
+        top = float(candidates['similarities'].max()) if len(candidates['ids']) else 1.0
+        combined = self._empty_candidates('default')
+        similarities, embeddings = [], []
+        added = set()
+        for source, scale in ((trending, top), (candidates, 1.0)):
+            for i, item_id in enumerate(source['ids']):
+                if len(combined['ids']) >= limit:
+                    break
+                if item_id in added:
+                    continue
+                added.add(item_id)
+                combined['ids'].append(item_id)
+                combined['documents'].append(source['documents'][i])
+                combined['items'].append(source['items'][i])
+                similarities.append(source['similarities'][i] * scale)
+                if include_embeddings:
+                    embeddings.append(source['embeddings'][i])
+        combined['similarities'] = np.asarray(similarities, dtype=np.float32)
+        if include_embeddings:
+            combined['embeddings'] = np.asarray(embeddings, dtype=np.float32)
+        return combined
+        
+    def cache_default_candidates(self, cache_key: tuple, candidates: Dict[str, Any]):
+        """缓存默认候选集，同时保留为该类型的降级结果"""
+        self.default_cache.set(cache_key, candidates)
+        if candidates['ids']:
+            self.last_defaults[cache_key[0]] = candidates
+            
+    def get_fallback_candidates(self, recommend_type: str) -> Dict[str, Any]:
+        """读取该类型最近一次的默认候选集，不做推理和检索，没有时返回 None"""
+        return self.last_defaults.get(recommend_type)
+        
+    @staticmethod
+    def default_cache_key(recommend_type: str, limit: int, include_embeddings: bool = False) -> tuple:
+        """默认候选集的缓存键"""
+        return (recommend_type, limit, include_embeddings)
+        
+    def get_content_candidates(self, user_behavior: List[Dict], recommend_type: str, limit: int,
+                               include_embeddings: bool = False) -> Dict[str, Any]:
+        """基于内容召回候选集
+        
+        Args:
+            user_behavior (List[Dict]): 用户行为记录
+            recommend_type (str): 推荐类型
+            limit (int): 候选数量
+            include_embeddings (bool): 是否返回候选向量
             
+        Returns:
+            Dict[str, Any]: 候选集
+        """
+        try:
             # 构建用户画像文本
             profile_text = self._build_user_profile_text(user_behavior, recommend_type)
             if not profile_text:
-                return self.get_default_recommendations(recommend_type, limit)
+                return self.get_default_candidates(recommend_type, limit, include_embeddings)
             
             # 生成用户画像向量
             query_embedding = self.embedding_service.get_embedding(profile_text)
-            
-            results = collection.query(
-                query_embeddings=[query_embedding.tolist()],
-                n_results=limit,
-                where={"type": recommend_type}
-            )
-            
-            return [json.loads(doc) for doc in results['documents'][0]]
+            return self.query_candidates([query_embedding], recommend_type, limit, source='content',
+                                          include_embeddings=include_embeddings)
             
         except Exception as e:
             logger.error(f"Error getting content recommendations: {str(e)}")
-            return []
+            return self._empty_candidates('content')
             
-    def get_collaborative_recommendations(self, user_id: str, recommend_type: str, limit: int) -> List[Dict[str, Any]]:
-        """基于协同过滤的推荐"""
+    def get_collaborative_candidates(self, user_history: List[Dict], recommend_type: str, limit: int,
+                                     include_embeddings: bool = False) -> Dict[str, Any]:
+        """基于用户历史交互召回候选集
+        
+        Args:
+            user_history (List[Dict]): 用户行为记录
+            recommend_type (str): 推荐类型
+            limit (int): 候选数量
+            include_embeddings (bool): 是否返回候选向量
+            
+        Returns:
+            Dict[str, Any]: 候选集
+        """
         try:
-            collection = self._get_collection()
+            query_embeddings = self.history_query_embeddings(user_history)
+            if not query_embeddings:
+                return self._empty_candidates('collaborative')
             
-            # 获取用户历史行为
-            user_history = self.db_service.get_user_behavior(user_id)
-            if not user_history:
-                return self.get_default_recommendations(recommend_type, limit)
+            return self.query_candidates(query_embeddings, recommend_type, limit, source='collaborative',
+                                          include_embeddings=include_embeddings)
             
-            # 构建用户历史行为文本
-            history_text = self._build_user_history_text(user_history)
-            query_embedding = self.embedding_service.get_embedding(history_text)
+        except Exception as e:
+            logger.error(f"Error getting collaborative recommendations: {str(e)}")
+            return self._empty_candidates('collaborative')
             
-            results = collection.query(
-                query_embeddings=[query_embedding.tolist()],
-                n_results=limit,
-                where={"type": recommend_type}
-            )
+    def history_query_text(self, user_history: List[Dict]) -> Optional[str]:
+        """基于历史交互召回使用的查询文本（与推荐类型无关）
+        
+        Returns:
+            Optional[str]: 拼接的历史文本，启用画像汇总或没有可用的历史时为 None
+        """
+        if self.profile_builder is not None or not user_history:
+            return None
+        return self._build_user_history_text(user_history) or None
+        
+    def history_query_embeddings(self, user_history: List[Dict], embed_texts=None) -> List[np.ndarray]:
+        """基于历史交互召回使用的查询向量
+        
+        启用画像汇总时为一个或多个兴趣向量（见 ProfileBuilder），否则为拼接的历史文本的编码。
+        
+        Args:
+            user_history (List[Dict]): 用户行为记录
+            embed_texts (Callable, optional): 批量编码文本的函数，默认为 embedding_service.get_batch_embeddings
             
-            return [json.loads(doc) for doc in results['documents'][0]]
+        Returns:
+            List[np.ndarray]: 查询向量，没有可用的历史时为空列表
+        """
+        if self.profile_builder is not None:
+            return self.profile_builder.build(user_history, embed_texts=embed_texts)
+        history_text = self._build_user_history_text(user_history)
+        if not history_text:
+            return []
+        if embed_texts is not None:
+            return list(embed_texts([history_text]))
+        return [self.embedding_service.get_embedding(history_text)]
+        
+    def get_item_vectors(self, ids: List[str]) -> Dict[str, np.ndarray]:
+        """按向量库ID读取条目的原始向量，不存在的ID省略
+        
+        本地索引未做降维时直接从索引读取，否则从 Chroma 读取（降维后的向量不能作为查询向量）。
+        """
+        with self.index_snapshots.acquire() as index:
+            base = getattr(index, 'base', index)
+            if index is not None and getattr(base, 'projector', None) is None:
+                results = index.get(ids=ids, include=['embeddings'])
+                return dict(zip(results['ids'], results['embeddings']))
+        results = self._call_collection('get', ids=ids, include=['embeddings'])
+        return {item_id: np.asarray(embedding, dtype=np.float32)
+                for item_id, embedding in zip(results['ids'], results['embeddings'])}
+        
+    def _resolve_vector_ids(self, keys: List[tuple]) -> Dict[tuple, str]:
+        """把行为记录中的 (内容ID, 内容类型) 批量解析为向量库ID
+        
+        内容ID 按类型各自编号，导入时与类型一起写入条目的 item_id / type 元数据，按类型一次查找本地索引
+        （没有加载时查找向量库）；热度统计的条目目录中记录过的条目直接使用目录中的ID。
+        没有类型的旧记录按原始ID 使用（没有 id 字段的条目两者相同）。
+        
+        Returns:
+            Dict[tuple, str]: 键到向量库ID 的映射，找不到的键省略
+        """
+        popularity = getattr(self.db_service, 'popularity', None)
+        resolved, by_type = {}, {}
+        for item_id, item_type in keys:
+            vector_id = None
+            if popularity is not None:
+                vector_id = popularity.known_vector_id(typed_item_key(item_id, item_type))
+            if vector_id is not None:
+                resolved[(item_id, item_type)] = vector_id
+            elif item_type is None:
+                resolved[(item_id, item_type)] = item_id
+            else:
+                by_type.setdefault(item_type, []).append(item_id)
+                
+        for item_type, item_ids in by_type.items():
+            where = {'$and': [{'type': item_type}, {'item_id': {'$in': item_ids}}]}
+            with self.index_snapshots.acquire() as index:
+                results = index.find(where) if index is not None else None
+            if results is None:
+                results = self._call_collection('get', where=where, include=['metadatas'])
+            for vector_id, metadata in zip(results['ids'], results['metadatas']):
+                resolved[(str(metadata['item_id']), item_type)] = vector_id
+        return resolved
+        
+    def query_candidates(self, query_embeddings: List[np.ndarray], recommend_type: str, limit: int,
+                          source: str, include_embeddings: bool = False) -> Dict[str, Any]:
+        """查询向量库并整理为候选集
+        
+        候选集字段：ids（向量库ID）、documents（原始 JSON 文档）、items（解析后的条目）、
+        similarities（余弦相似度）、embeddings（候选向量矩阵，未请求时为 None）以及 source（召回来源）。
+        传入多个查询向量时，各查询的结果合并到同一个候选集中（同一条目只保留相似度最高的一次）。
+        """
+        results = self._query_candidate_results(query_embeddings, recommend_type, limit, include_embeddings)
+        return self._build_candidates(results, range(len(results['ids'])), source, include_embeddings)
+        
+    def query_candidate_sets(self, query_embeddings: List[np.ndarray], recommend_type: str, limit: int,
+                             source: str, include_embeddings: bool = False,
+                             group_sizes: List[int] = None) -> List[Dict[str, Any]]:
+        """一次请求批量查询多个向量，每个查询向量返回一个独立的候选集（字段同 query_candidates）
+        
+        传入 group_sizes 时按顺序把相邻的查询向量分组，每组返回一个候选集（如每个用户的多个兴趣向量）。
+        """
+        if not query_embeddings:
+            return []
+        results = self._query_candidate_results(query_embeddings, recommend_type, limit, include_embeddings)
+        if group_sizes is None:
+            group_sizes = [1] * len(results['ids'])
+        candidate_sets, start = [], 0
+        for size in group_sizes:
+            candidate_sets.append(self._build_candidates(results, range(start, start + size), source, include_embeddings))
+            start += size
+        return candidate_sets
+        
+    def query_sources(self, queries: List[tuple], recommend_type: str, limit: int,
+                      include_embeddings: bool = False) -> List[Dict[str, Any]]:
+        """一次请求用多个查询向量检索同一类型，每个查询向量对应一个召回来源
+        
+        Args:
+            queries (List[tuple]): (召回来源, 查询向量) 列表
+            recommend_type (str): 推荐类型
+            limit (int): 每个查询的候选数量
+            include_embeddings (bool): 是否返回候选向量
             
-        except Exception as e:
-            logger.error(f"Error getting collaborative recommendations: {str(e)}")
+        Returns:
+            List[Dict[str, Any]]: 每个召回来源一个候选集（同一来源的多个查询向量合并）
+        """
+        if not queries:
             return []
+        results = self._query_candidate_results([embedding for _, embedding in queries], recommend_type, limit,
+                                                include_embeddings)
+        indices_by_source = {}
+        for i, (source, _) in enumerate(queries):
+            indices_by_source.setdefault(source, []).append(i)
+        return [self._build_candidates(results, indices, source, include_embeddings)
+                for source, indices in indices_by_source.items()]
+        
+    def build_type_queries(self, user_behavior: List[Dict], recommend_types: List[str],
+                           default_types: List[str] = (), include_profile: bool = True) -> Dict[str, List[tuple]]:
+        """为多种推荐类型生成查询向量，所有文本在一次批量推理中完成
+        
+        画像文本按类型区分，每种类型一条；历史查询向量与类型无关，只生成一次并在各类型间共用。
+        
+        Args:
+            user_behavior (List[Dict]): 用户行为记录
+            recommend_types (List[str]): 推荐类型
+            default_types (List[str]): 需要同时生成默认召回查询向量的类型（默认候选集未命中缓存时）
+            include_profile (bool): 启用画像汇总时是否同时生成历史查询向量（会读取向量库），
+                为 False 时由调用方通过 history_query_embeddings 单独生成
+            
+        Returns:
+            Dict[str, List[tuple]]: 推荐类型到 (召回来源, 查询向量) 列表的映射，可直接传给 query_sources
+        """
+        texts, slots = [], []
+        for recommend_type in default_types:
+            texts.append(self._build_default_query_text(recommend_type))
+            slots.append(('default', recommend_type))
+        history_text = self.history_query_text(user_behavior)
+        if user_behavior:
+            for recommend_type in recommend_types:
+                texts.append(self._build_user_profile_text(user_behavior, recommend_type))
+                slots.append(('content', recommend_type))
+            if history_text:
+                texts.append(history_text)
+                slots.append(('collaborative', None))
+        
+        embeddings = self.embedding_service.get_batch_embeddings(texts) if texts else []
+        history_embeddings = embeddings[-1:] if history_text else []
+        if user_behavior and self.profile_builder is not None and include_profile:
+            history_embeddings = self.profile_builder.build(user_behavior)
+        
+        queries = {recommend_type: [] for recommend_type in recommend_types}
+        for (source, recommend_type), embedding in zip(slots, embeddings):
+            if recommend_type is not None:
+                queries[recommend_type].append((source, embedding))
+        for recommend_type in recommend_types:
+            queries[recommend_type].extend(('collaborative', embedding) for embedding in history_embeddings)
+        return {recommend_type: items for recommend_type, items in queries.items() if items}
+        
+    def get_candidates_by_ids(self, ids: List[str], source: str, similarities: List[float],
+                              include_embeddings: bool = False) -> Dict[str, Any]:
+        """按向量库ID读取条目并整理为候选集，用于预计算的推荐结果和热门条目
+        
+        Args:
+            ids (List[str]): 向量库ID
+            source (str): 召回来源
+            similarities (List[float]): 与 ids 对齐的得分，作为候选集的相似度
+            include_embeddings (bool): 是否返回候选向量
+            
+        Returns:
+            Dict[str, Any]: 候选集，已不存在的条目会被跳过，顺序与 ids 一致
+        """
+        include = ['documents'] + (['embeddings'] if include_embeddings else [])
+        with self.index_snapshots.acquire() as index:
+            if index is not None:
+                results = index.get(ids=ids, include=include)
+            else:
+                results = self._call_collection('get', ids=ids, include=include)
+        positions = {item_id: i for i, item_id in enumerate(results['ids'])}
+        
+        candidates = self._empty_candidates(source)
+        scores = []
+        embeddings = []
+        with timed('json.decode'):
+            for item_id, score in zip(ids, similarities):
+                position = positions.get(item_id)
+                if position is None:
+                    continue
+                document = results['documents'][position]
+                candidates['ids'].append(item_id)
+                candidates['documents'].append(document)
+                candidates['items'].append(loads(document))
+                scores.append(score)
+                if include_embeddings:
+                    embeddings.append(results['embeddings'][position])
+        candidates['similarities'] = np.asarray(scores, dtype=np.float32)
+        if include_embeddings:
+            candidates['embeddings'] = np.asarray(embeddings, dtype=np.float32)
+        return candidates
+        
+    def _query_candidate_results(self, query_embeddings: List[np.ndarray], recommend_type: str, limit: int,
+                                 include_embeddings: bool) -> Dict[str, List]:
+        include = ['documents', 'distances'] + (['embeddings'] if include_embeddings else [])
+        return self._query(
+            query_embeddings=query_embeddings,
+            n_results=limit,
+            where={"type": recommend_type},
+            include=include
+        )
+        
+    def _build_candidates(self, results: Dict[str, List], query_indices, source: str,
+                          include_embeddings: bool) -> Dict[str, Any]:
+        """把指定查询的结果整理为一个候选集，多个查询召回同一条目时只保留相似度最高的一次"""
+        candidates = self._empty_candidates(source)
+        similarities = []
+        embeddings = []
+        positions = {}
+        with timed('json.decode'):
+            for i in query_indices:
+                for j, item_id in enumerate(results['ids'][i]):
+                    similarity = 1.0 - results['distances'][i][j]
+                    if item_id in positions:
+                        position = positions[item_id]
+                        similarities[position] = max(similarities[position], similarity)
+                        continue
+                    positions[item_id] = len(candidates['ids'])
+                    document = results['documents'][i][j]
+                    candidates['ids'].append(item_id)
+                    candidates['documents'].append(document)
+                    candidates['items'].append(loads(document))
+                    similarities.append(similarity)
+                    if include_embeddings:
+                        embeddings.append(results['embeddings'][i][j])
+        candidates['similarities'] = np.asarray(similarities, dtype=np.float32)
+        if include_embeddings:
+            candidates['embeddings'] = np.asarray(embeddings, dtype=np.float32)
+        return candidates
+        
+    def build_query_texts(self, user_behavior: List[Dict], recommend_type: str) -> Dict[str, str]:
+        """构建各召回来源的查询文本，供调用方自行批量生成向量
+        
+        Args:
+            user_behavior (List[Dict]): 用户行为记录
+            recommend_type (str): 推荐类型
+            
+        Returns:
+            Dict[str, str]: 召回来源到查询文本的映射，没有行为数据时只包含 default；
+                启用画像汇总时不包含 collaborative，查询向量由 history_query_embeddings 生成
+        """
+        texts = {'default': self._build_default_query_text(recommend_type)}
+        if user_behavior:
+            texts['content'] = self._build_user_profile_text(user_behavior, recommend_type)
+            history_text = self.history_query_text(user_behavior)
+            if history_text:
+                texts['collaborative'] = history_text
+        return texts
+        
+    @staticmethod
+    def _empty_candidates(source: str) -> Dict[str, Any]:
+        """空候选集"""
+        return {
+            'source': source,
+            'ids': [],
+            'documents': [],
+            'items': [],
+            'similarities': np.array([], dtype=np.float32),
+            'embeddings': None
+        }
+            
+    def ingest_data_files(self):
+        """把数据文件中尚未导入的条目写入 Chroma"""
+        collection = self._get_or_create_collection()
+        for data_type, file_path in DATA_FILES.items():
+            logger.info(f"Processing {data_type} data from {file_path}")
+            self._process_file(file_path, collection, data_type)
             
     def _get_or_create_collection(self):
         """获取或创建集合"""
         try:
-            return self.client.get_collection(name=self.collection_name)
+            return self._get_collection()
         except:
-            return self.client.create_collection(
+            self._collection = self.client.create_collection(
                 name=self.collection_name,
                 metadata={"hnsw:space": "cosine"}
             )
+            return self._collection
             
     def _get_collection(self):
-        """获取集合"""
-        return self.client.get_collection(name=self.collection_name)
+        """获取集合，句柄在首次获取后缓存，之后的查询不再请求集合信息"""
+        if self._collection is None:
+            self._collection = self.client.get_collection(name=self.collection_name)
+        return self._collection
+        
+    def _call_collection(self, method: str, **kwargs):
+        """调用集合的只读方法，失败时丢弃缓存的句柄重新获取并重试一次
+        
+        集合被删除重建后旧句柄会失效，重试可以自动切换到新的集合。
+        """
+        try:
+            return getattr(self._get_collection(), method)(**kwargs)
+        except Exception as e:
+            logger.warning(f"Chroma {method} failed, refreshing collection handle: {str(e)}")
+            self._collection = None
+            return getattr(self._get_collection(), method)(**kwargs)
+        
+    def _query(self, query_embeddings: List[np.ndarray], n_results: int, where: Dict = None,
+               include: List[str] = None) -> Dict[str, List]:
+        """执行向量查询，启用本地索引时不访问远程 Chroma
+        
+        Args:
+            query_embeddings (List[np.ndarray]): 查询向量
+            n_results (int): 每个查询返回的结果数量
+            where (Dict, optional): 元数据过滤条件
+            include (List[str], optional): 返回的字段
+            
+        Returns:
+            Dict[str, List]: Chroma 格式的查询结果
+        """
+        include = include or ['documents', 'metadatas', 'distances']
+        with self.index_snapshots.acquire() as index:
+            if index is not None:
+                with timed('vector.query'):
+                    return index.query(
+                        query_embeddings=query_embeddings,
+                        n_results=n_results,
+                        where=where,
+                        include=include
+                    )
+        with timed('vector.query'):
+            return self._call_collection(
+                'query',
+                query_embeddings=[self._to_payload(e) for e in query_embeddings],
+                n_results=n_results,
+                where=where,
+                include=include
+            )
+        
+    @staticmethod
+    def _to_payload(embedding: np.ndarray) -> List[float]:
+        """将向量转换为上传用的列表，按配置截断小数位以缩小请求体"""
+        return np.round(np.asarray(embedding, dtype=np.float32), CHROMA_CONFIG['EMBEDDING_DECIMALS']).tolist()
+        
+    def _load_local_index(self):
+        """加载 CURRENT 指向的本地索引版本（未启用或不存在时查询走 Chroma）"""
+        if not VECTOR_INDEX_CONFIG['enabled']:
+            return
+        if not self.index_snapshots.refresh() and self.local_index is None:
+            logger.info("Local vector index not built yet, queries will use Chroma")
+            
+    def build_local_index(self, page_size: int = 1000) -> VectorIndex:
+        """从 Chroma 集合导出全部向量并构建压缩的本地索引
+        
+        索引发布为 VECTOR_INDEX_CONFIG['path'] 下的新版本，当前进程立即切换，
+        其余进程由后台线程在 reload_interval 内切换。
+        
+        Args:
+            page_size (int): 每次从 Chroma 拉取的条数
+            
+        Returns:
+            VectorIndex: 构建好的索引
+        """
+        collection = self._get_collection()
+        ids, embeddings, metadatas, documents = [], [], [], []
+        offset = 0
+        # 导出之后导入的条目由各进程从向量库同步到增量段
+        exported_at = time.time()
+        while True:
+            page = collection.get(
+                include=['embeddings', 'metadatas', 'documents'],
+                limit=page_size,
+                offset=offset
+            )
+            if not page['ids']:
+                break
+            ids.extend(page['ids'])
+            embeddings.append(np.asarray(page['embeddings'], dtype=np.float32))
+            metadatas.extend(page['metadatas'])
+            documents.extend(page['documents'])
+            offset += len(page['ids'])
+            
+        if not ids:
+            logger.warning("Chroma collection is empty, skip building local index")
+            return None
+            
+        vectors = np.concatenate(embeddings)
+        # 写入 item_id 元数据之前导入的条目，从文档中补上（按内容类型和内容ID 查找向量库ID 时使用）
+        for metadata, document in zip(metadatas, documents):
+            if metadata is not None and 'item_id' not in metadata:
+                metadata.update(self._item_metadata(loads(document), metadata.get('type')))
+        storage = VECTOR_INDEX_CONFIG['storage']
+        index = VectorIndex(
+            dim=vectors.shape[1],
+            storage=storage,
+            rerank=VECTOR_INDEX_CONFIG['rerank'] and storage in ('int8', 'pq'),
+            rerank_factor=VECTOR_INDEX_CONFIG['rerank_factor'],
+            codec_params={'n_subspaces': VECTOR_INDEX_CONFIG['pq_subspaces']} if storage == 'pq' else None
+        )
+        projector = None
+        if PROJECTION_CONFIG['enabled']:
+            projector = EmbeddingProjector(
+                n_components=PROJECTION_CONFIG['n_components'],
+                whiten=PROJECTION_CONFIG['whiten']
+            ).fit(vectors, sample_size=PROJECTION_CONFIG['fit_sample_size'])
+            
+        index.build(ids, vectors, metadatas, documents, projector=projector)
+        index.stats['exported_at'] = exported_at
+        if projector is not None:
+            index.stats['projection_recall'] = self._evaluate_index_recall(index, vectors)
+        store = IndexStore(VECTOR_INDEX_CONFIG['path'])
+        version = store.publish(index)
+        store.prune(VECTOR_INDEX_CONFIG['keep_versions'])
+        
+        usage = index.memory_usage()
+        logger.info(f"Built local index ({storage}): {len(ids)} items, "
+                    f"{usage['codes'] / len(ids):.0f} bytes/vector vs {vectors.shape[1] * 4} bytes float32")
+        self.index_snapshots.swap(index, version)
+        return index
+        
+    def _evaluate_index_recall(self, index: VectorIndex, vectors: np.ndarray) -> float:
+        """以全维度精确检索为基准评估本地索引的召回率
+        
+        Args:
+            index (VectorIndex): 待评估的索引
+            vectors (np.ndarray): 全维度原始向量（与索引行号对应）
+            
+        Returns:
+            float: recall@k
+        """
+        k = PROJECTION_CONFIG['recall_k']
+        rng = np.random.default_rng(42)
+        sample = min(PROJECTION_CONFIG['recall_sample'], len(vectors))
+        positions = rng.choice(len(vectors), sample, replace=False)
+        
+        row_of = {item_id: i for i, item_id in enumerate(index.ids)}
+        results = index.query(vectors[positions], n_results=k, include=[])
+        retrieved = [[row_of[item_id] for item_id in ids] for ids in results['ids']]
+        
+        recall = recall_at_k(normalize(vectors), retrieved, positions, k)
+        logger.info(f"Local index recall@{k} vs full-dimension baseline: {recall:.4f} "
+                    f"({vectors.shape[1]} -> {index.dim} dims)")
+        return recall
         
     def _process_file(self, file_path: str, collection, data_type: str):
-        """处理数据文件"""
+        """处理数据文件
+        
+        文件按元素流式解析，内存中不保留整个数据文件；读取已有条目时只取ID，不拉取文档和向量。
+        """
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                
             # 获取现有的ID列表
             try:
-                existing_ids = set(collection.get()['ids'])
+                existing_ids = set(collection.get(include=[])['ids'])
                 logger.info(f"Found {len(existing_ids)} existing items in collection")
             except Exception as e:
                 logger.warning(f"Error getting existing IDs, assuming empty collection: {str(e)}")
                 existing_ids = set()
             
-            # 批量处理数据
-            batch_size = 100
-            current_batch = {
-                'ids': [],
-                'embeddings': [],
-                'metadatas': [],
-                'documents': []
-            }
+            # 批量处理数据，按条数和请求体大小两个上限切分批次
+            batch_size = CHROMA_CONFIG['BATCH_SIZE']
+            current_batch = self._new_batch()
             
-            for item in data:
+            for item in iter_json_array(file_path):
                 try:
                     # 生成唯一ID
-                    item_str = json.dumps(item, sort_keys=True)
-                    item_id = hashlib.md5(item_str.encode()).hexdigest()
+                    item_id = self._item_id(item)
                     
                     # 添加类型信息
                     item['type'] = data_type
@@ -164,21 +827,20 @@ class ChromaService:
                         embedding = self.embedding_service.get_embedding(text)
                         
                         # 添加到当前批次
+                        payload = self._to_payload(embedding)
+                        document = json.dumps(item, ensure_ascii=False)
                         current_batch['ids'].append(item_id)
-                        current_batch['embeddings'].append(embedding.tolist())
-                        current_batch['metadatas'].append({"type": data_type})
-                        current_batch['documents'].append(json.dumps(item, ensure_ascii=False))
+                        current_batch['embeddings'].append(payload)
+                        current_batch['metadatas'].append(self._item_metadata(item, data_type))
+                        current_batch['documents'].append(document)
+                        current_batch['bytes'] += self._estimate_payload_bytes(item_id, payload, document)
                         
-                        # 如果达到批处理大小，执行添加
-                        if len(current_batch['ids']) >= batch_size:
-                            self._add_batch(collection, current_batch)
+                        # 如果达到批处理大小或请求体大小上限，执行添加
+                        if (len(current_batch['ids']) >= batch_size
+                                or current_batch['bytes'] >= self.upload_batch_bytes):
+                            self._flush_batch(collection, current_batch)
                             # 重置批次
-                            current_batch = {
-                                'ids': [],
-                                'embeddings': [],
-                                'metadatas': [],
-                                'documents': []
-                            }
+                            current_batch = self._new_batch()
                             
                 except Exception as e:
                     logger.error(f"Error processing item: {str(e)}")
@@ -186,36 +848,233 @@ class ChromaService:
             
             # 处理剩余的批次
             if current_batch['ids']:
-                self._add_batch(collection, current_batch)
+                self._flush_batch(collection, current_batch)
                 
         except Exception as e:
             logger.error(f"Error processing file {file_path}: {str(e)}")
             raise
             
-    def _add_batch(self, collection, batch):
-        """添加批量数据到集合"""
+    def add_items(self, items: List[Dict], data_type: str) -> Dict[str, Any]:
+        """增量导入新条目，导入后立即可以被推荐
+        
+        与导入数据文件使用相同的条目ID和文档格式：已存在的条目跳过，其余条目按 INGEST_CONFIG['batch_size']
+        分批推理生成向量并写入 Chroma；加载了本地索引时同时加入索引的增量段。该类型的默认候选缓存随之失效，
+        其他进程在 INGEST_CONFIG['sync_interval'] 秒内通过 sync_added_items 同步。
+        每批之前检查请求的截止时间，超时后不再处理剩余条目，计入 deferred（条目ID由内容决定，重新提交不会重复导入）。
+        
+        Args:
+            items (List[Dict]): 条目数据（其中的 type 字段会被忽略）
+            data_type (str): 数据类型
+            
+        Returns:
+            Dict[str, Any]: {'ids': 各条目的ID, 'added': 新增数量, 'skipped': 已存在数量, 'deferred': 超时未处理的数量}
+        """
+        items = [{key: value for key, value in item.items() if key != 'type'} for item in items]
+        item_ids = [self._item_id(item) for item in items]
+        
+        collection = self._get_or_create_collection()
         try:
-            collection.add(
-                ids=batch['ids'],
-                embeddings=batch['embeddings'],
-                metadatas=batch['metadatas'],
-                documents=batch['documents']
-            )
-            logger.info(f"Successfully added batch of {len(batch['ids'])} items")
+            existing = set(collection.get(ids=list(set(item_ids)), include=[])['ids'])
         except Exception as e:
-            logger.error(f"Error adding batch: {str(e)}")
-            # 如果批量添加失败，尝试逐个添加
-            for i in range(len(batch['ids'])):
-                try:
-                    collection.add(
-                        ids=[batch['ids'][i]],
-                        embeddings=[batch['embeddings'][i]],
-                        metadatas=[batch['metadatas'][i]],
-                        documents=[batch['documents'][i]]
-                    )
-                except Exception as e:
-                    logger.error(f"Error adding item {batch['ids'][i]}: {str(e)}")
+            logger.warning(f"Error checking existing items, adding all: {str(e)}")
+            existing = set()
+            
+        new_items = {}
+        for item_id, item in zip(item_ids, items):
+            if item_id not in existing and item_id not in new_items:
+                new_items[item_id] = dict(item, type=data_type)
+        skipped = len(items) - len(new_items)
+        if not new_items:
+            return {'ids': item_ids, 'added': 0, 'skipped': skipped, 'deferred': 0}
+            
+        pending = list(new_items.items())
+        batch_size = INGEST_CONFIG['batch_size']
+        added, deferred = self._new_batch(), 0
+        for start in range(0, len(pending), batch_size):
+            if start and expired():
+                deferred = len(pending) - start
+                logger.warning(f"Ingest deadline exceeded, deferring {deferred} {data_type} items")
+                break
+            chunk = pending[start:start + batch_size]
+            embeddings = self.embedding_service.get_batch_embeddings(
+                [self._prepare_item_text(item, data_type) for _, item in chunk])
+            
+            current_batch, added_at = self._new_batch(), time.time()
+            for (item_id, item), embedding in zip(chunk, embeddings):
+                payload = self._to_payload(embedding)
+                document = json.dumps(item, ensure_ascii=False)
+                current_batch['ids'].append(item_id)
+                current_batch['embeddings'].append(payload)
+                current_batch['metadatas'].append(dict(self._item_metadata(item, data_type), added_at=added_at))
+                current_batch['documents'].append(document)
+                current_batch['bytes'] += self._estimate_payload_bytes(item_id, payload, document)
+                if (len(current_batch['ids']) >= CHROMA_CONFIG['BATCH_SIZE']
+                        or current_batch['bytes'] >= self.upload_batch_bytes):
+                    self._flush_new_items(collection, current_batch, added)
+                    current_batch = self._new_batch()
+            if current_batch['ids']:
+                self._flush_new_items(collection, current_batch, added)
+            
+        with self._added_lock:
+            for item_id, metadata in zip(added['ids'], added['metadatas']):
+                self._added_seen[item_id] = metadata['added_at']
+        self._apply_added_items(added)
+        logger.info(f"Added {len(added['ids'])} {data_type} items ({skipped} already existed)")
+        return {'ids': item_ids, 'added': len(added['ids']), 'skipped': skipped, 'deferred': deferred}
+        
+    def _apply_added_items(self, added: Dict[str, list]):
+        """把新增的条目加入本地索引的增量段（带有向量时），并使这些类型的默认候选缓存失效"""
+        if not added['ids']:
+            return
+        if added['embeddings']:
+            self.index_snapshots.append(added['ids'], added['embeddings'], added['metadatas'], added['documents'])
+        types = {metadata.get('type') for metadata in added['metadatas']}
+        self.default_cache.discard_if(lambda key: key[0] in types)
+        
+    def sync_added_items(self, force: bool = False) -> int:
+        """同步其他进程通过 add_items 导入的条目
+        
+        由本地索引的后台线程每隔 INGEST_CONFIG['sync_interval'] 秒调用，不在查询请求中执行。
+        导入的条目在向量库中带有 added_at 元数据，读取 added_at 晚于上次同步位置的条目（窗口向前多留 sync_lag 秒），
+        加入本地索引的增量段，并使对应类型的默认候选缓存失效。没有加载本地索引时查询直接走向量库，
+        只读取条目的元数据用于使缓存失效，不拉取向量和文档。同一时间只有一个线程同步，其他线程直接返回。
+        
+        Args:
+            force (bool): 忽略同步间隔并等待正在进行的同步完成
+            
+        Returns:
+            int: 新同步的条目数量
+        """
+        if not force and time.monotonic() - self._added_synced_at < INGEST_CONFIG['sync_interval']:
+            return 0
+        if not self._added_lock.acquire(blocking=force):
+            return 0
+        try:
+            self._added_synced_at = time.monotonic()
+            since = self._added_cursor - INGEST_CONFIG['sync_lag']
+            fields = ['embeddings', 'metadatas', 'documents'] if self.index_snapshots.current is not None \
+                else ['metadatas']
+            with timed('vector.sync_added'):
+                results = self._call_collection('get', where={'added_at': {'$gt': since}}, include=fields)
+            added = self._new_batch()
+            for i, item_id in enumerate(results['ids']):
+                added_at = results['metadatas'][i].get('added_at', since)
+                self._added_cursor = max(self._added_cursor, added_at)
+                if item_id in self._added_seen:
                     continue
+                self._added_seen[item_id] = added_at
+                added['ids'].append(item_id)
+                for key in fields:
+                    added[key].append(results[key][i])
+            window = self._added_cursor - INGEST_CONFIG['sync_lag']
+            self._added_seen = {item_id: t for item_id, t in self._added_seen.items() if t > window}
+        except Exception as e:
+            logger.warning(f"Error syncing added items: {str(e)}")
+            return 0
+        finally:
+            self._added_lock.release()
+        self._apply_added_items(added)
+        if added['ids']:
+            logger.info(f"Synced {len(added['ids'])} items added by other processes")
+        return len(added['ids'])
+        
+    def _index_exported_at(self) -> float:
+        """当前本地索引从向量库导出的时间，之后导入的条目需要同步；没有本地索引时为当前时间"""
+        snapshot = self.index_snapshots.current
+        if snapshot is None:
+            return time.time()
+        base = getattr(snapshot.index, 'base', snapshot.index)
+        return float(base.stats.get('exported_at', 0.0))
+        
+    def _flush_new_items(self, collection, batch, added):
+        """写入一批新条目，把确认写入成功的条目追加到 added"""
+        if self._flush_batch(collection, batch) == len(batch['ids']):
+            rows = range(len(batch['ids']))
+        else:
+            # 部分失败时只保留实际写入的条目
+            stored = set(collection.get(ids=batch['ids'], include=[])['ids'])
+            rows = [i for i, item_id in enumerate(batch['ids']) if item_id in stored]
+        for key in ('ids', 'embeddings', 'metadatas', 'documents'):
+            added[key].extend(batch[key][i] for i in rows)
+            
+    @staticmethod
+    def _item_metadata(item: Dict, data_type: str) -> Dict[str, Any]:
+        """条目的元数据：类型和条目自身的内容ID（各类型分别编号，没有 id 字段时省略）"""
+        metadata = {"type": data_type}
+        if item.get('id') is not None:
+            metadata['item_id'] = str(item['id'])
+        return metadata
+        
+    @staticmethod
+    def _item_id(item: Dict) -> str:
+        """条目ID：条目内容的 MD5"""
+        return hashlib.md5(json.dumps(item, sort_keys=True).encode()).hexdigest()
+        
+    @staticmethod
+    def _new_batch() -> Dict[str, Any]:
+        """创建空的写入批次，bytes 为估算的请求体大小"""
+        return {
+            'ids': [],
+            'embeddings': [],
+            'metadatas': [],
+            'documents': [],
+            'bytes': 0
+        }
+        
+    @staticmethod
+    def _estimate_payload_bytes(item_id: str, embedding: List[float], document: str) -> int:
+        """估算一个条目在写入请求中占用的字节数（向量按 JSON 中每个数字的最大长度估算）"""
+        number_bytes = CHROMA_CONFIG['EMBEDDING_DECIMALS'] + 4
+        return len(item_id) + len(document.encode('utf-8')) + len(embedding) * number_bytes + 32
+        
+    def _flush_batch(self, collection, batch) -> int:
+        """写入一个批次并调整后续批次的目标大小
+        
+        有条目写入失败时目标字节数减半（不低于 BATCH_MIN_BYTES），整批成功时增加四分之一（不超过 BATCH_MAX_BYTES），
+        遇到请求体过大或服务端超时等问题时批次会自动变小，恢复后再逐步变大。
+        
+        Returns:
+            int: 成功写入的条目数
+        """
+        added = self._add_batch(collection, batch)
+        if added < len(batch['ids']):
+            self.upload_batch_bytes = max(self.upload_batch_bytes // 2, CHROMA_CONFIG['BATCH_MIN_BYTES'])
+        else:
+            self.upload_batch_bytes = min(int(self.upload_batch_bytes * 1.25), CHROMA_CONFIG['BATCH_MAX_BYTES'])
+        return added
+        
+    def _add_batch(self, collection, batch) -> int:
+        """添加批量数据到集合
+        
+        整批失败时拆成两半分别重试，直到单个条目仍然失败才放弃该条目：
+        一条坏数据只会多出 O(log n) 次请求，而不是把整批拆成逐条写入。
+        
+        Returns:
+            int: 成功写入的条目数
+        """
+        size = len(batch['ids'])
+        try:
+            observe_batch('chroma.add', size)
+            with timed('chroma.add'):
+                collection.add(
+                    ids=batch['ids'],
+                    embeddings=batch['embeddings'],
+                    metadatas=batch['metadatas'],
+                    documents=batch['documents']
+                )
+            logger.info(f"Successfully added batch of {size} items")
+            return size
+        except Exception as e:
+            if size == 1:
+                logger.error(f"Error adding item {batch['ids'][0]}: {str(e)}")
+                return 0
+            logger.warning(f"Error adding batch of {size} items, retrying in halves: {str(e)}")
+            middle = size // 2
+            halves = [
+                {key: batch[key][start:end] for key in ('ids', 'embeddings', 'metadatas', 'documents')}
+                for start, end in ((0, middle), (middle, size))
+            ]
+            return sum(self._add_batch(collection, half) for half in halves)
             
     def _prepare_item_text(self, item: Dict, data_type: str) -> str:
         """准备项目文本
@@ -246,11 +1105,16 @@ class ChromaService:
             tags = ' '.join(item.get('tags', []))
             return f"{title} {content} {tags}"
             
-    def _build_user_profile_text(self, user_behavior: Dict, recommend_type: str) -> str:
+    def _build_default_query_text(self, recommend_type: str) -> str:
+        """构建默认推荐的查询文本"""
+        type_desc = CONTENT_TYPES.get(recommend_type, recommend_type)
+        return f"推荐{type_desc}相关内容"
+        
+    def _build_user_profile_text(self, user_behavior: List[Dict], recommend_type: str) -> str:
         """构建用户画像文本
         
         Args:
-            user_behavior (Dict): 用户行为数据
+            user_behavior (List[Dict]): 用户行为记录（DatabaseService.get_user_behavior 的返回值）
             recommend_type (str): 推荐类型
             
         Returns:
@@ -258,24 +1122,21 @@ class ChromaService:
         """
         texts = []
         
-        # 添加用户偏好
-        if user_behavior.get('preferences'):
-            texts.extend(user_behavior['preferences'])
-            
-        # 添加历史记录
-        if user_behavior.get('history'):
-            texts.extend(user_behavior['history'])
+        # 添加历史记录的行为描述
+        for behavior in user_behavior or []:
+            if behavior.get('description'):
+                texts.append(behavior['description'])
             
         # 添加推荐类型
         texts.append(f"推荐{CONTENT_TYPES[recommend_type]}")
         
         return ' '.join(texts)
         
-    def _build_user_history_text(self, user_history: Dict) -> str:
+    def _build_user_history_text(self, user_history: List[Dict]) -> str:
         """构建用户历史行为文本
         
         Args:
-            user_history (Dict): 用户历史行为数据
+            user_history (List[Dict]): 用户行为记录
             
         Returns:
             str: 历史行为文本
@@ -283,14 +1144,9 @@ class ChromaService:
         texts = []
         
         # 添加历史交互
-        if user_history.get('interactions'):
-            for interaction in user_history['interactions']:
-                action = interaction.get('action', '')
-                item_text = self._prepare_item_text(interaction.get('item', {}), interaction.get('type', ''))
-                texts.append(f"{action} {item_text}")
-                
-        # 添加用户标签
-        if user_history.get('tags'):
-            texts.extend(user_history['tags'])
+        for interaction in user_history or []:
+            action = interaction.get('action', '')
+            description = interaction.get('description') or ''
+            texts.append(f"{action} {description}".strip())
             
-        return ' '.join(texts) 
\ No newline at end of file
+        return ' '.join(texts)
\ No newline at end of file
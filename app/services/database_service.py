@@ -1,43 +1,94 @@
-from sqlalchemy import create_engine, desc
-from sqlalchemy.orm import sessionmaker
-from app.models.user_behavior import Base, UserBehavior
-from config.settings import DATABASE_URL
-from datetime import datetime
+from sqlalchemy import create_engine, desc, func, inspect, text
+from sqlalchemy.orm import sessionmaker, scoped_session
+from app.models.user_behavior import Base, UserBehavior, typed_item_key
+from app.models.user_seen_filter import UserSeenFilter
+from app.models.precomputed_recommendation import PrecomputedRecommendation
+from config.settings import DATABASE_URL, SEEN_FILTER_CONFIG, POPULARITY_CONFIG
+from utils.bloom_filter import BloomFilter
+from utils.cache import TTLCache
+from utils.metrics import timed, register_cache
+from utils.popularity import PopularityTracker
+from datetime import datetime, timedelta
 import logging
+import threading
+import time
 
 logger = logging.getLogger(__name__)
 
 class DatabaseService:
-    def __init__(self):
-        """初始化数据库服务"""
-        self.engine = create_engine(DATABASE_URL)
+    def __init__(self, database_url: str = None):
+        """初始化数据库服务
+        
+        Args:
+            database_url (str, optional): 数据库连接地址，默认使用配置中的 DATABASE_URL
+        """
+        self.engine = create_engine(database_url or DATABASE_URL)
         Base.metadata.create_all(self.engine)
-        Session = sessionmaker(bind=self.engine)
-        self.session = Session()
+        self._add_missing_columns()
+        # 线程局部的会话，允许在线程池中并发访问数据库
+        self.session = scoped_session(sessionmaker(bind=self.engine))
+        self.seen_filters = TTLCache(
+            max_size=SEEN_FILTER_CONFIG['cache_size'],
+            ttl=SEEN_FILTER_CONFIG['cache_ttl']
+        )
+        register_cache('seen_filter', self.seen_filters)
+        # 带时间衰减的条目热度：本进程接收的行为直接计入，其他进程写入的行为定期从数据库读取
+        self.popularity = None
+        if POPULARITY_CONFIG['enabled']:
+            self.popularity = PopularityTracker(
+                half_life_hours=POPULARITY_CONFIG['half_life_hours'],
+                width=POPULARITY_CONFIG['sketch_width'],
+                depth=POPULARITY_CONFIG['sketch_depth'],
+                top_k=POPULARITY_CONFIG['top_k'],
+                action_weights=POPULARITY_CONFIG['action_weights'],
+                catalog_size=POPULARITY_CONFIG['catalog_size']
+            )
+        self._popularity_cursor = None       # 已聚合的最大行为ID，None 表示还没有回放
+        self._popularity_synced_at = 0.0
+        self._popularity_recorded = set()    # 本进程已直接计入、尚未被同步读到的行为ID
+        self._popularity_lock = threading.Lock()
+        
+    def _add_missing_columns(self):
+        """为旧版本创建的表补充新增的可空列（create_all 不会修改已存在的表）"""
+        inspector = inspect(self.engine)
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing or not column.nullable:
+                    continue
+                column_type = column.type.compile(dialect=self.engine.dialect)
+                with self.engine.begin() as connection:
+                    connection.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+                logger.info(f"Added column {table.name}.{column.name}")
         
-    def get_user_behavior(self, user_id: str, limit: int = 100) -> list:
+    def get_user_behavior(self, user_id: str, limit: int = 100, since: datetime = None) -> list:
         """获取用户行为数据
         
         Args:
             user_id (str): 用户ID
             limit (int, optional): 返回的记录数量限制. 默认为 100.
+            since (datetime, optional): 只返回该时间之后的记录
             
         Returns:
             list: 用户行为记录列表
         """
         try:
-            behaviors = self.session.query(UserBehavior)\
-                .filter_by(user_id=user_id)\
-                .order_by(desc(UserBehavior.timestamp))\
-                .limit(limit)\
-                .all()
+            with timed('db.user_behavior'):
+                query = self.session.query(UserBehavior).filter_by(user_id=user_id)
+                if since is not None:
+                    query = query.filter(UserBehavior.timestamp > since)
+                behaviors = query.order_by(desc(UserBehavior.timestamp))\
+                    .limit(limit)\
+                    .all()
             return [behavior.to_dict() for behavior in behaviors]
         except Exception as e:
             logger.error(f"Error getting user behavior: {str(e)}")
             return []
             
     def add_user_behavior(self, user_id: str, item_id: str, action: str,
-                         description: str = None, source: str = None) -> dict:
+                         description: str = None, source: str = None, item_type: str = None) -> dict:
         """添加用户行为记录
         
         Args:
@@ -46,6 +97,7 @@ class DatabaseService:
             action (str): 行为类型
             description (str, optional): 行为描述
             source (str, optional): 行为来源
+            item_type (str, optional): 内容类型；各类型的内容ID可能相同，提供类型时已看过滤和热度统计只作用于该类型的内容
             
         Returns:
             dict: 新增的行为记录
@@ -58,18 +110,30 @@ class DatabaseService:
                 action=action,
                 description=description,
                 timestamp=datetime.now(),
-                source=source
+                source=source,
+                item_type=item_type
             )
             
-            # 添加到数据库
-            self.session.add(behavior)
-            self.session.commit()
+            # 添加到数据库，同时更新已看过滤器
+            with timed('db.add_behavior'):
+                self.session.add(behavior)
+                if action in SEEN_FILTER_CONFIG['actions']:
+                    self._add_to_seen_filter(user_id, typed_item_key(item_id, item_type))
+                self.session.flush()
+                # 提交前登记，之后的同步读到这条记录时跳过，不会重复计入
+                if self.popularity is not None:
+                    self._popularity_recorded.add(behavior.id)
+                self.session.commit()
             
+            if self.popularity is not None:
+                self.popularity.record(typed_item_key(item_id, item_type), action,
+                                       behavior.timestamp.timestamp(), item_type)
             return behavior.to_dict()
             
         except Exception as e:
             logger.error(f"Error adding user behavior: {str(e)}")
             self.session.rollback()
+            self.seen_filters.pop(user_id)
             return None
             
     def get_user_actions(self, user_id: str, start_time: datetime = None,
@@ -102,6 +166,254 @@ class DatabaseService:
             logger.error(f"Error getting user actions: {str(e)}")
             return []
             
+    def get_item_popularity(self, item_ids: list, days: int = None) -> dict:
+        """统计条目的交互次数
+        
+        Args:
+            item_ids (list): 内容ID列表
+            days (int, optional): 只统计最近若干天的行为
+            
+        Returns:
+            dict: 条目键（typed_item_key，未记录类型的行为为内容ID）到交互次数的映射
+        """
+        if not item_ids:
+            return {}
+        try:
+            query = self.session.query(UserBehavior.item_id, UserBehavior.item_type, func.count(UserBehavior.id))\
+                .filter(UserBehavior.item_id.in_(item_ids))
+            if days:
+                query = query.filter(UserBehavior.timestamp >= datetime.now() - timedelta(days=days))
+            with timed('db.popularity'):
+                rows = query.group_by(UserBehavior.item_id, UserBehavior.item_type).all()
+            return {typed_item_key(item_id, item_type): count for item_id, item_type, count in rows}
+        except Exception as e:
+            logger.error(f"Error getting item popularity: {str(e)}")
+            return {}
+            
+    def popularity_tracker(self) -> PopularityTracker:
+        """热度统计，距上次同步超过 sync_interval 时先读取新的行为记录
+        
+        Returns:
+            PopularityTracker: 未启用时返回 None
+        """
+        if self.popularity is None:
+            return None
+        self.sync_popularity()
+        return self.popularity
+        
+    def sync_popularity(self, force: bool = False) -> int:
+        """把数据库中尚未计入的行为记录计入热度统计
+        
+        第一次同步回放最近 replay_days 天的行为，之后按行为ID增量读取。
+        同一时间只有一个线程同步，其他线程直接使用当前的统计结果。
+        
+        Args:
+            force (bool): 忽略同步间隔并等待正在进行的同步完成
+            
+        Returns:
+            int: 新计入的行为数量
+        """
+        if self.popularity is None:
+            return 0
+        if not force and time.monotonic() - self._popularity_synced_at < POPULARITY_CONFIG['sync_interval']:
+            return 0
+        if not self._popularity_lock.acquire(blocking=force):
+            return 0
+        try:
+            query = self.session.query(
+                UserBehavior.id, UserBehavior.item_id, UserBehavior.item_type, UserBehavior.action,
+                UserBehavior.timestamp
+            )
+            cursor = self._popularity_cursor
+            if cursor is None:
+                query = query.filter(
+                    UserBehavior.timestamp >= datetime.now() - timedelta(days=POPULARITY_CONFIG['replay_days'])
+                )
+                cursor = 0
+            
+            recorded = self._popularity_recorded
+            added = 0
+            with timed('db.popularity_sync'):
+                while True:
+                    rows = query.filter(UserBehavior.id > cursor)\
+                        .order_by(UserBehavior.id)\
+                        .limit(POPULARITY_CONFIG['sync_batch_size'])\
+                        .all()
+                    for row in rows:
+                        if row.id in recorded:
+                            continue
+                        timestamp = row.timestamp.timestamp() if row.timestamp else None
+                        self.popularity.record(typed_item_key(row.item_id, row.item_type), row.action, timestamp,
+                                               row.item_type, origin='replay')
+                        added += 1
+                    if rows:
+                        cursor = rows[-1].id
+                    if len(rows) < POPULARITY_CONFIG['sync_batch_size']:
+                        break
+            
+            recorded.difference_update([behavior_id for behavior_id in list(recorded) if behavior_id <= cursor])
+            if self._popularity_cursor is None:
+                logger.info(f"Replayed {added} behavior events into popularity counts")
+            self._popularity_cursor = cursor
+            self._popularity_synced_at = time.monotonic()
+            return added
+        except Exception as e:
+            logger.error(f"Error syncing popularity counts: {str(e)}")
+            self.session.rollback()
+            return 0
+        finally:
+            self._popularity_lock.release()
+            
+    def get_seen_filter(self, user_id: str) -> BloomFilter:
+        """获取用户已看条目的布隆过滤器
+        
+        优先读取内存缓存，其次读取持久化的过滤器；都不存在时根据历史行为重建。
+        
+        Args:
+            user_id (str): 用户ID
+            
+        Returns:
+            BloomFilter: 已看过滤器，出错时返回 None
+        """
+        bloom = self.seen_filters.get(user_id)
+        if bloom is not None:
+            return bloom
+        try:
+            with timed('db.seen_filter'):
+                record = self.session.get(UserSeenFilter, user_id)
+                if record is not None:
+                    bloom = BloomFilter.from_bytes(record.bits)
+                else:
+                    bloom = self._rebuild_seen_filter(user_id)
+                    self.session.commit()
+            self.seen_filters.set(user_id, bloom)
+            return bloom
+        except Exception as e:
+            logger.error(f"Error getting seen filter: {str(e)}")
+            self.session.rollback()
+            return None
+            
+    def _add_to_seen_filter(self, user_id: str, item_key: str):
+        """将条目加入用户的已看过滤器（由调用方提交事务）
+        
+        Args:
+            user_id (str): 用户ID
+            item_key (str): typed_item_key 生成的条目键
+        """
+        # 多个进程各自缓存了过滤器，在缓存上添加后整体写回会覆盖其他进程的添加。
+        # 先写入行为记录再锁定读取持久化的过滤器（SQLite 写入后本事务已持有写锁，其他数据库加行锁），
+        # 在最新的过滤器上添加，提交前其他进程的添加会等待
+        self.session.flush()
+        record = self.session.query(UserSeenFilter)\
+            .filter_by(user_id=user_id)\
+            .with_for_update()\
+            .populate_existing()\
+            .one_or_none()
+        bloom = BloomFilter.from_bytes(record.bits) if record is not None else None
+            
+        if bloom is None or bloom.is_full:
+            # 过滤器不存在或已满时按历史行为重建（重建时会包含本条未提交的行为）
+            capacity = SEEN_FILTER_CONFIG['capacity']
+            if bloom is not None:
+                capacity = bloom.capacity * 2
+            bloom = self._rebuild_seen_filter(user_id, capacity)
+        else:
+            bloom.add(item_key)
+            self._save_seen_filter(user_id, bloom)
+        self.seen_filters.set(user_id, bloom)
+        
+    def _rebuild_seen_filter(self, user_id: str, capacity: int = None) -> BloomFilter:
+        """根据用户历史行为重建并保存已看过滤器"""
+        item_keys = [typed_item_key(item_id, item_type) for item_id, item_type in
+                     self.session.query(UserBehavior.item_id, UserBehavior.item_type)
+                     .filter(UserBehavior.user_id == user_id)
+                     .filter(UserBehavior.action.in_(SEEN_FILTER_CONFIG['actions']))
+                     .distinct()
+                     .all()]
+        capacity = max(capacity or SEEN_FILTER_CONFIG['capacity'], len(item_keys) * 2)
+        bloom = BloomFilter(capacity=capacity, error_rate=SEEN_FILTER_CONFIG['error_rate'])
+        for item_key in item_keys:
+            bloom.add(item_key)
+        self._save_seen_filter(user_id, bloom)
+        return bloom
+        
+    def _save_seen_filter(self, user_id: str, bloom: BloomFilter):
+        """持久化已看过滤器"""
+        self.session.merge(UserSeenFilter(
+            user_id=user_id,
+            bits=bloom.to_bytes(),
+            item_count=len(bloom),
+            updated_at=datetime.now()
+        ))
+        
+    def get_active_users(self, days: int = 7, min_events: int = 1) -> list:
+        """获取最近活跃的用户
+        
+        Args:
+            days (int): 统计最近多少天内有行为的用户
+            min_events (int): 该时间段内的最少行为数量
+            
+        Returns:
+            list: 用户ID列表，按行为数量降序
+        """
+        try:
+            start_time = datetime.now() - timedelta(days=days)
+            count = func.count(UserBehavior.id)
+            rows = self.session.query(UserBehavior.user_id)\
+                .filter(UserBehavior.timestamp >= start_time)\
+                .group_by(UserBehavior.user_id)\
+                .having(count >= min_events)\
+                .order_by(desc(count))\
+                .all()
+            return [row.user_id for row in rows]
+        except Exception as e:
+            logger.error(f"Error getting active users: {str(e)}")
+            return []
+            
+    def get_precomputed_recommendation(self, user_id: str, recommend_type: str) -> dict:
+        """读取预计算的推荐结果
+        
+        Returns:
+            dict: PrecomputedRecommendation.to_dict() 的结果，不存在或出错时返回 None
+        """
+        try:
+            with timed('db.precomputed'):
+                record = self.session.get(PrecomputedRecommendation, (user_id, recommend_type))
+            return record.to_dict() if record is not None else None
+        except Exception as e:
+            logger.error(f"Error getting precomputed recommendation: {str(e)}")
+            return None
+            
+    def save_precomputed_recommendations(self, records: list) -> int:
+        """批量写入（覆盖）预计算的推荐结果
+        
+        Args:
+            records (list): PrecomputedRecommendation 对象列表
+            
+        Returns:
+            int: 写入的记录数量，出错时返回 0
+        """
+        try:
+            for record in records:
+                self.session.merge(record)
+            self.session.commit()
+            return len(records)
+        except Exception as e:
+            logger.error(f"Error saving precomputed recommendations: {str(e)}")
+            self.session.rollback()
+            return 0
+            
+    def run_and_release(self, func, *args, **kwargs):
+        """执行 func 后归还当前线程的会话连接
+        
+        线程池中的工作线程会长期存活，如果不归还，每个线程都会一直占用一个连接，
+        线程数超过连接池容量时其余查询会阻塞到超时。
+        """
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self.session.remove()
+            
     def close(self):
         """关闭数据库连接"""
-        self.session.close()
\ No newline at end of file
+        self.session.remove()
\ No newline at end of file
@@ -0,0 +1,214 @@
+from app.services.database_service import DatabaseService
+from app.models.user_behavior import typed_item_key
+from config.settings import RANKING_CONFIG
+from utils.diversity import mmr_select
+from datetime import datetime
+import numpy as np
+import logging
+import re
+from typing import List, Dict, Any, Optional, Container
+
+logger = logging.getLogger(__name__)
+
+# 条目中可能表示发布时间的字段，按优先级排列
+DATE_FIELDS = ['date', 'publish_date', 'pub_date', 'created_at', 'time', 'year']
+
+
+def item_key(item: Dict[str, Any], fallback: str = None) -> str:
+    """条目的键（类型 + 对外ID），用于去重、已看过滤和热度统计，没有 id 字段时使用 fallback"""
+    item_id = item.get('id')
+    return typed_item_key(item_id, item.get('type')) if item_id is not None else fallback
+
+
+def untyped_keys(candidates: Dict[str, Any]) -> List[Optional[str]]:
+    """未记录类型的旧行为使用的键（对外ID），与条目键相同时为 None"""
+    keys = []
+    for key, item in zip(candidates['keys'], candidates['items']):
+        item_id = item.get('id')
+        keys.append(str(item_id) if item_id is not None and str(item_id) != key else None)
+    return keys
+
+
+def seen_mask(candidates: Dict[str, Any], seen_ids: Container[str]) -> np.ndarray:
+    """候选条目是否已看过
+
+    按条目键判断；未记录类型的旧行为在过滤器中只有对外ID，也按对外ID判断。
+    """
+    return np.fromiter(
+        (key in seen_ids or (untyped is not None and untyped in seen_ids)
+         for key, untyped in zip(candidates['keys'], untyped_keys(candidates))),
+        dtype=bool, count=len(candidates['keys'])
+    )
+
+
+def parse_item_time(item: Dict[str, Any]) -> float:
+    """解析条目的发布时间
+
+    Returns:
+        float: Unix 时间戳，无法解析时返回 nan
+    """
+    for field in DATE_FIELDS:
+        value = item.get(field)
+        if not value:
+            continue
+        text = str(value)
+        match = re.search(r'(\d{4})(?:[-/.年](\d{1,2}))?(?:[-/.月](\d{1,2}))?', text)
+        if not match:
+            continue
+        try:
+            year = int(match.group(1))
+            month = int(match.group(2) or 1)
+            day = int(match.group(3) or 1)
+            return datetime(year, month, day).timestamp()
+        except ValueError:
+            continue
+    return float('nan')
+
+
+def select_candidates(candidates: Dict[str, Any], positions) -> Dict[str, Any]:
+    """按位置选取候选集的子集，保持各字段对齐"""
+    positions = np.asarray(positions, dtype=np.int64)
+    selected = {
+        'keys': [candidates['keys'][i] for i in positions],
+        'ids': [candidates['ids'][i] for i in positions],
+        'documents': [candidates['documents'][i] for i in positions],
+        'items': [candidates['items'][i] for i in positions],
+        'relevance': candidates['relevance'][positions],
+        'embeddings': None
+    }
+    if candidates.get('embeddings') is not None:
+        selected['embeddings'] = candidates['embeddings'][positions]
+    if candidates.get('scores') is not None:
+        selected['scores'] = candidates['scores'][positions]
+    return selected
+
+
+class RankingService:
+    """排序服务：合并多路召回的候选集，并用 NumPy 向量化打分"""
+
+    def __init__(self, db_service: DatabaseService):
+        self.db_service = db_service
+
+    def merge_candidates(self, candidate_sets: List[Dict[str, Any]], weights: Dict[str, float]) -> Dict[str, Any]:
+        """合并多路候选集并去重
+
+        同一条目被多路召回时，相关度为各路 `权重 * 相似度` 之和。
+
+        Args:
+            candidate_sets (List[Dict]): 各路召回结果
+            weights (Dict[str, float]): 召回来源到权重的映射
+
+        Returns:
+            Dict[str, Any]: 合并后的候选集
+        """
+        position_of = {}
+        merged = {'keys': [], 'ids': [], 'documents': [], 'items': [], 'embeddings': []}
+        relevance = []
+        has_embeddings = bool(candidate_sets) and all(c.get('embeddings') is not None for c in candidate_sets)
+
+        for candidates in candidate_sets:
+            weight = weights.get(candidates['source'], 1.0)
+            for i, item in enumerate(candidates['items']):
+                key = item_key(item, candidates['ids'][i])
+                score = weight * float(candidates['similarities'][i])
+                if key in position_of:
+                    relevance[position_of[key]] += score
+                    continue
+                position_of[key] = len(merged['keys'])
+                merged['keys'].append(key)
+                merged['ids'].append(candidates['ids'][i])
+                merged['documents'].append(candidates['documents'][i])
+                merged['items'].append(item)
+                relevance.append(score)
+                if has_embeddings:
+                    merged['embeddings'].append(candidates['embeddings'][i])
+
+        merged['relevance'] = np.asarray(relevance, dtype=np.float32)
+        merged['embeddings'] = np.asarray(merged['embeddings'], dtype=np.float32) if has_embeddings else None
+        return merged
+
+    def score(self, candidates: Dict[str, Any], seen_ids: Optional[Container[str]] = None) -> np.ndarray:
+        """计算候选条目的综合得分
+
+        得分 = 相关度 * similarity_weight + 新鲜度 * recency_weight + 热度 * popularity_weight，
+        已看过的条目得分为 -inf。
+
+        Args:
+            candidates (Dict[str, Any]): 合并后的候选集
+            seen_ids (Container[str], optional): 用户已看过的条目ID（集合或布隆过滤器）
+
+        Returns:
+            np.ndarray: 每个候选的得分
+        """
+        keys = candidates['keys']
+        if not keys:
+            return np.array([], dtype=np.float32)
+
+        relevance = candidates['relevance']
+        span = relevance.max() - relevance.min()
+        relevance = (relevance - relevance.min()) / span if span > 0 else np.ones_like(relevance)
+
+        # 新鲜度：按半衰期指数衰减，缺少时间的条目记为 0
+        timestamps = np.array([parse_item_time(item) for item in candidates['items']], dtype=np.float64)
+        age_days = np.maximum(datetime.now().timestamp() - timestamps, 0) / 86400
+        recency = np.nan_to_num(0.5 ** (age_days / RANKING_CONFIG['recency_half_life_days']), nan=0.0)
+
+        # 热度：近期交互次数的对数，归一化到 0~1
+        popularity = np.log1p(self.popularity_counts(candidates))
+        if popularity.max() > 0:
+            popularity /= popularity.max()
+
+        scores = (RANKING_CONFIG['similarity_weight'] * relevance
+                  + RANKING_CONFIG['recency_weight'] * recency.astype(np.float32)
+                  + RANKING_CONFIG['popularity_weight'] * popularity).astype(np.float32)
+
+        if seen_ids:
+            scores[seen_mask(candidates, seen_ids)] = -np.inf
+        return scores
+
+    def popularity_counts(self, candidates: Dict[str, Any]) -> np.ndarray:
+        """候选条目的热度
+
+        启用热度统计时读取带时间衰减的加权交互数（同时记录条目的向量库ID和类型，供热门推荐使用），
+        否则按数据库中最近 popularity_window_days 天的交互次数统计。
+        未记录类型的旧行为按对外ID计数，同时计入各类型中ID相同的条目。
+        """
+        keys = candidates['keys']
+        untyped = untyped_keys(candidates)
+        tracker = self.db_service.popularity_tracker()
+        if tracker is not None:
+            tracker.remember(keys, candidates['ids'], [item.get('type') for item in candidates['items']])
+            scores = tracker.scores(keys)
+            legacy = [i for i, key in enumerate(untyped) if key is not None]
+            if legacy:
+                scores[legacy] += tracker.scores([untyped[i] for i in legacy])
+            return scores
+        item_ids = list({legacy if legacy is not None else key for key, legacy in zip(keys, untyped)})
+        counts = self.db_service.get_item_popularity(item_ids, days=RANKING_CONFIG['popularity_window_days'])
+        return np.array([counts.get(key, 0) + (counts.get(legacy, 0) if legacy is not None else 0)
+                         for key, legacy in zip(keys, untyped)], dtype=np.float32)
+
+    def rank(self, candidates: Dict[str, Any], limit: int, seen_ids: Optional[Container[str]] = None,
+             diversity_lambda: Optional[float] = None) -> Dict[str, Any]:
+        """打分并截取前 limit 个条目
+
+        Args:
+            candidates (Dict[str, Any]): 合并后的候选集
+            limit (int): 返回数量
+            seen_ids (Container[str], optional): 用户已看过的条目ID（集合或布隆过滤器）
+            diversity_lambda (float, optional): 设置且候选集带有向量时，使用 MMR 做多样化选择
+
+        Returns:
+            Dict[str, Any]: 按得分降序（或 MMR 选择顺序）排列的候选集，附带 scores 字段
+        """
+        scores = self.score(candidates, seen_ids)
+        candidates['scores'] = scores
+        valid = np.flatnonzero(np.isfinite(scores))
+        order = valid[np.argsort(-scores[valid], kind='stable')]
+
+        if diversity_lambda is not None and diversity_lambda < 1 and candidates.get('embeddings') is not None:
+            pool = order[:limit * RANKING_CONFIG['diversity_pool_multiplier']]
+            picked = mmr_select(scores[pool], candidates['embeddings'][pool], limit, diversity_lambda)
+            return select_candidates(candidates, pool[picked])
+
+        return select_candidates(candidates, order[:limit])
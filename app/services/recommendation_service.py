@@ -1,101 +1,499 @@
 from app.services.database_service import DatabaseService
 from app.services.chroma_service import ChromaService
-from config.settings import RECOMMENDATION_CONFIG
+from app.services.ranking_service import RankingService, select_candidates
+from config.settings import (
+    RECOMMENDATION_CONFIG, RANKING_CONFIG, SEEN_FILTER_CONFIG, CONCURRENCY_CONFIG, CACHE_CONFIG, PAGINATION_CONFIG,
+    PRECOMPUTE_CONFIG, ADMISSION_CONFIG, INGEST_CONFIG, MEMORY_CONFIG
+)
+from utils.admission import AdmissionController, Overloaded, remaining
+from utils.cache import TTLCache
+from utils.memory import MemoryBudget
+from utils.metrics import timed, register_cache, register_executor, submit_with_context
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from contextlib import nullcontext
+from datetime import datetime, timedelta
 import logging
+import secrets
+import time
 
 logger = logging.getLogger(__name__)
 
 class RecommendationService:
-    def __init__(self, db_service: DatabaseService):
-        """初始化推荐服务"""
-        self.db_service = db_service
-        self.chroma_service = ChromaService()
+    def __init__(self, db_service: DatabaseService, chroma_service: ChromaService = None):
+        """初始化推荐服务
         
-    def get_recommendations(self, user_id: str, recommend_type: str, limit: int = None):
+        Args:
+            db_service (DatabaseService): 数据库服务
+            chroma_service (ChromaService, optional): 向量库服务，默认按配置创建
+        """
+        self.db_service = db_service
+        self.chroma_service = chroma_service if chroma_service is not None else ChromaService(db_service)
+        self.ranking_service = RankingService(db_service)
+        self.executor = ThreadPoolExecutor(
+            max_workers=CONCURRENCY_CONFIG['max_workers'],
+            thread_name_prefix='recommend-stage'
+        )
+        register_executor('recommend-stage', self.executor)
+        self.feeds = TTLCache(**CACHE_CONFIG['recommendation_feeds'])
+        register_cache('recommendation_feeds', self.feeds)
+        self.admission = None
+        self.ingest_admission = None
+        if ADMISSION_CONFIG['enabled']:
+            self.admission = AdmissionController(
+                'recommend',
+                ADMISSION_CONFIG['max_concurrent'],
+                ADMISSION_CONFIG['max_queue'],
+                ADMISSION_CONFIG['max_wait']
+            )
+            self.ingest_admission = AdmissionController(
+                'ingest',
+                INGEST_CONFIG['max_concurrent'],
+                INGEST_CONFIG['max_queue'],
+                INGEST_CONFIG['max_wait']
+            )
+        # 常驻内存超出预算时清理缓存，在请求进入在线召回前按间隔检查
+        self.memory_budget = MemoryBudget(
+            MEMORY_CONFIG['rss_budget_mb'],
+            check_interval=MEMORY_CONFIG['check_interval'],
+            trim_fraction=MEMORY_CONFIG['trim_fraction']
+        )
+    
+    def get_recommendations(self, user_id: str, recommend_type: str, limit: int = None, timings: dict = None,
+                            diversity_lambda: float = None):
         """获取推荐内容
         
+        分两个阶段：先从多个召回来源获取候选池，再对候选池统一打分排序，返回恰好 limit 个条目
+        （候选不足时除外）。
+        
         Args:
             user_id (str): 用户ID
             recommend_type (str): 推荐类型
             limit (int, optional): 返回结果数量. 默认为配置中的默认值
-            
+            timings (dict, optional): 传入时写入各阶段耗时（毫秒）
+            diversity_lambda (float, optional): MMR 多样化参数，默认使用配置值
+        
         Returns:
             list: 推荐内容列表
         """
         try:
-            # 如果未指定limit，使用默认值
-            if limit is None:
-                limit = RECOMMENDATION_CONFIG['default_results']
-            
-            # 获取用户行为数据
-            user_behavior = self.db_service.get_user_behavior(user_id)
+            ranked = self.rank_candidates(user_id, recommend_type, limit, timings, diversity_lambda)
+            return ranked['items']
+        
+        except Exception as e:
+            logger.error(f"Error in get_recommendations: {str(e)}")
+            raise
+    
+    def rank_candidates(self, user_id: str, recommend_type: str, limit: int = None, timings: dict = None,
+                        diversity_lambda: float = None) -> dict:
+        """执行召回和排序，返回排序后的候选集
+        
+        在线召回（模型推理与向量检索）受准入控制限制，过载时降级为 rank_fallback 的结果。
+        
+        Args:
+            user_id (str): 用户ID
+            recommend_type (str): 推荐类型
+            limit (int, optional): 返回结果数量
+            timings (dict, optional): 传入时写入各阶段耗时（毫秒）
+            diversity_lambda (float, optional): MMR 多样化参数，默认使用配置值
+        
+        Returns:
+            dict: 排序后的候选集（字段见 RankingService.rank），降级结果带有 fallback 字段
             
-            # 如果用户没有行为数据，返回默认推荐
-            if not user_behavior:
-                logger.info(f"No behavior data found for user {user_id}, using default recommendations")
-                return self.chroma_service.get_default_recommendations(recommend_type, limit)
+        Raises:
+            Overloaded: 过载且没有可用的降级结果
+        """
+        timings = timings if timings is not None else {}
+        
+        # 如果未指定limit，使用默认值
+        if limit is None:
+            limit = RECOMMENDATION_CONFIG['default_results']
+        diversity_lambda = self.resolve_diversity(diversity_lambda)
+        
+        with timed('recommend.total', timings, 'total'):
+            # 活跃用户优先使用离线预计算的结果
+            if PRECOMPUTE_CONFIG['enabled'] and diversity_lambda is None:
+                ranked = self.rank_precomputed(user_id, recommend_type, limit, timings)
+                if ranked is not None:
+                    return ranked
             
-            # 获取基于内容的推荐
-            content_recommendations = self.chroma_service.get_content_recommendations(
-                user_behavior=user_behavior,
-                recommend_type=recommend_type,
-                limit=int(limit * RECOMMENDATION_CONFIG['content_weight'])
+            try:
+                with self.admit():
+                    ranked = self._rank_online(user_id, recommend_type, limit, timings, diversity_lambda)
+            except Overloaded as e:
+                logger.warning(f"Recommendation overloaded, serving fallback: {str(e)}")
+                ranked = self.rank_fallback(user_id, recommend_type, limit, timings)
+        
+        logger.debug(f"Recommendation timings for user {user_id} ({recommend_type}): {timings}")
+        return ranked
+    
+    def _rank_online(self, user_id: str, recommend_type: str, limit: int, timings: dict,
+                     diversity_lambda: float = None) -> dict:
+        """在线多路召回并排序"""
+        include_embeddings = diversity_lambda is not None
+        # 用户行为读取与默认召回互不依赖，并发执行
+        with timed('recommend.behavior', timings, 'behavior'):
+            default_future = self._submit(
+                self.chroma_service.get_default_candidates,
+                recommend_type, self.candidate_pool_size(limit), include_embeddings
             )
+            user_state = self._wait({'behavior': self._submit(self.load_user_state, user_id)}, timings)
+            # 读取超时或失败时按冷启动用户处理
+            user_behavior, seen_filter = user_state.get('behavior', ([], None))
+        
+        # 第一阶段：多路召回候选池，各路并发执行，超时的来源直接放弃
+        with timed('recommend.candidates', timings, 'candidates'):
+            pool_size = self.candidate_pool_size(limit, seen_filter)
+            futures = {'default': default_future}
+            if user_behavior:
+                futures['content'] = self._submit(
+                    self.chroma_service.get_content_candidates,
+                    user_behavior, recommend_type, pool_size, include_embeddings
+                )
+                futures['collaborative'] = self._submit(
+                    self.chroma_service.get_collaborative_candidates,
+                    user_behavior, recommend_type, pool_size, include_embeddings
+                )
+            candidate_sets = list(self._wait(futures, timings).values())
+            candidates = self.ranking_service.merge_candidates(candidate_sets, self.source_weights(user_behavior))
+        
+        # 第二阶段：向量化打分排序
+        with timed('recommend.ranking', timings, 'ranking'):
+            return self.ranking_service.rank(candidates, limit, seen_filter, diversity_lambda)
+    
+    def rank_many(self, user_id: str, recommend_types: list, limit: int = None, timings: dict = None,
+                  diversity_lambda: float = None) -> dict:
+        """一次请求推荐多种类型，结果按类型分组
+        
+        用户行为和已看过滤器只读取一次，所有类型的画像向量与历史向量在一次批量推理中生成，
+        各类型的向量检索并发执行，每种类型的候选集各自合并、打分和排序，结果与逐个类型调用
+        rank_candidates 一致。
+        
+        Args:
+            user_id (str): 用户ID
+            recommend_types (list): 推荐类型列表
+            limit (int, optional): 每种类型返回的结果数量
+            timings (dict, optional): 传入时写入各阶段耗时（毫秒）
+            diversity_lambda (float, optional): MMR 多样化参数，默认使用配置值
             
-            # 获取协同过滤推荐
-            collaborative_recommendations = self.chroma_service.get_collaborative_recommendations(
-                user_id=user_id,
-                recommend_type=recommend_type,
-                limit=int(limit * RECOMMENDATION_CONFIG['collaborative_weight'])
-            )
+        Returns:
+            dict: 推荐类型到排序后候选集的映射，顺序与 recommend_types 一致，降级结果带有 fallback 字段
             
-            # 合并推荐结果
-            recommendations = self._merge_recommendations(
-                content_recommendations,
-                collaborative_recommendations,
-                limit
-            )
+        Raises:
+            Overloaded: 过载且某种类型没有可用的降级结果
+        """
+        timings = timings if timings is not None else {}
+        
+        if limit is None:
+            limit = RECOMMENDATION_CONFIG['default_results']
+        diversity_lambda = self.resolve_diversity(diversity_lambda)
+        
+        results = {}
+        with timed('recommend.total', timings, 'total'):
+            online = []
+            for recommend_type in recommend_types:
+                ranked = None
+                if PRECOMPUTE_CONFIG['enabled'] and diversity_lambda is None:
+                    ranked = self.rank_precomputed(user_id, recommend_type, limit, timings)
+                if ranked is not None:
+                    results[recommend_type] = ranked
+                else:
+                    online.append(recommend_type)
+            
+            if online:
+                try:
+                    with self.admit():
+                        results.update(self._rank_online_many(user_id, online, limit, timings, diversity_lambda))
+                except Overloaded as e:
+                    logger.warning(f"Recommendation overloaded, serving fallback: {str(e)}")
+                    for recommend_type in online:
+                        results[recommend_type] = self.rank_fallback(user_id, recommend_type, limit, timings)
+        
+        logger.debug(f"Recommendation timings for user {user_id} ({', '.join(recommend_types)}): {timings}")
+        return {recommend_type: results[recommend_type] for recommend_type in recommend_types}
+    
+    def _rank_online_many(self, user_id: str, recommend_types: list, limit: int, timings: dict,
+                          diversity_lambda: float = None) -> dict:
+        """在线召回并排序多种类型"""
+        include_embeddings = diversity_lambda is not None
+        with timed('recommend.behavior', timings, 'behavior'):
+            default_futures = {
+                recommend_type: self._submit(
+                    self.chroma_service.get_default_candidates,
+                    recommend_type, self.candidate_pool_size(limit), include_embeddings
+                )
+                for recommend_type in recommend_types
+            }
+            user_state = self._wait({'behavior': self._submit(self.load_user_state, user_id)}, timings)
+            user_behavior, seen_filter = user_state.get('behavior', ([], None))
+        
+        # 一次批量推理生成所有类型的查询向量
+        with timed('recommend.embedding', timings, 'embedding'):
+            queries = {}
+            if user_behavior:
+                try:
+                    queries = self.chroma_service.build_type_queries(user_behavior, recommend_types)
+                except Exception as e:
+                    logger.error(f"Error building query embeddings: {str(e)}")
+        
+        # 每种类型一次检索请求（画像与历史两个查询向量），各类型并发执行
+        with timed('recommend.candidates', timings, 'candidates'):
+            pool_size = self.candidate_pool_size(limit, seen_filter)
+            query_futures = {
+                recommend_type: self._submit(
+                    self.chroma_service.query_sources,
+                    queries[recommend_type], recommend_type, pool_size, include_embeddings
+                )
+                for recommend_type in recommend_types if recommend_type in queries
+            }
+            candidate_sets = {}
+            for recommend_type in recommend_types:
+                stages = {'default': default_futures[recommend_type]}
+                if recommend_type in query_futures:
+                    stages['content'] = query_futures[recommend_type]
+                done = self._wait(stages, timings)
+                candidate_sets[recommend_type] = [done['default']] if 'default' in done else []
+                candidate_sets[recommend_type].extend(done.get('content', []))
+        
+        with timed('recommend.ranking', timings, 'ranking'):
+            return self.rank_sets(candidate_sets, user_behavior, seen_filter, limit, diversity_lambda)
+    
+    def rank_sets(self, candidate_sets: dict, user_behavior: list, seen_filter, limit: int,
+                  diversity_lambda: float = None) -> dict:
+        """按类型分别合并候选集并排序（同步与异步服务共用）
+        
+        Args:
+            candidate_sets (dict): 推荐类型到候选集列表的映射
+            
+        Returns:
+            dict: 推荐类型到排序后候选集的映射
+        """
+        weights = self.source_weights(user_behavior)
+        return {
+            recommend_type: self.ranking_service.rank(
+                self.ranking_service.merge_candidates(sets, weights), limit, seen_filter, diversity_lambda)
+            for recommend_type, sets in candidate_sets.items()
+        }
+    
+    def rank_precomputed(self, user_id: str, recommend_type: str, limit: int, timings: dict = None) -> dict:
+        """基于预计算结果排序
+        
+        用户在预计算之后没有新行为时直接返回预计算的排序；有新行为时只用新行为实时召回一路候选，
+        与预计算结果按 fresh_weight 合并后重新打分，并过滤新看过的条目。实时召回同样受准入控制限制，
+        过载时直接返回预计算的排序。
+        
+        Args:
+            user_id (str): 用户ID
+            recommend_type (str): 推荐类型
+            limit (int): 返回结果数量
+            timings (dict, optional): 传入时写入耗时（毫秒）
             
-            return recommendations
+        Returns:
+            dict: 排序后的候选集，没有可用的预计算结果时返回 None
+        """
+        with timed('recommend.precomputed', timings, 'precomputed'):
+            record = self.db_service.get_precomputed_recommendation(user_id, recommend_type)
+            if record is None or len(record['ids']) < limit:
+                return None
+            max_age = timedelta(hours=PRECOMPUTE_CONFIG['max_age_hours'])
+            if record['computed_at'] is None or datetime.now() - record['computed_at'] > max_age:
+                return None
             
-        except Exception as e:
-            logger.error(f"Error in get_recommendations: {str(e)}")
-            raise
+            precomputed = self.chroma_service.get_candidates_by_ids(record['ids'], 'precomputed', record['scores'])
+            if len(precomputed['ids']) < limit:
+                return None
+            
+            new_events = []
+            if record['last_event_at'] is not None:
+                new_events = self.db_service.get_user_behavior(user_id, since=record['last_event_at'])
+            if not new_events:
+                return self._select_stored(precomputed, limit)
             
-    def _merge_recommendations(self, content_recs, collaborative_recs, limit):
-        """合并不同来源的推荐结果
+            seen_filter = self.db_service.get_seen_filter(user_id) if RANKING_CONFIG['filter_seen'] else None
+            try:
+                with self.admit():
+                    fresh = self.chroma_service.get_content_candidates(
+                        new_events, recommend_type, self.candidate_pool_size(limit, seen_filter))
+            except Overloaded as e:
+                logger.warning(f"Skipping fresh candidates for user {user_id}: {str(e)}")
+                ranked = self._select_stored(precomputed, limit)
+                ranked['fallback'] = 'precomputed'
+                return ranked
+            weight = PRECOMPUTE_CONFIG['fresh_weight']
+            merged = self.ranking_service.merge_candidates(
+                [precomputed, fresh], {'precomputed': 1 - weight, 'content': weight})
+            return self.ranking_service.rank(merged, limit, seen_filter)
+    
+    def rank_fallback(self, user_id: str, recommend_type: str, limit: int, timings: dict = None) -> dict:
+        """过载时的降级结果，不做模型推理和向量检索
+        
+        优先使用该用户的预计算结果（不检查是否过期），没有时使用该类型最近一次的默认候选集。
+        降级结果不做已看过滤和重新打分。
         
         Args:
-            content_recs (list): 基于内容的推荐结果
-            collaborative_recs (list): 基于协同过滤的推荐结果
-            limit (int): 最终返回的推荐数量
+            user_id (str): 用户ID
+            recommend_type (str): 推荐类型
+            limit (int): 返回结果数量
+            timings (dict, optional): 传入时写入耗时（毫秒）
+            
+        Returns:
+            dict: 候选集，fallback 字段为 'precomputed' 或 'default'
             
+        Raises:
+            Overloaded: 没有可用的降级结果
+        """
+        with timed('recommend.fallback', timings, 'fallback'):
+            candidates, source = None, 'precomputed'
+            try:
+                record = self.db_service.get_precomputed_recommendation(user_id, recommend_type)
+                if record is not None and record['ids']:
+                    candidates = self.chroma_service.get_candidates_by_ids(record['ids'], source, record['scores'])
+            except Exception as e:
+                logger.error(f"Error reading precomputed fallback: {str(e)}")
+            if candidates is None or not candidates['ids']:
+                candidates, source = self.chroma_service.get_fallback_candidates(recommend_type), 'default'
+            if candidates is None or not candidates['ids']:
+                raise Overloaded(f"no fallback available for {recommend_type}")
+            ranked = self._select_stored(candidates, limit)
+            ranked['fallback'] = source
+            return ranked
+    
+    def _select_stored(self, candidates: dict, limit: int) -> dict:
+        """按已有的相关度截取前 limit 个，不重新打分"""
+        source = candidates['source']
+        merged = self.ranking_service.merge_candidates([candidates], {source: 1.0})
+        merged['scores'] = merged['relevance']
+        return select_candidates(merged, range(min(limit, len(merged['ids']))))
+    
+    def admit(self):
+        """获取在线召回的执行名额，未启用准入控制时不做限制"""
+        self.memory_budget.maybe_check()
+        return self.admission.slot() if self.admission is not None else nullcontext()
+    
+    def admit_ingest(self):
+        """获取条目导入的执行名额（与在线召回分开限制），未启用准入控制时不做限制"""
+        self.memory_budget.maybe_check()
+        return self.ingest_admission.slot() if self.ingest_admission is not None else nullcontext()
+    
+    def start_feed(self, user_id: str, recommend_type: str, limit: int = None, timings: dict = None,
+                   diversity_lambda: float = None) -> tuple:
+        """开始一次分页推荐
+        
+        一次排序出 PAGINATION_CONFIG['pool_size'] 个条目并缓存，返回第一页和下一页的游标，
+        后续分页通过 next_page 从缓存读取，不再重新召回和排序。
+        
         Returns:
-            list: 合并后的推荐结果
+            tuple: (第一页的候选集, 下一页游标，没有更多结果时为 None)
         """
-        # 使用集合去重
-        seen_items = set()
-        merged = []
-        
-        # 交替添加两种推荐结果
-        content_idx = 0
-        collab_idx = 0
-        
-        while len(merged) < limit and (content_idx < len(content_recs) or collab_idx < len(collaborative_recs)):
-            # 添加基于内容的推荐
-            if content_idx < len(content_recs):
-                item = content_recs[content_idx]
-                if item['id'] not in seen_items:
-                    merged.append(item)
-                    seen_items.add(item['id'])
-                content_idx += 1
+        if limit is None:
+            limit = RECOMMENDATION_CONFIG['default_results']
+        ranked = self.rank_candidates(user_id, recommend_type, max(PAGINATION_CONFIG['pool_size'], limit),
+                                      timings, diversity_lambda)
+        return self.create_feed(ranked, limit)
+    
+    def create_feed(self, ranked: dict, limit: int) -> tuple:
+        """缓存排序结果并返回第一页（同步与异步服务共用）"""
+        # 分页只需要文档和条目，不保留向量
+        ranked['embeddings'] = None
+        token = secrets.token_urlsafe(12)
+        self.feeds.set(token, ranked)
+        return self._page(token, ranked, 0, limit)
+    
+    def next_page(self, cursor: str, limit: int = None) -> tuple:
+        """按游标读取下一页
+        
+        游标包含缓存键和偏移量，同一个游标重复请求返回相同的一页。
+        
+        Args:
+            cursor (str): 上一页返回的游标
+            limit (int, optional): 本页数量
             
-            # 添加协同过滤推荐
-            if collab_idx < len(collaborative_recs) and len(merged) < limit:
-                item = collaborative_recs[collab_idx]
-                if item['id'] not in seen_items:
-                    merged.append(item)
-                    seen_items.add(item['id'])
-                collab_idx += 1
-        
-        return merged[:limit]
\ No newline at end of file
+        Returns:
+            tuple: (本页的候选集, 下一页游标)，游标无效或已过期时返回 (None, None)
+        """
+        if limit is None:
+            limit = RECOMMENDATION_CONFIG['default_results']
+        token, _, offset = cursor.rpartition('.')
+        ranked = self.feeds.get(token) if token and offset.isdigit() else None
+        if ranked is None:
+            return None, None
+        return self._page(token, ranked, int(offset), limit)
+    
+    @staticmethod
+    def _page(token: str, ranked: dict, offset: int, limit: int) -> tuple:
+        """截取一页并生成下一页的游标"""
+        end = min(offset + limit, len(ranked['ids']))
+        page = select_candidates(ranked, range(offset, end))
+        next_cursor = f"{token}.{end}" if end < len(ranked['ids']) else None
+        return page, next_cursor
+    
+    def load_user_state(self, user_id: str) -> tuple:
+        """读取用户行为记录和已看过滤器
+        
+        Returns:
+            tuple: (用户行为记录, 已看过滤器或 None)
+        """
+        user_behavior = self.db_service.get_user_behavior(user_id)
+        seen_filter = None
+        if RANKING_CONFIG['filter_seen'] and user_behavior:
+            seen_filter = self.db_service.get_seen_filter(user_id)
+        return user_behavior, seen_filter
+    
+    @staticmethod
+    def candidate_pool_size(limit: int, seen_filter=None) -> int:
+        """每路召回的候选数量，按已看数量多召回一些，保证过滤后仍能填满 limit"""
+        pool_size = max(limit * RANKING_CONFIG['candidate_multiplier'], RANKING_CONFIG['min_candidates'])
+        if seen_filter is not None:
+            pool_size += min(len(seen_filter), SEEN_FILTER_CONFIG['overfetch_max'])
+        return pool_size
+    
+    @staticmethod
+    def source_weights(user_behavior: list) -> dict:
+        """各召回来源的合并权重，冷启动用户只有默认召回"""
+        return {
+            'content': RECOMMENDATION_CONFIG['content_weight'],
+            'collaborative': RECOMMENDATION_CONFIG['collaborative_weight'],
+            'default': RANKING_CONFIG['default_weight'] if user_behavior else 1.0
+        }
+    
+    @staticmethod
+    def resolve_diversity(diversity_lambda: float = None):
+        """确定实际使用的 MMR 参数，不做多样化时返回 None"""
+        if diversity_lambda is None:
+            diversity_lambda = RANKING_CONFIG['diversity_lambda']
+        if diversity_lambda is None or diversity_lambda >= 1:
+            return None
+        return diversity_lambda
+    
+    def _submit(self, func, *args):
+        """提交到召回线程池，记录提交时间用于计算各阶段的超时，并把请求上下文带到工作线程"""
+        future = submit_with_context(self.executor, self.db_service.run_and_release, func, *args)
+        future.submitted_at = time.perf_counter()
+        return future
+    
+    def _wait(self, futures: dict, timings: dict = None) -> dict:
+        """等待各阶段完成，每个阶段按自己的超时时间独立计算，且不超过请求的截止时间
+        
+        超时或出错的阶段不会出现在返回结果中，其余阶段的结果照常返回。
+        
+        Args:
+            futures (dict): 阶段名称到 Future 的映射
+            timings (dict, optional): 记录超时的阶段
+        
+        Returns:
+            dict: 成功完成的阶段名称到结果的映射
+        """
+        results = {}
+        for stage, future in futures.items():
+            timeout = CONCURRENCY_CONFIG['stage_timeouts'].get(stage)
+            wait = None
+            if timeout is not None:
+                wait = max(timeout - (time.perf_counter() - future.submitted_at), 0)
+            try:
+                results[stage] = future.result(timeout=remaining(wait))
+            except FutureTimeoutError:
+                logger.warning(f"Stage {stage} timed out after {timeout}s, continuing without it")
+                if timings is not None:
+                    timings.setdefault('timeouts', []).append(stage)
+            except Exception as e:
+                logger.error(f"Error in stage {stage}: {str(e)}")
+        return results
\ No newline at end of file
@@ -0,0 +1,222 @@
+from config.settings import STARTUP_CONFIG
+from utils.metrics import registry
+from contextlib import contextmanager
+from typing import Dict, Optional
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+STARTUP_PHASE_SECONDS = registry.gauge(
+    'startup_phase_seconds', 'Time spent in each service startup phase', ('phase',))
+SERVICES_READY = registry.gauge('services_ready', 'Whether the recommendation services are loaded (1) or not (0)')
+
+class ServicesUnavailable(Exception):
+    """服务尚未加载完成或加载失败"""
+
+class ServiceLoader:
+    """按需构建推荐服务
+
+    导入接口模块时不再创建服务：数据库连接、模型、向量库客户端和本地索引在第一次使用时
+    （或启动时显式调用 load / start）按阶段加载，并记录每个阶段的耗时。
+    加载期间 /health 即可响应，/ready 返回当前阶段，推荐接口返回 503。
+    加载失败后按 STARTUP_CONFIG 的退避时间重试（每次失败等待时间翻倍），重试次数用完后 /health 才返回 503。
+    """
+
+    PENDING, LOADING, READY, FAILED = 'pending', 'loading', 'ready', 'failed'
+
+    def __init__(self):
+        self.state = self.PENDING
+        self.phase: Optional[str] = None
+        self.error: Optional[str] = None
+        self.timings: Dict[str, float] = {}
+        self.created_at = time.time()
+        self.db_service = None
+        self.recommendation_service = None
+        self._async_service = None
+        self._lock = threading.Lock()
+        self._thread = None
+        self._initialize_data = None
+        self._failures = 0
+        self._retry_at = 0.0
+        SERVICES_READY.set_function(lambda: 1 if self.state == self.READY else 0)
+
+    @property
+    def ready(self) -> bool:
+        return self.state == self.READY
+
+    @contextmanager
+    def _phase(self, name: str):
+        """记录一个加载阶段的耗时"""
+        self.phase = name
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            self.timings[name] = round(elapsed * 1000, 1)
+            STARTUP_PHASE_SECONDS.set(elapsed, phase=name)
+            logger.info(f"Startup phase {name} finished in {elapsed:.2f}s")
+
+    def load(self, initialize_data: bool = None) -> 'ServiceLoader':
+        """在当前线程中加载全部服务（已加载时直接返回）
+
+        Args:
+            initialize_data (bool, optional): 是否导入数据文件中新增的条目，默认使用 STARTUP_CONFIG 的配置
+
+        Raises:
+            Exception: 加载失败时抛出原始异常，状态记为 failed
+        """
+        self._initialize_data = initialize_data
+        if initialize_data is None:
+            initialize_data = STARTUP_CONFIG['initialize_data']
+        with self._lock:
+            if self.state == self.READY:
+                return self
+            self.state, self.error = self.LOADING, None
+            started = time.perf_counter()
+            try:
+                # 服务模块会导入 torch / transformers / chromadb，推迟到加载时导入
+                with self._phase('import'):
+                    from app.services.database_service import DatabaseService
+                    from app.services.chroma_service import ChromaService
+                    from app.services.recommendation_service import RecommendationService
+                    from utils.embeddings import get_embedding_service
+                with self._phase('database'):
+                    db_service = DatabaseService()
+                with self._phase('model'):
+                    embedding_service = get_embedding_service()
+                with self._phase('vector_store'):
+                    chroma_service = ChromaService(db_service, embedding_service=embedding_service)
+                with self._phase('recommendation'):
+                    recommendation_service = RecommendationService(db_service, chroma_service)
+                if initialize_data:
+                    with self._phase('data_files'):
+                        chroma_service.initialize_data()
+                with self._phase('popularity'):
+                    # 回放最近的行为建立热度统计
+                    db_service.sync_popularity(force=True)
+            except Exception as e:
+                logger.error(f"Error loading services in phase {self.phase}: {str(e)}")
+                self.state, self.error = self.FAILED, f"{self.phase}: {str(e)}"
+                self._failures += 1
+                self._retry_at = time.monotonic() + self._retry_backoff()
+                raise
+            self._failures = 0
+            self.db_service = db_service
+            self.recommendation_service = recommendation_service
+            self.state, self.phase = self.READY, None
+            self.timings['total'] = round((time.perf_counter() - started) * 1000, 1)
+            logger.info(f"Services ready in {self.timings['total'] / 1000:.2f}s: {self.timings}")
+            return self
+
+    def _retry_backoff(self) -> float:
+        """第 n 次连续失败后的重试等待时间（秒），0 表示不重试"""
+        backoff = STARTUP_CONFIG['retry_backoff']
+        if backoff <= 0:
+            return 0
+        return min(backoff * 2 ** (self._failures - 1), STARTUP_CONFIG['max_retry_backoff'])
+
+    @property
+    def retrying(self) -> bool:
+        """失败后是否还会重试（未失败时同样为 True）"""
+        return STARTUP_CONFIG['retry_backoff'] > 0 and self._failures <= STARTUP_CONFIG['max_retries']
+
+    @property
+    def gave_up(self) -> bool:
+        """加载失败且不再重试，进程需要重启"""
+        return self.state == self.FAILED and not self.retrying
+
+    def start(self, initialize_data: bool = None):
+        """在后台线程中加载服务，立即返回（进程可以先响应健康检查）
+
+        加载失败时在同一线程中按退避时间重试，直到加载成功或重试次数用完。
+        """
+        if self.state == self.READY or (self._thread is not None and self._thread.is_alive()):
+            return
+
+        def run():
+            while True:
+                try:
+                    self.load(initialize_data)
+                    return
+                except Exception:
+                    # 错误已记录在 state / error 中，由 /ready 报告
+                    if not self.retrying:
+                        return
+                    retry_in = max(self._retry_at - time.monotonic(), 0)
+                    logger.info(f"Retrying service loading in {retry_in:.0f}s (failures: {self._failures})")
+                    time.sleep(retry_in)
+
+        self._thread = threading.Thread(target=run, name='service-loader', daemon=True)
+        self._thread.start()
+
+    def get(self) -> 'ServiceLoader':
+        """返回已加载的服务
+
+        尚未开始加载时在当前线程中加载（脚本和测试无需显式启动），
+        正在后台加载或加载失败时抛出 ServicesUnavailable，由接口返回 503；
+        加载失败且没有后台线程在重试时，到了重试时间后在后台重新加载。
+        """
+        if self.state == self.READY:
+            return self
+        if self.state == self.PENDING:
+            try:
+                return self.load()
+            except Exception as e:
+                raise ServicesUnavailable(str(e))
+        if self.state == self.FAILED:
+            error = self.error
+            if self.retrying and time.monotonic() >= self._retry_at:
+                self.start(self._initialize_data)
+            raise ServicesUnavailable(f"Service loading failed ({error})")
+        raise ServicesUnavailable(f"Services are loading (phase: {self.phase})")
+
+    def async_service(self):
+        """基于已加载服务的异步推荐服务（ASGI 模式），首次调用时创建"""
+        loaded = self.get()
+        if self._async_service is None:
+            from app.services.async_recommendation_service import AsyncRecommendationService
+            with self._lock:
+                if self._async_service is None:
+                    self._async_service = AsyncRecommendationService(loaded.recommendation_service)
+        return self._async_service
+
+    def status(self) -> Dict:
+        """加载状态，用于就绪检查"""
+        return {
+            'state': self.state,
+            'phase': self.phase,
+            'error': self.error,
+            'failures': self._failures,
+            'retry_in': round(max(self._retry_at - time.monotonic(), 0), 1)
+                        if self.state == self.FAILED and self.retrying else None,
+            'timings_ms': dict(self.timings),
+            'pid': os.getpid(),
+            'uptime': round(time.time() - self.created_at, 1)
+        }
+
+    def after_fork(self):
+        """fork 出的工作进程初始化：丢弃从主进程继承的连接，未预加载时在后台开始加载
+
+        工作进程加载时不导入数据文件：每个进程都导入会重复写入向量库并各自构建、发布本地索引，
+        未预加载时数据文件由 python -m scripts.build_index --ingest 导入。
+        """
+        self.created_at = time.time()
+        if self.state == self.READY:
+            self.db_service.engine.dispose(close=False)
+            self.recommendation_service.chroma_service.reset_client()
+        else:
+            self.start(initialize_data=False)
+
+    def shutdown(self):
+        """释放线程池与数据库连接"""
+        if self._async_service is not None:
+            self._async_service.shutdown()
+        if self.db_service is not None:
+            self.db_service.close()
+
+# 进程内共享的服务实例
+services = ServiceLoader()
@@ -0,0 +1,74 @@
+import os
+import time
+from typing import Dict, List
+
+from app.services.chroma_service import ChromaService
+from app.services.database_service import DatabaseService
+from app.services.recommendation_service import RecommendationService
+from benchmarks.local_store import LocalClient, HashEmbeddingService
+from benchmarks.synthetic import write_data_files, load_behaviors
+from config.settings import VECTOR_INDEX_CONFIG
+
+
+class BenchmarkEnvironment:
+    """基准测试与离线评估使用的独立运行环境
+
+    数据库为工作目录下的临时 SQLite 文件，向量库为进程内的 LocalClient，不会读写项目自身的数据库、
+    Chroma 服务和本地索引目录。
+    """
+
+    def __init__(self, workdir: str, embedding: str = 'hash', local_index: str = None):
+        """
+        Args:
+            workdir (str): 工作目录，存放临时数据库、数据文件和本地索引
+            embedding (str): 'model' 使用真实的 EmbeddingService，'hash' 使用不加载模型的替代实现
+            local_index (str, optional): 设置后在导入数据后构建该存储格式的本地索引（float32 / float16 / int8 / pq）
+        """
+        self.workdir = workdir
+        self.local_index = local_index
+        os.makedirs(workdir, exist_ok=True)
+
+        # 本地索引写到工作目录，查询是否走本地索引由 ChromaService.local_index 决定
+        VECTOR_INDEX_CONFIG['path'] = os.path.join(workdir, 'index')
+        if local_index:
+            VECTOR_INDEX_CONFIG['storage'] = local_index
+
+        embedding_service = None
+        if embedding == 'hash':
+            embedding_service = HashEmbeddingService()
+
+        self.db_service = DatabaseService(f"sqlite:///{os.path.join(workdir, 'benchmark.db')}")
+        self.client = LocalClient()
+        self.chroma_service = ChromaService(self.db_service, client=self.client,
+                                            embedding_service=embedding_service)
+        self.chroma_service.local_index = None
+        self.recommendation_service = RecommendationService(self.db_service, chroma_service=self.chroma_service)
+
+    def ingest(self, items: Dict[str, List[Dict]]) -> Dict[str, float]:
+        """导入条目（走 ChromaService._process_file 的正常导入流程）
+
+        Returns:
+            Dict[str, float]: 每种数据类型的导入耗时（秒）
+        """
+        paths = write_data_files(items, os.path.join(self.workdir, 'data'))
+        collection = self.chroma_service._get_or_create_collection()
+        durations = {}
+        for data_type, path in paths.items():
+            started = time.perf_counter()
+            self.chroma_service._process_file(path, collection, data_type)
+            durations[data_type] = time.perf_counter() - started
+        if self.local_index:
+            self.chroma_service.build_local_index()
+        return durations
+
+    def load_behaviors(self, behaviors: List[Dict]):
+        """写入行为记录"""
+        load_behaviors(self.db_service, behaviors)
+
+    def collection(self):
+        return self.client.get_collection(self.chroma_service.collection_name)
+
+    def close(self):
+        self.recommendation_service.executor.shutdown(wait=True)
+        self.db_service.close()
+        self.db_service.engine.dispose()
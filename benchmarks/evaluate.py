@@ -0,0 +1,219 @@
+"""推荐质量与速度的离线评估
+
+按时间切分用户行为：较早的行为写入数据库作为历史，之后每个用户在较晚时间段内交互过的（且历史中未出现的）
+条目作为真实结果，用 RecommendationService 回放推荐请求，统计 recall@k、NDCG@k、覆盖率以及每次请求的耗时。
+
+用法示例：
+
+    python -m benchmarks.evaluate                                      # 哈希嵌入，快速检查流程
+    python -m benchmarks.evaluate --embedding model --k 5,10,20
+    python -m benchmarks.evaluate --embedding model --content-weights 0.2,0.4,0.6,0.8
+    python -m benchmarks.evaluate --embedding model --local-index pq   # 对比压缩索引的速度与召回
+
+同一组参数下的多次运行（不同权重、不同索引格式）输出在同一张表中，便于直接比较速度和质量的取舍。
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Dict, List, Set
+
+from benchmarks.environment import BenchmarkEnvironment
+from benchmarks.run import summarize, git_revision, RESULTS_DIR
+from benchmarks.synthetic import generate_items, generate_behaviors
+from config.settings import RECOMMENDATION_CONFIG
+
+
+def time_split(behaviors: List[Dict], train_ratio: float) -> tuple:
+    """按时间切分行为记录
+
+    Returns:
+        tuple: (训练集, 测试集, 切分时间)
+    """
+    ordered = sorted(behaviors, key=lambda b: b['timestamp'])
+    split = int(len(ordered) * train_ratio)
+    cutoff = ordered[split]['timestamp'] if split < len(ordered) else ordered[-1]['timestamp']
+    return ordered[:split], ordered[split:], cutoff
+
+
+def build_ground_truth(train: List[Dict], test: List[Dict]) -> Dict[tuple, Set[str]]:
+    """整理每个 (用户, 内容类型) 的真实结果
+
+    只评估训练集中有历史的用户；训练集中已经交互过的条目会被已看过滤排除，不计入真实结果。
+    各类型的条目ID会重复，按 (类型, ID) 判断是否交互过。
+
+    Returns:
+        Dict[tuple, Set[str]]: (user_id, recommend_type) 到条目ID集合的映射
+    """
+    history: Dict[str, Set[tuple]] = {}
+    for behavior in train:
+        history.setdefault(behavior['user_id'], set()).add((behavior['item_type'], behavior['item_id']))
+
+    truth: Dict[tuple, Set[str]] = {}
+    for behavior in test:
+        user_id, item_type, item_id = behavior['user_id'], behavior['item_type'], behavior['item_id']
+        if user_id not in history or (item_type, item_id) in history[user_id]:
+            continue
+        truth.setdefault((user_id, item_type), set()).add(item_id)
+    return truth
+
+
+def recall_at_k(recommended: List[str], relevant: Set[str], k: int) -> float:
+    if not relevant:
+        return 0.0
+    return len(set(recommended[:k]) & relevant) / len(relevant)
+
+
+def ndcg_at_k(recommended: List[str], relevant: Set[str], k: int) -> float:
+    dcg = sum(1.0 / math.log2(rank + 2) for rank, item_id in enumerate(recommended[:k]) if item_id in relevant)
+    ideal = sum(1.0 / math.log2(rank + 2) for rank in range(min(len(relevant), k)))
+    return dcg / ideal if ideal else 0.0
+
+
+def evaluate(env: BenchmarkEnvironment, truth: Dict[tuple, Set[str]], ks: List[int], catalog_size: int,
+             diversity_lambda: float = None) -> Dict:
+    """回放推荐请求并计算指标
+
+    Args:
+        env (BenchmarkEnvironment): 已导入数据和训练集行为的运行环境
+        truth (Dict[tuple, Set[str]]): build_ground_truth 的返回值
+        ks (List[int]): 计算指标的截断位置
+        catalog_size (int): 条目总数，用于计算覆盖率
+        diversity_lambda (float, optional): MMR 多样化参数
+
+    Returns:
+        Dict: 各截断位置的平均 recall / NDCG、覆盖率和请求耗时统计
+    """
+    limit = max(ks)
+    recalls = {k: [] for k in ks}
+    ndcgs = {k: [] for k in ks}
+    recommended_items = {k: set() for k in ks}
+    latencies = []
+
+    for (user_id, recommend_type), relevant in truth.items():
+        started = time.perf_counter()
+        items = env.db_service.run_and_release(
+            env.recommendation_service.get_recommendations,
+            user_id, recommend_type, limit, diversity_lambda=diversity_lambda
+        )
+        latencies.append((time.perf_counter() - started) * 1000)
+
+        recommended = [str(item.get('id')) for item in items]
+        for k in ks:
+            recalls[k].append(recall_at_k(recommended, relevant, k))
+            ndcgs[k].append(ndcg_at_k(recommended, relevant, k))
+            recommended_items[k].update((recommend_type, item_id) for item_id in recommended[:k])
+
+    queries = len(truth)
+    return {
+        'queries': queries,
+        'recall': {f'@{k}': sum(recalls[k]) / queries if queries else 0.0 for k in ks},
+        'ndcg': {f'@{k}': sum(ndcgs[k]) / queries if queries else 0.0 for k in ks},
+        'coverage': {f'@{k}': len(recommended_items[k]) / catalog_size if catalog_size else 0.0 for k in ks},
+        'latency': summarize(latencies)
+    }
+
+
+def print_table(runs: List[Dict], ks: List[int]):
+    """以表格形式打印多次运行的对比"""
+    columns = [f'{metric}@{k}' for metric in ('recall', 'ndcg', 'coverage') for k in ks] + ['p50_ms', 'p95_ms']
+    print(f"\n{'run':<36}" + ''.join(f'{column:>13}' for column in columns))
+    for run in runs:
+        metrics = run['metrics']
+        values = [metrics[metric][f'@{k}'] for metric in ('recall', 'ndcg', 'coverage') for k in ks]
+        values += [metrics['latency'].get('p50_ms', 0.0), metrics['latency'].get('p95_ms', 0.0)]
+        print(f"{run['name']:<36}" + ''.join(f'{value:>13.4f}' for value in values))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='推荐质量与速度的离线评估')
+    parser.add_argument('--embedding', choices=['hash', 'model'], default='hash',
+                        help='hash 只用于检查流程，质量指标需要使用真实模型（model）')
+    parser.add_argument('--local-index', choices=['float32', 'float16', 'int8', 'pq'],
+                        help='导入后构建本地压缩索引，查询走本地索引')
+    parser.add_argument('--k', default='5,10', help='逗号分隔的截断位置')
+    parser.add_argument('--train-ratio', type=float, default=0.8, help='按时间切分时训练集的比例')
+    parser.add_argument('--content-weights',
+                        help='逗号分隔的 content_weight 取值，每个取值单独评估一次，collaborative_weight = 1 - content_weight')
+    parser.add_argument('--diversity-lambda', type=float)
+    parser.add_argument('--items-per-type', type=int, default=500)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--events-per-user', type=int, default=20)
+    parser.add_argument('--max-queries', type=int, default=500, help='最多回放的 (用户, 类型) 组合数量')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workdir', help='工作目录，默认使用临时目录')
+    parser.add_argument('--output', help='结果文件路径，默认写入 benchmarks/results/')
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    ks = sorted({int(k) for k in args.k.split(',') if k})
+
+    items = generate_items(args.items_per_type, seed=args.seed)
+    behaviors = generate_behaviors(items, args.users, args.events_per_user, seed=args.seed)
+    train, test, cutoff = time_split(behaviors, args.train_ratio)
+    catalog_size = sum(len(type_items) for type_items in items.values())
+    truth = build_ground_truth(train, test)
+    truth = dict(sorted(truth.items())[:args.max_queries])
+
+    weights = [RECOMMENDATION_CONFIG['content_weight']]
+    if args.content_weights:
+        weights = [float(w) for w in args.content_weights.split(',') if w]
+    original_weights = (RECOMMENDATION_CONFIG['content_weight'], RECOMMENDATION_CONFIG['collaborative_weight'])
+
+    runs = []
+    with tempfile.TemporaryDirectory(prefix='recommend-eval-') as tmpdir:
+        env = BenchmarkEnvironment(args.workdir or tmpdir, embedding=args.embedding, local_index=args.local_index)
+        try:
+            env.ingest(items)
+            env.load_behaviors(train)
+            for weight in weights:
+                RECOMMENDATION_CONFIG['content_weight'] = weight
+                RECOMMENDATION_CONFIG['collaborative_weight'] = round(1 - weight, 6)
+                # 默认召回结果有缓存，各次运行之间清空以免互相影响
+                env.chroma_service.default_cache.clear()
+                name = f"content={weight:g} index={args.local_index or 'store'}"
+                metrics = evaluate(env, truth, ks, catalog_size, args.diversity_lambda)
+                runs.append({
+                    'name': name,
+                    'content_weight': weight,
+                    'collaborative_weight': RECOMMENDATION_CONFIG['collaborative_weight'],
+                    'metrics': metrics
+                })
+        finally:
+            RECOMMENDATION_CONFIG['content_weight'], RECOMMENDATION_CONFIG['collaborative_weight'] = original_weights
+            env.close()
+
+    report = {
+        'meta': {
+            'revision': git_revision(),
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'cutoff': cutoff.isoformat(timespec='seconds'),
+            'train_events': len(train),
+            'test_events': len(test)
+        },
+        'params': {key: value for key, value in vars(args).items() if key not in ('output', 'workdir')},
+        'runs': runs
+    }
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"eval-{datetime.now():%Y%m%d-%H%M%S}-{report['meta']['revision']}.json")
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    print(f"Train/test split at {report['meta']['cutoff']}: {len(train)} / {len(test)} events, "
+          f"{len(truth)} evaluated (user, type) pairs")
+    print_table(runs, ks)
+    print(f"\nResults written to {output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
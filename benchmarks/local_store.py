@@ -0,0 +1,101 @@
+import hashlib
+from typing import Dict, List
+
+import numpy as np
+
+from utils.vector_index import VectorIndex
+
+
+class LocalCollection:
+    """Chroma collection 的进程内替代实现
+
+    实现 ChromaService 用到的 add / get / query / count 接口，查询使用 float32 的 VectorIndex 做精确的余弦检索，
+    基准测试不依赖远程 Chroma 服务，结果也不受网络抖动影响。
+    """
+
+    def __init__(self, name: str, dim: int = 768):
+        self.name = name
+        self.dim = dim
+        self.index = VectorIndex(dim=dim, storage='float32')
+        self.index.build([], np.zeros((0, dim), dtype=np.float32), [], [])
+        self._embeddings: List[np.ndarray] = []
+
+    def add(self, ids: List[str], embeddings, metadatas: List[Dict] = None, documents: List[str] = None):
+        vectors = np.asarray(embeddings, dtype=np.float32).reshape(len(ids), self.dim)
+        self._embeddings.append(vectors)
+        self.index.add(list(ids), vectors, list(metadatas or [{} for _ in ids]), list(documents or ['' for _ in ids]))
+
+    def count(self) -> int:
+        return len(self.index)
+
+    def get(self, ids: List[str] = None, where: Dict = None, limit: int = None, offset: int = None,
+            include: List[str] = None) -> Dict[str, list]:
+        include = include or ['metadatas', 'documents']
+        positions = range(len(self.index))
+        if ids is not None:
+            wanted = set(ids)
+            positions = [i for i in positions if self.index.ids[i] in wanted]
+        if where:
+            mask = self.index._mask(where)
+            positions = [i for i in positions if mask[i]]
+        positions = list(positions)[offset or 0:]
+        if limit is not None:
+            positions = positions[:limit]
+
+        result = {'ids': [self.index.ids[i] for i in positions]}
+        if 'metadatas' in include:
+            result['metadatas'] = [self.index.metadatas[i] for i in positions]
+        if 'documents' in include:
+            result['documents'] = [self.index.documents[i] for i in positions]
+        if 'embeddings' in include:
+            vectors = np.concatenate(self._embeddings) if self._embeddings else np.zeros((0, self.dim))
+            result['embeddings'] = vectors[positions].tolist()
+        return result
+
+    def query(self, query_embeddings, n_results: int = 10, where: Dict = None, include: List[str] = None):
+        return self.index.query(query_embeddings=query_embeddings, n_results=n_results, where=where, include=include)
+
+
+class LocalClient:
+    """chromadb.HttpClient 的进程内替代实现"""
+
+    def __init__(self, dim: int = 768):
+        self.dim = dim
+        self.collections: Dict[str, LocalCollection] = {}
+
+    def get_collection(self, name: str) -> LocalCollection:
+        if name not in self.collections:
+            raise ValueError(f"Collection {name} does not exist.")
+        return self.collections[name]
+
+    def create_collection(self, name: str, metadata: Dict = None) -> LocalCollection:
+        self.collections[name] = LocalCollection(name, self.dim)
+        return self.collections[name]
+
+    def get_or_create_collection(self, name: str, metadata: Dict = None) -> LocalCollection:
+        return self.collections.get(name) or self.create_collection(name, metadata)
+
+    def delete_collection(self, name: str):
+        self.collections.pop(name, None)
+
+
+class HashEmbeddingService:
+    """不加载模型的嵌入服务替代实现
+
+    按字符 bigram 的哈希值累加成固定维度的向量，文本相似时向量也相似。用于在没有 GPU / 模型文件的环境中
+    测量模型以外部分的开销，不能用来评估推荐质量。
+    """
+
+    def __init__(self, dim: int = 768):
+        self.dim = dim
+
+    def get_embedding(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        text = text or ''
+        for i in range(max(len(text) - 1, 1)):
+            digest = hashlib.blake2b(text[i:i + 2].encode('utf-8'), digest_size=8).digest()
+            vector[int.from_bytes(digest, 'little') % self.dim] += 1.0
+        return vector
+
+    def get_batch_embeddings(self, texts: List[str]) -> List[np.ndarray]:
+        return [self.get_embedding(text) for text in texts]
@@ -0,0 +1,296 @@
+"""推荐系统热点路径的基准测试
+
+用法示例：
+
+    python -m benchmarks.run                                   # 全部场景，哈希嵌入，结果写入 benchmarks/results/
+    python -m benchmarks.run --embedding model --scenarios embedding,latency
+    python -m benchmarks.run --compare benchmarks/results/baseline.json --fail-on-regression
+
+所有数据由固定随机种子生成，同样的参数在不同提交上得到的结果可以直接对比。
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List
+
+import numpy as np
+
+from benchmarks.environment import BenchmarkEnvironment
+from benchmarks.synthetic import generate_items, generate_behaviors
+from config.settings import CONTENT_TYPES, MODEL_CONFIG, RECOMMENDATION_CONFIG
+
+SCENARIOS = ['ingestion', 'embedding', 'latency', 'concurrent', 'memory']
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+# 对比时按指标名称后缀判断方向：这些后缀越大越好，其余数值指标越小越好
+HIGHER_IS_BETTER = ('_per_second', '_qps')
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """计算耗时样本（毫秒）的统计量"""
+    if not samples:
+        return {}
+    values = np.asarray(samples, dtype=np.float64)
+    return {
+        'count': int(values.size),
+        'mean_ms': float(values.mean()),
+        'p50_ms': float(np.percentile(values, 50)),
+        'p95_ms': float(np.percentile(values, 95)),
+        'p99_ms': float(np.percentile(values, 99)),
+        'max_ms': float(values.max())
+    }
+
+
+def make_queries(behaviors: List[Dict], n_users: int, n_queries: int, seed: int) -> List[tuple]:
+    """生成 (user_id, recommend_type) 查询序列，约十分之一为没有行为记录的冷启动用户"""
+    rng = random.Random(seed)
+    users = sorted({b['user_id'] for b in behaviors}) or [f'user_{i:06d}' for i in range(n_users)]
+    types = list(CONTENT_TYPES)
+    queries = []
+    for i in range(n_queries):
+        user_id = rng.choice(users) if rng.random() > 0.1 else f'cold_{i:06d}'
+        queries.append((user_id, rng.choice(types)))
+    return queries
+
+
+def run_query(env: BenchmarkEnvironment, query: tuple, limit: int) -> Dict[str, float]:
+    """执行一次推荐，返回各阶段耗时（毫秒）"""
+    timings = {}
+    env.db_service.run_and_release(
+        env.recommendation_service.get_recommendations, query[0], query[1], limit, timings=timings)
+    return timings
+
+
+def bench_ingestion(env: BenchmarkEnvironment, items: Dict[str, List[Dict]]) -> Dict:
+    durations = env.ingest(items)
+    total_items = sum(len(type_items) for type_items in items.values())
+    total_seconds = sum(durations.values())
+    return {
+        'items': total_items,
+        'seconds': total_seconds,
+        'items_per_second': total_items / total_seconds if total_seconds else 0.0,
+        'per_type_seconds': durations
+    }
+
+
+def bench_embedding(env: BenchmarkEnvironment, items: Dict[str, List[Dict]], n_texts: int) -> Dict:
+    embedding_service = env.chroma_service.embedding_service
+    texts = [
+        env.chroma_service._prepare_item_text(item, data_type)
+        for data_type, type_items in items.items() for item in type_items
+    ][:n_texts]
+
+    single = []
+    for text in texts:
+        started = time.perf_counter()
+        embedding_service.get_embedding(text)
+        single.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    embedding_service.get_batch_embeddings(texts)
+    batch_seconds = time.perf_counter() - started
+
+    return {
+        'single': summarize(single),
+        'batch_size': MODEL_CONFIG['batch_size'],
+        'batch_texts_per_second': len(texts) / batch_seconds if batch_seconds else 0.0
+    }
+
+
+def bench_latency(env: BenchmarkEnvironment, queries: List[tuple], limit: int, warmup: int) -> Dict:
+    for query in queries[:warmup]:
+        run_query(env, query, limit)
+
+    stages: Dict[str, List[float]] = {}
+    for query in queries:
+        for stage, duration in run_query(env, query, limit).items():
+            if isinstance(duration, float):
+                stages.setdefault(stage, []).append(duration)
+
+    result = summarize(stages.pop('total', []))
+    result['stages'] = {stage: summarize(samples) for stage, samples in stages.items()}
+    return result
+
+
+def bench_concurrent(env: BenchmarkEnvironment, queries: List[tuple], limit: int, concurrency: int) -> Dict:
+    def timed_query(query):
+        started = time.perf_counter()
+        run_query(env, query, limit)
+        return (time.perf_counter() - started) * 1000
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        started = time.perf_counter()
+        latencies = list(executor.map(timed_query, queries))
+        elapsed = time.perf_counter() - started
+
+    result = summarize(latencies)
+    result['concurrency'] = concurrency
+    result['throughput_qps'] = len(queries) / elapsed if elapsed else 0.0
+    return result
+
+
+def bench_memory(env: BenchmarkEnvironment, queries: List[tuple], limit: int) -> Dict:
+    tracemalloc.start()
+    for query in queries:
+        run_query(env, query, limit)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # 启用本地索引时查询不经过替代向量库，统计本地索引的占用
+    index = env.chroma_service.local_index or env.collection().index
+    usage = index.memory_usage()
+    return {
+        'query_peak_alloc_bytes': peak,
+        'vector_store_bytes': int(sum(usage.values())),
+        'vector_store_bytes_per_item': int(sum(usage.values()) / max(len(index), 1)),
+        # Linux 上 ru_maxrss 的单位为 KB
+        'process_max_rss_bytes': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    }
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL,
+                                       cwd=os.path.dirname(RESULTS_DIR)).decode().strip()
+    except Exception:
+        return 'unknown'
+
+
+def flatten(results: Dict, prefix: str = '') -> Dict[str, float]:
+    """把嵌套的结果展开为 'scenario.metric' 形式的数值字典"""
+    flat = {}
+    for key, value in results.items():
+        name = f'{prefix}{key}'
+        if isinstance(value, dict):
+            flat.update(flatten(value, f'{name}.'))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def compare(baseline: Dict, current: Dict, threshold: float) -> List[str]:
+    """对比两次结果，打印差异并返回超过阈值的退化指标"""
+    old, new = flatten(baseline['results']), flatten(current['results'])
+    regressions = []
+    print(f"\nCompare with {baseline['meta'].get('revision')} ({baseline['meta'].get('timestamp')})")
+    print(f"{'metric':<60}{'baseline':>14}{'current':>14}{'change':>10}")
+    for name in sorted(set(old) & set(new)):
+        if name.endswith('count') or name.endswith('.items') or name.endswith('concurrency'):
+            continue
+        before, after = old[name], new[name]
+        change = (after - before) / before if before else 0.0
+        worse = -change if name.endswith(HIGHER_IS_BETTER) else change
+        flag = ''
+        if worse > threshold:
+            flag = '  REGRESSION'
+            regressions.append(name)
+        print(f"{name:<60}{before:>14.3f}{after:>14.3f}{change:>+10.1%}{flag}")
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='推荐系统基准测试')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                        help=f'逗号分隔的场景列表，可选：{",".join(SCENARIOS)}')
+    parser.add_argument('--embedding', choices=['hash', 'model'], default='hash',
+                        help='hash：不加载模型，只测量模型以外的开销；model：使用真实模型')
+    parser.add_argument('--local-index', choices=['float32', 'float16', 'int8', 'pq'],
+                        help='导入后构建本地压缩索引，查询走本地索引')
+    parser.add_argument('--items-per-type', type=int, default=500)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--events-per-user', type=int, default=20)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--warmup', type=int, default=10)
+    parser.add_argument('--limit', type=int, default=RECOMMENDATION_CONFIG['default_results'])
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--embedding-texts', type=int, default=64)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workdir', help='工作目录，默认使用临时目录')
+    parser.add_argument('--output', help='结果文件路径，默认写入 benchmarks/results/')
+    parser.add_argument('--compare', help='用于对比的历史结果文件')
+    parser.add_argument('--threshold', type=float, default=0.1, help='判定为退化的相对变化，默认 10%%')
+    parser.add_argument('--fail-on-regression', action='store_true', help='存在退化时以非零状态码退出')
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    logging.basicConfig(level=logging.WARNING)
+    args = parse_args(argv)
+    scenarios = [s for s in args.scenarios.split(',') if s]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        print(f"Unknown scenarios: {', '.join(sorted(unknown))}", file=sys.stderr)
+        return 2
+
+    items = generate_items(args.items_per_type, seed=args.seed)
+    behaviors = generate_behaviors(items, args.users, args.events_per_user, seed=args.seed)
+    queries = make_queries(behaviors, args.users, args.queries, seed=args.seed)
+
+    with tempfile.TemporaryDirectory(prefix='recommend-bench-') as tmpdir:
+        env = BenchmarkEnvironment(args.workdir or tmpdir, embedding=args.embedding, local_index=args.local_index)
+        results = {}
+        try:
+            # 导入数据是其余场景的前提，未选择 ingestion 场景时仍然执行，只是不记录结果
+            ingestion = bench_ingestion(env, items)
+            if 'ingestion' in scenarios:
+                results['ingestion'] = ingestion
+            env.load_behaviors(behaviors)
+
+            if 'embedding' in scenarios:
+                results['embedding'] = bench_embedding(env, items, args.embedding_texts)
+            if 'latency' in scenarios:
+                results['latency'] = bench_latency(env, queries, args.limit, args.warmup)
+            if 'concurrent' in scenarios:
+                results['concurrent'] = bench_concurrent(env, queries, args.limit, args.concurrency)
+            if 'memory' in scenarios:
+                results['memory'] = bench_memory(env, queries[:50], args.limit)
+        finally:
+            env.close()
+
+    report = {
+        'meta': {
+            'revision': git_revision(),
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count()
+        },
+        'params': {key: value for key, value in vars(args).items()
+                   if key not in ('output', 'compare', 'workdir', 'fail_on_regression')},
+        'results': results
+    }
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"{datetime.now():%Y%m%d-%H%M%S}-{report['meta']['revision']}.json")
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('params') != report['params']:
+            print('Warning: benchmark parameters differ from the baseline', file=sys.stderr)
+        regressions = compare(baseline, report, args.threshold)
+        if regressions and args.fail_on_regression:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,216 @@
+import json
+import os
+import random
+from itertools import accumulate
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+from config.settings import CONTENT_TYPES
+
+# 生成文本用的词表，覆盖语言文字领域的常见主题
+VOCABULARY = [
+    '语言', '方言', '语音', '语料库', '计算语言学', '机器翻译', '词汇', '语法', '汉字', '文字改革',
+    '普通话', '少数民族语言', '语言政策', '语言教育', '二语习得', '语义', '句法', '音韵', '辞书', '术语',
+    '语言资源', '语言保护', '自然语言处理', '大模型', '知识图谱', '信息检索', '语言测试', '国际中文教育',
+    '社会语言学', '心理语言学', '儿童语言', '手语', '文本分类', '情感分析', '语音识别', '语音合成',
+    '古籍整理', '训诂', '方言地图', '语言景观', '网络语言', '新词新语', '规范标准', '语言服务'
+]
+
+SURNAMES = ['王', '李', '张', '刘', '陈', '杨', '赵', '黄', '周', '吴']
+GIVEN_NAMES = ['伟', '芳', '娜', '敏', '静', '磊', '洋', '艳', '勇', '军', '杰', '涛']
+PUBLISHERS = ['教育部语言文字信息管理司', '国家语委', '中国社会科学院语言研究所', '北京语言大学', '商务印书馆']
+ACTIONS = ['view', 'like', 'share', 'comment', 'save']
+ACTION_WEIGHTS = [0.6, 0.15, 0.05, 0.05, 0.15]
+ACTION_VERBS = {
+    'view': '浏览了',
+    'like': '点赞了',
+    'share': '分享了',
+    'comment': '评论了',
+    'save': '收藏了'
+}
+
+
+def _phrase(rng: random.Random, topics: List[str], length: int) -> str:
+    """以用户偏好的主题为主拼接一段文本"""
+    words = [rng.choice(topics) if rng.random() < 0.7 else rng.choice(VOCABULARY) for _ in range(length)]
+    return ''.join(words)
+
+
+def _name(rng: random.Random) -> str:
+    return rng.choice(SURNAMES) + rng.choice(GIVEN_NAMES) + rng.choice(GIVEN_NAMES)
+
+
+def _date(rng: random.Random, start: datetime, days: int) -> str:
+    return (start + timedelta(days=rng.randrange(days))).strftime('%Y-%m-%d')
+
+
+def generate_item(rng: random.Random, data_type: str, index: int, start: datetime = datetime(2019, 1, 1),
+                  days: int = 2000) -> Dict:
+    """按数据类型生成一条与真实数据字段一致的条目
+
+    Args:
+        rng (random.Random): 随机数生成器
+        data_type (str): 数据类型（CONTENT_TYPES 的键）
+        index (int): 序号；与 pre-process.ipynb 处理后的数据一致，ID 在每种类型内从 1 编号，不同类型的ID会重复
+        start (datetime): 发布时间的起点
+        days (int): 发布时间的跨度（天）
+
+    Returns:
+        Dict: 条目数据
+    """
+    topics = rng.sample(VOCABULARY, 3)
+    item_id = index + 1
+
+    if data_type == 'academic':
+        return {
+            'id': item_id,
+            'title': _phrase(rng, topics, 4) + '研究',
+            'abstract': _phrase(rng, topics, 40),
+            'keywords': topics,
+            'authors': [{'name': _name(rng)} for _ in range(rng.randint(1, 4))],
+            'publication': rng.choice(['中国语文', '语言文字应用', '方言', '中文信息学报']),
+            'year': _date(rng, start, days)[:4]
+        }
+
+    if data_type == 'conference':
+        return {
+            'id': item_id,
+            'name': _phrase(rng, topics, 3) + '学术研讨会',
+            'date': _date(rng, start, days),
+            'agenda': [{'topic': _phrase(rng, topics, 5)} for _ in range(rng.randint(2, 6))],
+            'speakers': [{'name': _name(rng)} for _ in range(rng.randint(1, 5))],
+            'tags': topics
+        }
+
+    if data_type == 'white_paper':
+        return {
+            'id': item_id,
+            'title': _phrase(rng, topics, 3) + '发展报告',
+            'abstract': _phrase(rng, topics, 30),
+            'content': _phrase(rng, topics, 200),
+            'publish_date': _date(rng, start, days),
+            'publisher': rng.choice(PUBLISHERS),
+            'tags': topics
+        }
+
+    # douban / news / weibo 共用标题 + 正文 + 标签的结构
+    content_length = {'weibo': 30, 'douban': 80}.get(data_type, 150)
+    return {
+        'id': item_id,
+        'title': _phrase(rng, topics, 4),
+        'content': _phrase(rng, topics, content_length),
+        'tags': topics,
+        'date': _date(rng, start, days)
+    }
+
+
+def generate_items(n_per_type: int, seed: int = 0, types: List[str] = None) -> Dict[str, List[Dict]]:
+    """为每种内容类型生成 n_per_type 条条目
+
+    Returns:
+        Dict[str, List[Dict]]: 数据类型到条目列表的映射
+    """
+    rng = random.Random(seed)
+    return {
+        data_type: [generate_item(rng, data_type, i) for i in range(n_per_type)]
+        for data_type in (types or list(CONTENT_TYPES))
+    }
+
+
+def item_title(item: Dict) -> str:
+    """条目的展示标题"""
+    return item.get('title') or item.get('name') or ''
+
+
+def item_topics(item: Dict) -> List[str]:
+    """条目生成时使用的主题词"""
+    return item.get('keywords') or item.get('tags') or []
+
+
+def generate_behaviors(items: Dict[str, List[Dict]], n_users: int, events_per_user: int, seed: int = 0,
+                       end: datetime = None, days: int = 90, zipf_s: float = 1.1,
+                       topic_affinity: float = 0.6) -> List[Dict]:
+    """生成用户行为记录
+
+    每个用户偏好少数几种内容类型和几个主题词：以 topic_affinity 的概率选择包含偏好主题的条目，
+    否则按热度（Zipf 分布）选择条目。时间戳在 end 之前的 days 天内均匀分布，便于按时间切分做离线评估。
+
+    Args:
+        items (Dict[str, List[Dict]]): generate_items 的返回值
+        n_users (int): 用户数量
+        events_per_user (int): 每个用户的平均行为数量（指数分布）
+        seed (int): 随机种子
+        end (datetime, optional): 最晚的行为时间，默认为当前时间
+        days (int): 行为时间的跨度（天）
+        zipf_s (float): 热度分布的 Zipf 指数
+        topic_affinity (float): 按偏好主题选择条目的概率
+
+    Returns:
+        List[Dict]: 行为记录，字段与 user_behavior 表一致（不含自增ID），按时间排序
+    """
+    rng = random.Random(seed)
+    end = end or datetime.now()
+    types = list(items)
+
+    popularity = {
+        data_type: list(accumulate(1 / (rank + 1) ** zipf_s for rank in range(len(pool))))
+        for data_type, pool in items.items()
+    }
+    by_topic = {}
+    for data_type, pool in items.items():
+        for item in pool:
+            for topic in item_topics(item):
+                by_topic.setdefault((data_type, topic), []).append(item)
+
+    behaviors = []
+    for u in range(n_users):
+        user_id = f'user_{u:06d}'
+        preferred_types = rng.sample(types, min(len(types), rng.randint(1, 3)))
+        preferred_topics = rng.sample(VOCABULARY, 3)
+        n_events = max(1, int(rng.expovariate(1 / events_per_user)))
+        for _ in range(n_events):
+            data_type = rng.choice(preferred_types)
+            matching = by_topic.get((data_type, rng.choice(preferred_topics)))
+            if matching and rng.random() < topic_affinity:
+                item = rng.choice(matching)
+            else:
+                item = rng.choices(items[data_type], cum_weights=popularity[data_type])[0]
+            action = rng.choices(ACTIONS, ACTION_WEIGHTS)[0]
+            behaviors.append({
+                'user_id': user_id,
+                'item_id': str(item['id']),
+                'action': action,
+                'description': f"{ACTION_VERBS[action]}{CONTENT_TYPES[data_type]}《{item_title(item)}》",
+                'timestamp': end - timedelta(seconds=rng.randrange(days * 86400)),
+                'source': rng.choice(['web', 'app']),
+                'item_type': data_type
+            })
+
+    behaviors.sort(key=lambda b: b['timestamp'])
+    return behaviors
+
+
+def write_data_files(items: Dict[str, List[Dict]], directory: str) -> Dict[str, str]:
+    """把生成的条目写成与 data/ 目录相同格式的 JSON 文件
+
+    Returns:
+        Dict[str, str]: 数据类型到文件路径的映射
+    """
+    os.makedirs(directory, exist_ok=True)
+    paths = {}
+    for data_type, type_items in items.items():
+        path = os.path.join(directory, f'{data_type}.json')
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(type_items, f, ensure_ascii=False)
+        paths[data_type] = path
+    return paths
+
+
+def load_behaviors(db_service, behaviors: List[Dict], batch_size: int = 5000):
+    """批量写入行为记录（保留生成的时间戳，不经过 add_user_behavior）"""
+    from app.models.user_behavior import UserBehavior
+
+    session = db_service.session
+    for i in range(0, len(behaviors), batch_size):
+        session.bulk_insert_mappings(UserBehavior, behaviors[i:i + batch_size])
+        session.commit()
@@ -6,6 +6,7 @@ BASE_DIR = Path(__file__).parent.parent
 DATA_DIR = os.path.join(BASE_DIR, 'data')
 CHROMA_DIR = os.path.join(BASE_DIR, 'chroma_db')
 MODELS_CACHE_DIR = os.path.join(BASE_DIR, 'models_cache')
+INDEX_DIR = os.path.join(BASE_DIR, 'index_cache')
 
 # 数据库配置
 DATABASE_URL = os.getenv('DATABASE_URL', 'sqlite:///recommendation.db')
@@ -37,6 +38,85 @@ RECOMMENDATION_CONFIG = {
     'default_results': 5
 }
 
+# 两阶段召回与排序配置
+RANKING_CONFIG = {
+    'candidate_multiplier': 4,       # 每路召回的候选数量 = limit * candidate_multiplier
+    'min_candidates': 50,            # 每路召回的最少候选数量
+    'default_weight': 0.2,           # 默认（冷启动）召回参与补足时的权重
+    'similarity_weight': 0.7,        # 排序得分中相关度的权重
+    'recency_weight': 0.15,          # 排序得分中新鲜度的权重
+    'popularity_weight': 0.15,       # 排序得分中热度的权重
+    'recency_half_life_days': 365,
+    'popularity_window_days': 30,
+    'filter_seen': True,             # 过滤用户已交互过的条目
+    'diversity_lambda': None,        # MMR 多样化默认参数，None 表示不做多样化，可按请求覆盖
+    'diversity_pool_multiplier': 5   # MMR 在得分前 limit * diversity_pool_multiplier 个候选中选择
+}
+
+# 已看过滤配置（每个用户一个布隆过滤器）
+SEEN_FILTER_CONFIG = {
+    'actions': ['view', 'save'],  # 视为"已看"的行为类型
+    'capacity': 5000,             # 初始容量，写满后按历史行为重建并扩容一倍
+    'error_rate': 0.01,           # 误判率（误判只会多过滤条目，不会漏过滤）
+    'overfetch_max': 200,         # 按已看数量额外多召回的候选数量上限
+    'cache_size': 10000,          # 内存中缓存的用户过滤器数量
+    'cache_ttl': 600
+}
+
+# 缓存配置
+CACHE_CONFIG = {
+    'default_recommendations': {'max_size': 64, 'ttl': 300},  # 按类型缓存默认召回结果
+    'recommendation_feeds': {'max_size': 1024, 'ttl': 600}    # 分页推荐的排序结果，按游标读取
+}
+
+# 热度统计配置：按行为事件流式聚合带时间衰减的条目热度，用作排序特征和冷启动的热门推荐
+POPULARITY_CONFIG = {
+    'enabled': os.getenv('POPULARITY_ENABLED', 'true').lower() == 'true',  # 关闭时排序直接按数据库统计热度
+    'half_life_hours': 24,      # 热度半衰期
+    'action_weights': {'view': 1.0, 'like': 2.0, 'share': 3.0, 'comment': 3.0, 'save': 3.0},
+    'sketch_width': 65536,      # Count-Min Sketch 每行计数器数量（内存 = width * depth * 8 字节）
+    'sketch_depth': 4,
+    'top_k': 500,               # 每种类型保留的热门条目数量
+    'catalog_size': 50000,      # 记录条目向量库ID和类型的数量上限
+    'replay_days': 7,           # 启动时从数据库回放最近若干天的行为
+    'sync_interval': 5,         # 读取其他进程写入的新行为的间隔（秒）
+    'sync_batch_size': 5000,
+    'min_trending': 5           # 热门条目少于该数量时默认推荐只使用语义召回
+}
+
+# 长历史用户画像配置：逐条读取交互条目的向量（带缓存），按时间和行为加权汇总为画像向量，
+# 替代拼接全部历史文本后整体编码（超过 max_length 的部分会被截断）
+PROFILE_CONFIG = {
+    'enabled': os.getenv('PROFILE_POOLING_ENABLED', 'true').lower() == 'true',  # 关闭时使用拼接的历史文本
+    'max_events': 100,          # 最多使用的最近交互数量
+    'half_life_days': 14,       # 交互权重的时间半衰期
+    'action_weights': {'view': 1.0, 'like': 2.0, 'share': 2.5, 'comment': 2.5, 'save': 3.0},
+    'n_interests': int(os.getenv('PROFILE_INTERESTS', 3)),  # 兴趣向量数量上限，1 表示只生成一个画像向量
+    'min_events_per_interest': 5,   # 每个兴趣向量至少需要的交互数量
+    'min_interest_share': 0.15,     # 权重占比低于该值的兴趣向量不参与检索
+    'kmeans_iterations': 10,
+    'cache_size': 20000,        # 缓存的条目/文本向量数量（float16，768 维约 1.5KB/个）
+    'cache_ttl': 3600
+}
+
+# 条目增量导入配置（POST /items）
+INGEST_CONFIG = {
+    'max_items': 500,   # 每个请求最多导入的条目数量
+    'batch_size': 32,   # 每批推理并写入的条目数量，批次之间检查请求的截止时间
+    # 导入使用单独的准入名额，长时间的推理不占用在线推荐的名额（启用 ADMISSION_CONFIG 时生效）
+    'max_concurrent': int(os.getenv('INGEST_MAX_CONCURRENT', 1)),
+    'max_queue': int(os.getenv('INGEST_MAX_QUEUE', 4)),
+    'max_wait': 1.0,
+    # 其他进程导入的条目：每个进程的后台线程每隔 sync_interval 秒从向量库读取，加入本地索引的增量段并使对应类型的默认候选缓存失效
+    'sync_interval': int(os.getenv('INGEST_SYNC_INTERVAL', 5)),
+    'sync_lag': 60      # 读取窗口向前多留的秒数，写入时间早于完成时间的条目不会漏掉
+}
+
+# 分页推荐配置
+PAGINATION_CONFIG = {
+    'pool_size': 200  # 首次请求排序并缓存的条目数量，后续分页直接从缓存读取
+}
+
 # 内容类型描述
 CONTENT_TYPES = {
     'academic': '学术论文',
@@ -63,6 +143,30 @@ API_CONFIG = {
     'doc_url': '/apidocs'
 }
 
+# 服务进程配置
+SERVER_CONFIG = {
+    'host': os.getenv('SERVER_HOST', '0.0.0.0'),
+    'port': int(os.getenv('SERVER_PORT', 8888)),
+    'debug': os.getenv('FLASK_DEBUG', '0') == '1',                   # 仅开发服务器使用
+    'workers': int(os.getenv('SERVER_WORKERS', max(os.cpu_count() // 2, 1))),
+    'threads': int(os.getenv('SERVER_THREADS', 4)),                  # 每个工作进程的请求线程数
+    'torch_threads': int(os.getenv('TORCH_THREADS', 0)),             # 每个工作进程的推理线程数，0 表示按核数平均分配
+    'timeout': int(os.getenv('SERVER_TIMEOUT', 60)),
+    'graceful_timeout': int(os.getenv('SERVER_GRACEFUL_TIMEOUT', 30)),
+    'keepalive': 5,
+    'max_requests': int(os.getenv('SERVER_MAX_REQUESTS', 0)),        # 处理若干请求后重启工作进程，0 表示不限
+}
+
+# 启动配置
+STARTUP_CONFIG = {
+    'preload': os.getenv('STARTUP_PRELOAD', 'true').lower() == 'true',  # 启动时同步加载服务，false 时进程启动后在后台加载
+    'initialize_data': os.getenv('INITIALIZE_DATA', 'true').lower() == 'true',  # 加载时导入数据文件中新增的条目
+    'retry_after': 5,             # 服务加载期间请求返回 503 时的 Retry-After（秒）
+    'retry_backoff': 5,           # 加载失败后首次重试的等待时间（秒），之后每次失败翻倍，0 表示不重试
+    'max_retry_backoff': 300,     # 重试等待时间的上限（秒）
+    'max_retries': int(os.getenv('STARTUP_MAX_RETRIES', 5))  # 连续失败后的重试次数，用完后 /health 返回 503
+}
+
 # Chroma配置
 CHROMA_CONFIG = {
     'CHROMA_HOST': "124.222.113.16",  # 移除 http:// 前缀
@@ -70,5 +174,113 @@ CHROMA_CONFIG = {
     'CHROMA_KEY': "HgNJZah5697K2JByYWxE4sBzEp0I9Z2Xi2xf0ynagm0=",
     'CHROMA_TENANT': "zhihuiyuyan",
     'CHROMA_DATABASE': "default",
-    'CHROMA_COLLECTION_NAME': "recommendation_store"
-} 
\ No newline at end of file
+    'CHROMA_COLLECTION_NAME': "recommendation_store",
+    'EMBEDDING_DECIMALS': 6,          # 上传向量保留的小数位数，缩小请求体
+    'POOL_SIZE': int(os.getenv('CHROMA_POOL_SIZE', 32)),  # 保持长连接的 HTTP 连接数，不小于并发查询的线程数
+    'CONNECT_RETRIES': 2,             # 建立连接失败时的重试次数（请求已发出后不重试）
+    'BATCH_SIZE': 100,                # 批量写入的最大条数
+    'BATCH_MAX_BYTES': 4 * 1024 * 1024,  # 批量写入请求体的目标大小上限，写入失败时减半，成功后逐步恢复
+    'BATCH_MIN_BYTES': 256 * 1024
+}
+
+# 本地向量索引配置
+VECTOR_INDEX_CONFIG = {
+    'enabled': os.getenv('LOCAL_INDEX_ENABLED', 'false').lower() == 'true',  # 启用后查询走本地索引
+    'path': INDEX_DIR,
+    'storage': os.getenv('LOCAL_INDEX_STORAGE', 'float16'),  # float32 / float16 / int8 / pq
+    'pq_subspaces': 96,       # pq 子空间数量上限，不能整除（降维后的）向量维度时取不超过它的最大约数
+    'rerank': True,           # int8 / pq 时保存 float16 原始向量做精确重排
+    'rerank_factor': 4,       # 近似检索返回 n_results * rerank_factor 个候选用于重排
+    'mmap_rerank': True,      # 重排向量以 mmap 方式加载
+    'mmap_documents': os.getenv('LOCAL_INDEX_MMAP_DOCUMENTS', 'false').lower() == 'true',  # 文档以 mmap 方式读取，只在内存中保存行偏移
+    'reload_interval': int(os.getenv('LOCAL_INDEX_RELOAD_INTERVAL', 30)),  # 检查新版本索引的间隔（秒），0 表示不检查
+    'keep_versions': 3        # 发布新版本后保留的历史版本数量（用于回滚）
+}
+
+# 向量降维配置（仅作用于本地索引）
+PROJECTION_CONFIG = {
+    'enabled': os.getenv('PROJECTION_ENABLED', 'false').lower() == 'true',
+    'n_components': int(os.getenv('PROJECTION_DIM', 192)),  # 建议 128~256
+    'whiten': False,          # 是否做 PCA 白化
+    'fit_sample_size': 50000, # 训练投影的最大样本数
+    'recall_sample': 200,     # 评估召回损失时使用的查询数量
+    'recall_k': 10
+}
+
+# 召回阶段并发配置
+CONCURRENCY_CONFIG = {
+    'max_workers': int(os.getenv('RECOMMEND_STAGE_WORKERS', 16)),
+    'stage_timeouts': {           # 各阶段超时（秒），超时的召回来源会被跳过
+        'behavior': 0.5,
+        'default': 2.0,
+        'content': 2.0,
+        'collaborative': 2.0
+    }
+}
+
+# 异步服务配置（ASGI 模式）
+ASYNC_CONFIG = {
+    'io_workers': int(os.getenv('ASYNC_IO_WORKERS', 32)),    # 数据库与向量库调用的线程数
+    'cpu_workers': int(os.getenv('ASYNC_CPU_WORKERS', 2)),   # 模型推理的线程数
+    'cpu_queue_size': 16                                     # 等待推理的请求上限，超出时在事件循环中排队
+}
+
+# 监控指标配置
+METRICS_CONFIG = {
+    'enabled': os.getenv('METRICS_ENABLED', '1') == '1',  # 是否开放 /metrics 接口
+    'server_timing': True                                 # 是否在响应头中返回各阶段耗时
+}
+
+# 响应序列化与压缩配置
+RESPONSE_CONFIG = {
+    'compress_min_size': 1024,  # 响应体小于该字节数时不压缩
+    'gzip_level': 5,
+    'brotli_quality': 4,        # 安装 brotli 后支持 br 压缩
+    'max_fields': 30            # fields 参数最多可指定的字段数
+}
+
+# 离线预计算推荐配置（scripts/precompute_recommendations.py）
+PRECOMPUTE_CONFIG = {
+    'enabled': os.getenv('PRECOMPUTE_ENABLED', 'true').lower() == 'true',  # 在线请求优先读取预计算结果
+    'top_n': 50,            # 每个用户每种类型保存的条目数量
+    'active_days': 7,       # 最近多少天内有行为的用户视为活跃用户
+    'min_events': 3,        # 活跃用户在该时间段内的最少行为数量
+    'batch_size': 64,       # 每批处理的用户数量
+    'max_age_hours': 36,    # 超过该时间的预计算结果不再使用
+    'fresh_weight': 0.4     # 用户有新行为时，实时召回结果与预计算结果合并的权重
+}
+
+# 准入控制配置：限制同时执行推理与向量检索的请求数，过载时降级返回预计算或默认推荐
+ADMISSION_CONFIG = {
+    'enabled': os.getenv('ADMISSION_ENABLED', 'true').lower() == 'true',
+    'max_concurrent': int(os.getenv('ADMISSION_MAX_CONCURRENT', 8)),  # 每个进程同时执行在线召回的请求数
+    'max_queue': int(os.getenv('ADMISSION_MAX_QUEUE', 32)),           # 等待队列长度，超出时立即降级
+    'max_wait': 0.5,              # 排队的最长时间（秒）
+    'request_budget': 3.0,        # 客户端未指定时每个请求的时间预算（秒）
+    'max_budget': 10.0,           # 客户端可指定的最大时间预算（秒）
+    'deadline_header': 'X-Request-Timeout-Ms',  # 客户端传入剩余时间预算（毫秒）的请求头
+    'retry_after': 1              # 无法降级返回 503 时的 Retry-After（秒）
+}
+
+# 内存配置：低内存模式用于内存较小的服务节点（scripts/memory_profile.py 可查看各组件的内存占用）
+MEMORY_CONFIG = {
+    'low_memory': os.getenv('LOW_MEMORY_MODE', 'false').lower() == 'true',
+    'rss_budget_mb': int(os.getenv('RSS_BUDGET_MB', 0)),  # 常驻内存预算，超出时清理缓存，0 表示不限制
+    'check_interval': 10,       # 检查常驻内存的最小间隔（秒）
+    'trim_fraction': 0.5,       # 超出预算时每个缓存淘汰的条目比例
+    'quantize_model': os.getenv('QUANTIZE_MODEL', '').lower() == 'true',  # 模型线性层动态量化为 int8（仅 CPU）
+    'cache_scale': 0.25,        # 低内存模式下各缓存容量相对默认值的比例
+    'sketch_width': 16384       # 低内存模式下热度统计 Count-Min Sketch 每行的计数器数量
+}
+
+# 低内存模式：量化模型，本地索引的重排向量和文档以 mmap 方式留在磁盘上，缩小各缓存的容量
+if MEMORY_CONFIG['low_memory']:
+    MEMORY_CONFIG['quantize_model'] = os.getenv('QUANTIZE_MODEL', 'true').lower() == 'true'
+    VECTOR_INDEX_CONFIG['mmap_rerank'] = True
+    VECTOR_INDEX_CONFIG['mmap_documents'] = True
+    for _cache in CACHE_CONFIG.values():
+        _cache['max_size'] = max(int(_cache['max_size'] * MEMORY_CONFIG['cache_scale']), 1)
+    PROFILE_CONFIG['cache_size'] = int(PROFILE_CONFIG['cache_size'] * MEMORY_CONFIG['cache_scale'])
+    SEEN_FILTER_CONFIG['cache_size'] = int(SEEN_FILTER_CONFIG['cache_size'] * MEMORY_CONFIG['cache_scale'])
+    POPULARITY_CONFIG['catalog_size'] = int(POPULARITY_CONFIG['catalog_size'] * MEMORY_CONFIG['cache_scale'])
+    POPULARITY_CONFIG['sketch_width'] = MEMORY_CONFIG['sketch_width']
@@ -0,0 +1,40 @@
+"""gunicorn 生产环境配置
+
+用法：gunicorn -c gunicorn.conf.py wsgi:app （或 python run.py --production）
+
+- preload_app：模型、索引和数据在主进程中加载一次，工作进程 fork 后以写时复制方式共享；
+  设置 STARTUP_PRELOAD=false 时主进程只创建应用，各工作进程 fork 后在后台加载服务（不导入数据文件，
+  需要时先运行 python -m scripts.build_index --ingest），加载期间 /api/v1/health 即可响应，/api/v1/ready 返回 503
+- 每个工作进程的 torch 推理线程数受限，避免多个进程抢占同一批核心
+- kill -HUP <master pid> 平滑重启所有工作进程，正在处理的请求会在 graceful_timeout 内完成
+"""
+import os
+from config.settings import SERVER_CONFIG
+
+workers = SERVER_CONFIG['workers']
+threads = SERVER_CONFIG['threads']
+torch_threads = SERVER_CONFIG['torch_threads'] or max((os.cpu_count() or 1) // workers, 1)
+
+# 必须在导入 torch 之前设置，主进程和工作进程都会继承
+os.environ.setdefault('OMP_NUM_THREADS', str(torch_threads))
+os.environ.setdefault('MKL_NUM_THREADS', str(torch_threads))
+os.environ.setdefault('TOKENIZERS_PARALLELISM', 'false')
+
+bind = f"{SERVER_CONFIG['host']}:{SERVER_CONFIG['port']}"
+worker_class = 'gthread'
+preload_app = True
+timeout = SERVER_CONFIG['timeout']
+graceful_timeout = SERVER_CONFIG['graceful_timeout']
+keepalive = SERVER_CONFIG['keepalive']
+max_requests = SERVER_CONFIG['max_requests']
+max_requests_jitter = max_requests // 10
+
+
+def post_fork(server, worker):
+    """工作进程初始化：限制推理线程，丢弃从主进程继承的连接（未预加载时开始后台加载）"""
+    import torch
+    from app.services.service_loader import services
+
+    torch.set_num_threads(torch_threads)
+    services.after_fork()
+    server.log.info(f"Worker {worker.pid} ready with {torch_threads} torch threads")
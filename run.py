@@ -1,9 +1,12 @@
 from flask import Flask
 from app.api.routes import recommend_bp
 from app.extensions import swagger
-from config.settings import API_CONFIG
-from app.services.chroma_service import ChromaService
+from app.services.service_loader import services
+from config.settings import API_CONFIG, SERVER_CONFIG, STARTUP_CONFIG, BASE_DIR
+import argparse
 import logging
+import os
+import time
 
 # 配置日志
 logging.basicConfig(
@@ -12,22 +15,17 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def initialize_data():
-    """初始化数据"""
-    try:
-        logger.info("Initializing Chroma database...")
-        chroma_service = ChromaService()
-        chroma_service.initialize_data()
-        logger.info("Data initialization completed")
-    except Exception as e:
-        logger.error(f"Error initializing data: {str(e)}")
-        raise
-
-def create_app():
-    """创建并配置 Flask 应用"""
-    # 初始化数据
-    initialize_data()
+def create_app(preload: bool = None):
+    """创建并配置 Flask 应用
+    
+    导入接口模块不会创建服务，数据库、模型、向量库和本地索引由 services 按阶段加载
+    （启用 STARTUP_CONFIG['initialize_data'] 时同时导入数据文件）。
     
+    Args:
+        preload (bool, optional): 是否在返回前加载完服务，默认使用 STARTUP_CONFIG['preload']；
+            为 False 时由调用方启动后台加载（gunicorn 在工作进程 fork 后开始，见 gunicorn.conf.py）
+    """
+    started = time.perf_counter()
     app = Flask(__name__)
     
     # 注册蓝图
@@ -35,10 +33,29 @@ def create_app():
     
     # 初始化 Swagger
     swagger.init_app(app)
+    logger.info(f"Application created in {time.perf_counter() - started:.2f}s")
+    
+    if STARTUP_CONFIG['preload'] if preload is None else preload:
+        services.load()
     
     return app
 
+def run_production():
+    """使用 gunicorn 多进程启动（配置见 gunicorn.conf.py）"""
+    os.chdir(BASE_DIR)
+    os.execvp('gunicorn', ['gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app'])
+
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='智能推荐系统')
+    parser.add_argument('--production', action='store_true', help='使用 gunicorn 多进程模式启动')
+    args = parser.parse_args()
+    
+    if args.production:
+        run_production()
+    
     app = create_app()
+    # 未预加载时服务在后台加载，期间 /api/v1/health 可以访问，/api/v1/ready 返回当前加载阶段
+    services.start()
     logger.info("Starting recommendation system...")
-    app.run(debug=True, port=8888,host='0.0.0.0')
\ No newline at end of file
+    # 开发服务器：FLASK_DEBUG=1 开启调试模式；自动重载会在子进程中再加载一次模型，始终关闭
+    app.run(debug=SERVER_CONFIG['debug'], use_reloader=False, port=SERVER_CONFIG['port'], host=SERVER_CONFIG['host'])
\ No newline at end of file
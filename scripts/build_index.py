@@ -0,0 +1,66 @@
+"""离线构建本地向量索引并发布为新版本
+
+从 Chroma 导出全部向量，按 VECTOR_INDEX_CONFIG 构建压缩索引，写入 INDEX_DIR/versions/<版本号>/ 后原子切换 CURRENT。
+启用了本地索引（LOCAL_INDEX_ENABLED=true）的服务进程会在 reload_interval 秒内加载新版本，不需要重启。
+
+    python -m scripts.build_index --ingest          # 先导入 data/ 中新增的条目，再构建并发布
+    python -m scripts.build_index --storage int8
+    python -m scripts.build_index --list
+    python -m scripts.build_index --activate 20240105-031500   # 回滚到历史版本
+"""
+import argparse
+import logging
+import sys
+
+from app.services.chroma_service import ChromaService
+from config.settings import VECTOR_INDEX_CONFIG
+from utils.index_snapshots import IndexStore
+
+logger = logging.getLogger(__name__)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='构建并发布本地向量索引')
+    parser.add_argument('--ingest', action='store_true', help='构建前把数据文件中的新条目写入 Chroma')
+    parser.add_argument('--storage', choices=['float32', 'float16', 'int8', 'pq'], help='覆盖配置中的存储格式')
+    parser.add_argument('--keep', type=int, default=VECTOR_INDEX_CONFIG['keep_versions'], help='保留的历史版本数量')
+    parser.add_argument('--list', action='store_true', help='列出已发布的版本')
+    parser.add_argument('--activate', metavar='VERSION', help='切换到指定的已发布版本')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    store = IndexStore(VECTOR_INDEX_CONFIG['path'])
+
+    if args.list:
+        current = store.current_version()
+        for version in store.versions():
+            print(f"{'*' if version == current else ' '} {version}")
+        return 0
+
+    if args.activate:
+        try:
+            store.activate(args.activate)
+        except ValueError as e:
+            logger.error(str(e))
+            return 2
+        logger.info(f"Activated vector index version {args.activate}")
+        return 0
+
+    if args.storage:
+        VECTOR_INDEX_CONFIG['storage'] = args.storage
+    VECTOR_INDEX_CONFIG['keep_versions'] = args.keep
+    # 构建脚本不需要加载已有的索引，也不需要后台检查新版本
+    VECTOR_INDEX_CONFIG['enabled'] = False
+
+    chroma_service = ChromaService()
+    if args.ingest:
+        chroma_service.ingest_data_files()
+    index = chroma_service.build_local_index()
+    if index is None:
+        return 1
+    logger.info(f"Current vector index version: {store.current_version()}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
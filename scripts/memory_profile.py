@@ -0,0 +1,164 @@
+"""统计推荐服务各组件的内存占用
+
+按服务启动的顺序依次加载各组件，记录每一步增加的常驻内存（RSS），并估算模型权重、
+分词器、缓存、本地索引、热度统计等组件的大小，最后与 MEMORY_CONFIG['rss_budget_mb'] 比较。
+设置 LOW_MEMORY_MODE=true 后运行可以对比低内存模式的效果。
+
+    python -m scripts.memory_profile
+    python -m scripts.memory_profile --warmup 50 --data-files --json
+    LOW_MEMORY_MODE=true RSS_BUDGET_MB=1500 python -m scripts.memory_profile
+
+超出预算时退出码为 1，可用于部署前检查。
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+from typing import Dict, List, Tuple
+
+from config.settings import CONTENT_TYPES, DATA_FILES, MEMORY_CONFIG
+from utils.memory import rss_bytes, deep_sizeof, cache_sizes, release_free_memory
+
+logger = logging.getLogger(__name__)
+
+
+def _mb(size: int) -> float:
+    return size / 2 ** 20
+
+
+class MemoryProfile:
+    """按步骤记录常驻内存增量和各组件的估算大小"""
+
+    def __init__(self):
+        self.started = rss_bytes()
+        self.last = self.started
+        self.steps: List[Tuple[str, int]] = []
+        self.components: List[Tuple[str, int]] = []
+
+    def step(self, name: str):
+        """记录上一步之后增加的常驻内存"""
+        current = rss_bytes()
+        self.steps.append((name, current - self.last))
+        self.last = current
+
+    def measured(self, name: str, size: int):
+        """记录组件自行测量的常驻内存增量（计入之后 step 的起点）"""
+        self.steps.append((name, int(size)))
+        self.last = rss_bytes()
+
+    def component(self, name: str, size: int):
+        self.components.append((name, int(size)))
+
+    def to_dict(self, budget_mb: int) -> Dict:
+        return {
+            'rss_mb': round(_mb(self.last), 1),
+            'budget_mb': budget_mb,
+            'steps_mb': {name: round(_mb(size), 1) for name, size in self.steps},
+            'components_mb': {name: round(_mb(size), 1) for name, size in self.components}
+        }
+
+    def format(self, budget_mb: int) -> str:
+        width = max(len(name) for name, _ in self.steps + self.components)
+        lines = ['Resident memory by startup step:']
+        lines += [f"  {name:<{width}}  {_mb(size):10.1f} MB" for name, size in self.steps]
+        lines.append('Estimated component sizes:')
+        lines += [f"  {name:<{width}}  {_mb(size):10.1f} MB" for name, size in self.components]
+        budget = f" / budget {budget_mb} MB" if budget_mb else ''
+        lines.append(f"Total resident memory: {_mb(self.last):.1f} MB{budget}")
+        return '\n'.join(lines)
+
+
+def profile_service(warmup: int = 0, data_files: bool = False) -> MemoryProfile:
+    """按服务启动顺序加载各组件并统计内存
+
+    Args:
+        warmup (int): 加载后为最近活跃的若干个用户请求推荐，让缓存达到接近线上的状态
+        data_files (bool): 是否统计整体解析数据文件（旧的导入方式）需要的内存
+
+    Returns:
+        MemoryProfile: 统计结果
+    """
+    profile = MemoryProfile()
+
+    # 1. 依赖库的导入（torch、transformers 的导入图本身就占用数百 MB）
+    import torch  # noqa: F401
+    import transformers  # noqa: F401
+    profile.step('import torch/transformers')
+
+    # 2. 模型与分词器
+    from utils.embeddings import get_embedding_service
+    embedding_service = get_embedding_service()
+    for name, size in embedding_service.load_rss.items():
+        profile.measured(f"embedding.{name}", size)
+    for name, size in embedding_service.memory_usage().items():
+        profile.component(f"model.{name}", size)
+
+    # 3. 服务（数据库连接、本地索引、热度统计）
+    from app.services.database_service import DatabaseService
+    from app.services.recommendation_service import RecommendationService
+    db_service = DatabaseService()
+    service = RecommendationService(db_service)
+    profile.step('services and local index')
+
+    with service.chroma_service.index_snapshots.acquire() as index:
+        if index is not None:
+            for name, size in index.memory_usage().items():
+                profile.component(f"index.{name}", size)
+            base = getattr(index, 'base', index)
+            profile.component('index.ids', deep_sizeof(base.ids))
+            profile.component('index.metadatas', deep_sizeof(base.metadatas))
+    popularity = db_service.popularity
+    if popularity is not None:
+        profile.component('popularity.sketch', popularity.sketch.table.nbytes)
+        profile.component('popularity.catalog', deep_sizeof(popularity._catalog))
+
+    try:
+        # 4. 预热请求，填充各级缓存
+        if warmup:
+            user_ids = db_service.get_active_users(days=30, min_events=1)[:warmup]
+            for user_id in user_ids:
+                for recommend_type in CONTENT_TYPES:
+                    try:
+                        service.get_recommendations(user_id, recommend_type)
+                    except Exception as e:
+                        logger.error(f"Error warming up user {user_id}: {str(e)}")
+            profile.step(f"warmup ({len(user_ids)} users)")
+        for name, size in cache_sizes().items():
+            profile.component(f"cache.{name}", size)
+
+        # 5. 整体解析数据文件（导入数据时旧方式的峰值内存）
+        if data_files:
+            for data_type, file_path in DATA_FILES.items():
+                if os.path.exists(file_path):
+                    with open(file_path, 'r', encoding='utf-8') as f:
+                        profile.component(f"data_file.{data_type}", deep_sizeof(json.load(f)))
+            release_free_memory()
+            profile.step('data files (released)')
+    finally:
+        service.executor.shutdown(wait=False)
+        db_service.close()
+    return profile
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='统计推荐服务各组件的内存占用')
+    parser.add_argument('--warmup', type=int, default=0, help='加载后为最近活跃的若干个用户请求推荐')
+    parser.add_argument('--data-files', action='store_true', help='统计整体解析数据文件需要的内存')
+    parser.add_argument('--budget-mb', type=int, default=MEMORY_CONFIG['rss_budget_mb'], help='常驻内存预算（MB）')
+    parser.add_argument('--json', action='store_true', help='以 JSON 格式输出')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    logger.info(f"Profiling memory (low_memory={MEMORY_CONFIG['low_memory']}, "
+                f"quantize_model={MEMORY_CONFIG['quantize_model']})")
+    profile = profile_service(args.warmup, args.data_files)
+    if args.json:
+        print(json.dumps(profile.to_dict(args.budget_mb), ensure_ascii=False, indent=2))
+    else:
+        print(profile.format(args.budget_mb))
+    return 1 if args.budget_mb and profile.last > args.budget_mb * 2 ** 20 else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
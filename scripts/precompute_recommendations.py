@@ -0,0 +1,162 @@
+"""离线预计算活跃用户的推荐结果
+
+每晚运行一次，遍历最近活跃的用户，为每种推荐类型计算前 top_n 个条目写入 precomputed_recommendation 表。
+查询向量按批生成，每种类型的向量检索一次请求携带整批用户的查询向量。
+
+    python -m scripts.precompute_recommendations
+    python -m scripts.precompute_recommendations --days 3 --types academic,news --top-n 100
+
+crontab 示例（每天凌晨 3 点）：
+
+    0 3 * * * cd /path/to/recommendation-system && python -m scripts.precompute_recommendations >> precompute.log 2>&1
+"""
+import argparse
+import logging
+import sys
+import time
+from datetime import datetime
+from typing import Dict, List
+
+from app.models.precomputed_recommendation import PrecomputedRecommendation
+from app.services.database_service import DatabaseService
+from app.services.recommendation_service import RecommendationService
+from config.settings import CONTENT_TYPES, PRECOMPUTE_CONFIG
+
+logger = logging.getLogger(__name__)
+
+
+def precompute_batch(service: RecommendationService, user_ids: List[str], types: List[str], top_n: int,
+                     default_sets: Dict[str, dict]) -> List[PrecomputedRecommendation]:
+    """计算一批用户的推荐结果
+
+    Args:
+        service (RecommendationService): 推荐服务
+        user_ids (List[str]): 用户ID
+        types (List[str]): 推荐类型
+        top_n (int): 每种类型保存的条目数量
+        default_sets (Dict[str, dict]): 各类型的默认召回候选集（所有用户共用）
+
+    Returns:
+        List[PrecomputedRecommendation]: 待写入的记录
+    """
+    chroma_service = service.chroma_service
+    states = {user_id: service.load_user_state(user_id) for user_id in user_ids}
+    users = [user_id for user_id in user_ids if states[user_id][0]]
+    if not users:
+        return []
+
+    # 一次批量推理生成整批用户的查询向量：每个用户每种类型一条画像文本，以及一条与类型无关的历史文本
+    texts, slots = [], []
+    for user_id in users:
+        user_behavior = states[user_id][0]
+        for recommend_type in types:
+            texts.append(chroma_service.build_query_texts(user_behavior, recommend_type)['content'])
+            slots.append(('content', user_id, recommend_type))
+        # 历史文本与推荐类型无关，每个用户只生成一次
+        history_text = chroma_service.history_query_text(user_behavior)
+        if history_text:
+            texts.append(history_text)
+            slots.append(('collaborative', user_id, None))
+    embeddings = dict(zip(slots, chroma_service.embedding_service.get_batch_embeddings(texts)))
+
+    # 每个用户基于历史交互召回的查询向量：拼接历史文本的编码，或启用画像汇总时的一个或多个兴趣向量
+    history_embeddings = {}
+    for user_id in users:
+        if ('collaborative', user_id, None) in embeddings:
+            history_embeddings[user_id] = [embeddings[('collaborative', user_id, None)]]
+        elif chroma_service.profile_builder is not None:
+            vectors = chroma_service.profile_builder.build(states[user_id][0])
+            if vectors:
+                history_embeddings[user_id] = vectors
+
+    records = []
+    computed_at = datetime.now()
+    for recommend_type in types:
+        pool_size = service.candidate_pool_size(top_n)
+        # 多查询向量检索：每种类型、每路召回一次请求
+        content_sets = chroma_service.query_candidate_sets(
+            [embeddings[('content', user_id, recommend_type)] for user_id in users],
+            recommend_type, pool_size, source='content'
+        )
+        collaborative_users = list(history_embeddings)
+        collaborative_sets = dict(zip(collaborative_users, chroma_service.query_candidate_sets(
+            [embedding for user_id in collaborative_users for embedding in history_embeddings[user_id]],
+            recommend_type, pool_size, source='collaborative',
+            group_sizes=[len(history_embeddings[user_id]) for user_id in collaborative_users]
+        )))
+
+        for user_id, content in zip(users, content_sets):
+            user_behavior, seen_filter = states[user_id]
+            candidate_sets = [default_sets[recommend_type], content]
+            if user_id in collaborative_sets:
+                candidate_sets.append(collaborative_sets[user_id])
+            candidates = service.ranking_service.merge_candidates(candidate_sets, service.source_weights(user_behavior))
+            ranked = service.ranking_service.rank(candidates, top_n, seen_filter)
+            records.append(PrecomputedRecommendation.create(
+                user_id, recommend_type, ranked['ids'], ranked['scores'],
+                last_event_at=datetime.fromisoformat(user_behavior[0]['timestamp']),
+                computed_at=computed_at
+            ))
+    return records
+
+
+def precompute(service: RecommendationService, user_ids: List[str], types: List[str], top_n: int,
+               batch_size: int) -> Dict[str, float]:
+    """分批计算并写入所有用户的推荐结果
+
+    Returns:
+        Dict[str, float]: 统计信息
+    """
+    started = time.perf_counter()
+    pool_size = service.candidate_pool_size(top_n)
+    default_sets = {t: service.chroma_service.get_default_candidates(t, pool_size) for t in types}
+
+    written = 0
+    for i in range(0, len(user_ids), batch_size):
+        batch = user_ids[i:i + batch_size]
+        try:
+            records = precompute_batch(service, batch, types, top_n, default_sets)
+            written += service.db_service.save_precomputed_recommendations(records)
+        except Exception as e:
+            logger.error(f"Error precomputing batch starting at user {batch[0]}: {str(e)}")
+        logger.info(f"Processed {min(i + batch_size, len(user_ids))}/{len(user_ids)} users, {written} lists written")
+
+    return {
+        'users': len(user_ids),
+        'lists': written,
+        'seconds': time.perf_counter() - started
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='离线预计算活跃用户的推荐结果')
+    parser.add_argument('--days', type=int, default=PRECOMPUTE_CONFIG['active_days'], help='活跃用户的统计天数')
+    parser.add_argument('--min-events', type=int, default=PRECOMPUTE_CONFIG['min_events'], help='活跃用户的最少行为数量')
+    parser.add_argument('--types', default=','.join(CONTENT_TYPES), help='逗号分隔的推荐类型')
+    parser.add_argument('--top-n', type=int, default=PRECOMPUTE_CONFIG['top_n'])
+    parser.add_argument('--batch-size', type=int, default=PRECOMPUTE_CONFIG['batch_size'])
+    parser.add_argument('--max-users', type=int, help='最多处理的用户数量（按活跃度降序）')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    types = [t for t in args.types.split(',') if t]
+    invalid = [t for t in types if t not in CONTENT_TYPES]
+    if invalid:
+        logger.error(f"Invalid recommend types: {', '.join(invalid)}")
+        return 2
+
+    db_service = DatabaseService()
+    service = RecommendationService(db_service)
+    try:
+        user_ids = db_service.get_active_users(days=args.days, min_events=args.min_events)[:args.max_users]
+        logger.info(f"Precomputing {len(types)} types for {len(user_ids)} active users")
+        stats = precompute(service, user_ids, types, args.top_n, args.batch_size)
+        logger.info(f"Precomputed {stats['lists']} lists for {stats['users']} users in {stats['seconds']:.1f}s")
+    finally:
+        service.executor.shutdown(wait=False)
+        db_service.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,67 @@
+"""准入控制：并发上限、有界等待队列与请求截止时间"""
+import asyncio
+
+import pytest
+
+from utils.admission import AdmissionController, Overloaded, expired, remaining, reset_deadline, set_deadline
+
+
+@pytest.fixture
+def deadline():
+    tokens = []
+    yield lambda budget: tokens.append(set_deadline(budget))
+    for token in reversed(tokens):
+        reset_deadline(token)
+
+
+def test_remaining_is_capped_by_deadline(deadline):
+    assert remaining() is None and remaining(2.0) == 2.0 and not expired()
+    deadline(0.5)
+    assert 0 < remaining() <= 0.5
+    assert remaining(10.0) <= 0.5 and remaining(0.1) == 0.1
+    deadline(0)
+    assert expired() and remaining(1.0) == 0.0
+
+
+def test_full_queue_is_rejected():
+    controller = AdmissionController('test-queue', max_concurrent=1, max_queue=0)
+    with controller.slot():
+        with pytest.raises(Overloaded, match='queue full'):
+            with controller.slot():
+                pass
+    assert controller.in_flight == 0 and controller.waiting == 0
+
+
+def test_wait_is_bounded():
+    controller = AdmissionController('test-wait', max_concurrent=1, max_queue=1, max_wait=0.05)
+    with controller.slot():
+        with pytest.raises(Overloaded, match='no slot'):
+            with controller.slot():
+                pass
+    # 名额释放后可以再次进入
+    with controller.slot():
+        assert controller.in_flight == 1
+    assert controller.in_flight == 0 and controller.waiting == 0
+
+
+def test_expired_request_is_rejected(deadline):
+    controller = AdmissionController('test-deadline', max_concurrent=1, max_queue=1)
+    deadline(0)
+    with pytest.raises(Overloaded, match='deadline exceeded'):
+        with controller.slot():
+            pass
+
+
+def test_async_slot_is_bounded():
+    controller = AdmissionController('test-async', max_concurrent=1, max_queue=1, max_wait=0.05)
+
+    async def run():
+        async with controller.async_slot():
+            with pytest.raises(Overloaded, match='no slot'):
+                async with controller.async_slot():
+                    pass
+        async with controller.async_slot():
+            assert controller.in_flight == 1
+
+    asyncio.run(run())
+    assert controller.in_flight == 0 and controller.waiting == 0
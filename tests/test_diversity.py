@@ -0,0 +1,27 @@
+"""MMR 多样化：相关度与重复度的权衡"""
+import numpy as np
+
+from utils.diversity import mmr_select
+
+
+def make_candidates():
+    # 0 和 1 几乎重复，2 相关度稍低但方向不同
+    relevance = np.array([0.9, 0.85, 0.6, 0.1])
+    embeddings = np.array([[1, 0, 0], [0.99, 0.05, 0], [0, 1, 0], [0, 0, 1]], dtype=np.float32)
+    return relevance, embeddings
+
+
+def test_lambda_one_keeps_relevance_order():
+    relevance, embeddings = make_candidates()
+    assert mmr_select(relevance, embeddings, 4, lambda_=1.0) == [0, 1, 2, 3]
+
+
+def test_mmr_skips_near_duplicates():
+    relevance, embeddings = make_candidates()
+    assert mmr_select(relevance, embeddings, 2, lambda_=0.5) == [0, 2]
+
+
+def test_k_is_capped_by_candidates():
+    relevance, embeddings = make_candidates()
+    assert sorted(mmr_select(relevance, embeddings, 10)) == [0, 1, 2, 3]
+    assert mmr_select(relevance, embeddings, 0) == []
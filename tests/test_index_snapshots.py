@@ -0,0 +1,55 @@
+import threading
+
+import numpy as np
+
+from utils.index_snapshots import SnapshotManager
+from utils.vector_index import VectorIndex, LayeredIndex
+
+
+def make_index(n: int, dim: int = 8) -> VectorIndex:
+    rng = np.random.default_rng(0)
+    index = VectorIndex(dim=dim, storage='int8')
+    index.build([f'base-{i}' for i in range(n)], rng.normal(size=(n, dim)),
+                [{'type': 'news'} for _ in range(n)], ['{}'] * n)
+    return index
+
+
+def test_append_reuses_existing_delta_and_skips_known_items():
+    swaps = []
+    manager = SnapshotManager(None, on_swap=swaps.append)
+    manager.swap(make_index(20), 'v1')
+    rng = np.random.default_rng(1)
+
+    assert manager.append(['new-0', 'new-1'], rng.normal(size=(2, 8)), [{'type': 'news'}] * 2, ['{}'] * 2) == \
+        ['new-0', 'new-1']
+    first_delta = manager.current.index.delta
+    added = manager.append(['new-1', 'base-3', 'new-2'], rng.normal(size=(3, 8)),
+                           [{'type': 'news'}, {'type': 'news'}, {'type': 'academic'}], ['{}'] * 3)
+
+    index = manager.current.index
+    assert added == ['new-2']
+    assert isinstance(index, LayeredIndex) and len(index) == 23
+    assert len(first_delta) == 2 and np.array_equal(index.delta.codes[:2], first_delta.codes)
+    # 追加增量段不触发版本切换的回调
+    assert len(swaps) == 1
+
+
+def test_pending_items_move_to_new_version():
+    manager = SnapshotManager(None)
+    manager.swap(make_index(10), 'v1')
+    manager.append(['new-0'], np.ones((1, 8)), [{'type': 'news'}], ['{}'])
+
+    manager.swap(make_index(12), 'v2')
+    assert isinstance(manager.current.index, LayeredIndex)
+    assert manager.current.index.get(['new-0'])['ids'] == ['new-0']
+
+
+def test_sync_runs_in_background_thread():
+    synced = threading.Event()
+    manager = SnapshotManager(None, sync=synced.set, sync_interval=0.01)
+    try:
+        with manager.acquire() as index:
+            assert index is None
+        assert synced.wait(2)
+    finally:
+        manager.stop()
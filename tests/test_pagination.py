@@ -0,0 +1,53 @@
+"""分页推荐：排序结果缓存一次，按游标读取后续页"""
+import numpy as np
+import pytest
+
+pytest.importorskip('chromadb')
+
+from app.services.recommendation_service import RecommendationService
+from utils.cache import TTLCache
+
+
+@pytest.fixture
+def service():
+    # 分页只用到排序结果缓存，不需要数据库和向量库
+    service = RecommendationService.__new__(RecommendationService)
+    service.feeds = TTLCache(max_size=8, ttl=60)
+    return service
+
+
+def make_ranked(n: int) -> dict:
+    return {
+        'keys': [f'news:{i}' for i in range(n)],
+        'ids': [str(i) for i in range(n)],
+        'documents': ['{}'] * n,
+        'items': [{'id': i} for i in range(n)],
+        'relevance': np.linspace(1, 0, n, dtype=np.float32),
+        'scores': np.linspace(1, 0, n, dtype=np.float32),
+        'embeddings': np.zeros((n, 4), dtype=np.float32)
+    }
+
+
+def test_pages_cover_ranking_without_overlap(service):
+    page, cursor = service.create_feed(make_ranked(7), 3)
+    seen = list(page['ids'])
+    while cursor is not None:
+        page, cursor = service.next_page(cursor, 3)
+        seen.extend(page['ids'])
+    assert seen == [str(i) for i in range(7)]
+
+
+def test_cursor_is_repeatable(service):
+    _, cursor = service.create_feed(make_ranked(5), 2)
+    first, next_cursor = service.next_page(cursor, 2)
+    again, same_cursor = service.next_page(cursor, 2)
+    assert first['ids'] == again['ids'] == ['2', '3'] and next_cursor == same_cursor
+    last, end = service.next_page(next_cursor, 2)
+    assert last['ids'] == ['4'] and end is None
+
+
+def test_invalid_cursor(service):
+    _, cursor = service.create_feed(make_ranked(5), 2)
+    token = cursor.rpartition('.')[0]
+    for bad in ('', 'missing.2', f'{token}.x', token):
+        assert service.next_page(bad, 2) == (None, None)
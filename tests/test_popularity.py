@@ -0,0 +1,57 @@
+"""热度统计：各类型的条目ID分别编号，计数按 (类型, ID) 区分"""
+import numpy as np
+import pytest
+
+from app.services.database_service import DatabaseService
+from app.services.ranking_service import RankingService
+
+
+@pytest.fixture
+def db_service(tmp_path):
+    service = DatabaseService(f"sqlite:///{tmp_path / 'behavior.db'}")
+    yield service
+    service.close()
+
+
+def make_candidates(ranking_service, items):
+    return ranking_service.merge_candidates([{
+        'source': 'content',
+        'ids': [f"vec-{item['type']}-{item['id']}" for item in items],
+        'documents': [''] * len(items),
+        'items': items,
+        'similarities': np.ones(len(items), dtype=np.float32)
+    }], {})
+
+
+@pytest.mark.parametrize('use_tracker', [True, False])
+def test_counts_are_kept_per_type(db_service, use_tracker):
+    if not use_tracker:
+        db_service.popularity = None
+    ranking_service = RankingService(db_service)
+    for user_id in ('u1', 'u2', 'u3'):
+        db_service.add_user_behavior(user_id, '3', 'like', item_type='news')
+    db_service.add_user_behavior('u4', '7', 'like')
+
+    candidates = make_candidates(ranking_service, [
+        {'id': 3, 'type': 'news'}, {'id': 3, 'type': 'academic'}, {'id': 7, 'type': 'news'}
+    ])
+    counts = ranking_service.popularity_counts(candidates)
+    assert counts[0] > 0 and counts[1] == 0
+    # 未记录类型的行为只能按ID计数
+    assert counts[2] > 0
+
+
+def test_trending_maps_typed_keys_to_vector_ids(db_service):
+    ranking_service = RankingService(db_service)
+    db_service.add_user_behavior('u1', '3', 'like', item_type='news')
+    db_service.add_user_behavior('u2', '3', 'view', item_type='academic')
+    db_service.add_user_behavior('u3', '9', 'view')
+    ranking_service.popularity_counts(make_candidates(ranking_service, [
+        {'id': 3, 'type': 'news'}, {'id': 3, 'type': 'academic'}
+    ]))
+
+    tracker = db_service.popularity
+    assert [key for key, _ in tracker.trending('news', 10)] == ['news:3']
+    assert [key for key, _ in tracker.trending('academic', 10)] == ['academic:3']
+    assert tracker.vector_id('news:3') == 'vec-news-3'
+    assert tracker.vector_id('academic:3') == 'vec-academic-3'
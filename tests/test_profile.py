@@ -0,0 +1,55 @@
+"""用户画像：行为记录中的内容ID 按类型解析为向量库ID"""
+import time
+
+import numpy as np
+
+from utils.profile import ProfileBuilder
+from utils.vector_index import VectorIndex
+
+
+def make_index() -> VectorIndex:
+    # 两种类型中编号相同的条目，以及没有 id 字段的条目
+    index = VectorIndex(dim=2, storage='float32')
+    index.build(['md5-news-3', 'md5-academic-3', 'md5-no-id'], np.array([[1, 0], [0, 1], [1, 1]]),
+                [{'type': 'news', 'item_id': '3'}, {'type': 'academic', 'item_id': '3'}, {'type': 'news'}],
+                ['{}'] * 3)
+    return index
+
+
+def make_builder(index: VectorIndex, **kwargs) -> ProfileBuilder:
+    def resolve_vector_ids(keys):
+        resolved = {}
+        for item_type in {item_type for _, item_type in keys}:
+            item_ids = [item_id for item_id, key_type in keys if key_type == item_type]
+            found = index.find({'$and': [{'type': item_type}, {'item_id': {'$in': item_ids}}]})
+            resolved.update({(m['item_id'], item_type): vector_id for vector_id, m in zip(found['ids'], found['metadatas'])})
+        return resolved
+
+    def fetch_item_vectors(ids):
+        found = index.get(ids, include=['embeddings'])
+        return dict(zip(found['ids'], found['embeddings']))
+
+    return ProfileBuilder(embed_texts=lambda texts: [np.array([-1, 0], dtype=np.float32) for _ in texts],
+                          fetch_item_vectors=fetch_item_vectors, resolve_vector_ids=resolve_vector_ids, **kwargs)
+
+
+def test_profile_resolves_vector_ids_by_type():
+    builder = make_builder(make_index())
+    profile, = builder.build([{'item_id': '3', 'item_type': 'academic', 'action': 'view'}])
+    assert np.allclose(profile, [0, 1])
+    profile, = builder.build([{'item_id': '3', 'item_type': 'news', 'action': 'view'}])
+    assert np.allclose(profile, [1, 0])
+
+
+def test_unresolved_items_are_retried_after_miss_ttl():
+    index = make_index()
+    builder = make_builder(index, miss_ttl=0.05)
+    event = {'item_id': '7', 'item_type': 'news', 'action': 'view', 'description': '新条目'}
+    profile, = builder.build([event])
+    # 还没有导入的条目使用描述文本的编码
+    assert np.allclose(profile, [-1, 0])
+
+    index.add(['md5-news-7'], np.array([[0.6, 0.8]]), [{'type': 'news', 'item_id': '7'}], ['{}'])
+    time.sleep(0.1)
+    profile, = builder.build([event])
+    assert np.allclose(profile, [0.6, 0.8])
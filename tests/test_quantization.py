@@ -0,0 +1,55 @@
+"""向量压缩编码：编解码误差与检索结果和 float32 的一致性"""
+import numpy as np
+import pytest
+
+from utils.quantization import create_codec
+from utils.vector_index import VectorIndex, normalize
+
+
+def make_vectors(n: int = 1000, dim: int = 64, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    # 低秩结构加噪声，相似度分布接近文本向量
+    return normalize(rng.normal(size=(n, 16)) @ rng.normal(size=(16, dim)) + 0.3 * rng.normal(size=(n, dim)))
+
+
+@pytest.mark.parametrize('storage, params, max_error', [
+    ('float16', {}, 1e-3),
+    ('int8', {}, 5e-3),
+    ('pq', {'n_subspaces': 16}, 0.3),
+])
+def test_codec_round_trip(storage, params, max_error):
+    vectors = make_vectors()
+    codec = create_codec(storage, **params).fit(vectors)
+    codes = codec.encode(vectors)
+    decoded = codec.decode(codes)
+    assert decoded.shape == vectors.shape
+    assert codes.nbytes == len(vectors) * codec.bytes_per_vector(vectors.shape[1])
+    assert np.abs(decoded - vectors).max() < max_error
+    # 查表计算的近似内积与解码后的内积一致
+    query = vectors[0]
+    assert np.allclose(codec.scores(codes, query), decoded @ query, atol=1e-4)
+
+
+@pytest.mark.parametrize('storage, rerank, min_overlap', [
+    ('float16', False, 0.99),
+    ('int8', False, 0.95),
+    ('pq', False, 0.5),
+    ('pq', True, 0.95),
+])
+def test_top_k_matches_float32(storage, rerank, min_overlap, tmp_path):
+    vectors = make_vectors()
+    ids = [str(i) for i in range(len(vectors))]
+    queries = make_vectors(n=20, seed=1)
+
+    exact = VectorIndex(dim=vectors.shape[1], storage='float32')
+    exact.build(ids, vectors, [{}] * len(ids), ['{}'] * len(ids))
+    index = VectorIndex(dim=vectors.shape[1], storage=storage, rerank=rerank,
+                        codec_params={'n_subspaces': 16} if storage == 'pq' else None)
+    index.build(ids, vectors, [{}] * len(ids), ['{}'] * len(ids))
+    index.save(tmp_path)
+
+    truth = exact.query(queries, n_results=10, include=[])['ids']
+    for candidate in (index, VectorIndex.load(tmp_path)):
+        found = candidate.query(queries, n_results=10, include=[])['ids']
+        overlap = np.mean([len(set(t) & set(f)) / 10 for t, f in zip(truth, found)])
+        assert overlap >= min_overlap
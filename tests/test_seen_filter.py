@@ -0,0 +1,65 @@
+"""已看过滤：各类型的条目ID分别从 1 编号，看过一种类型的条目不能过滤掉其他类型中ID相同的条目"""
+import numpy as np
+import pytest
+
+from app.services.database_service import DatabaseService
+from app.services.ranking_service import RankingService
+
+
+@pytest.fixture
+def db_service(tmp_path):
+    service = DatabaseService(f"sqlite:///{tmp_path / 'behavior.db'}")
+    yield service
+    service.close()
+
+
+def make_candidates(ranking_service, items):
+    return ranking_service.merge_candidates([{
+        'source': 'content',
+        'ids': [f"vec-{item['type']}-{item['id']}" for item in items],
+        'documents': [''] * len(items),
+        'items': items,
+        'similarities': np.ones(len(items), dtype=np.float32)
+    }], {})
+
+
+def test_same_id_in_two_types_is_not_merged(db_service):
+    ranking_service = RankingService(db_service)
+    candidates = make_candidates(ranking_service, [{'id': 3, 'type': 'news'}, {'id': 3, 'type': 'academic'}])
+    assert candidates['keys'] == ['news:3', 'academic:3']
+
+
+def test_seen_item_only_filters_its_own_type(db_service):
+    ranking_service = RankingService(db_service)
+    db_service.add_user_behavior('u1', '3', 'view', item_type='news')
+
+    for seen in (db_service.get_seen_filter('u1'), db_service._rebuild_seen_filter('u1')):
+        candidates = make_candidates(ranking_service, [{'id': 3, 'type': 'news'}, {'id': 3, 'type': 'academic'}])
+        ranked = ranking_service.rank(candidates, 10, seen)
+        assert [item['type'] for item in ranked['items']] == ['academic']
+
+
+def test_untyped_behavior_filters_by_id(db_service):
+    ranking_service = RankingService(db_service)
+    db_service.add_user_behavior('u2', '5', 'view')
+
+    candidates = make_candidates(ranking_service, [{'id': 5, 'type': 'news'}, {'id': 6, 'type': 'news'}])
+    ranked = ranking_service.rank(candidates, 10, db_service.get_seen_filter('u2'))
+    assert [item['id'] for item in ranked['items']] == [6]
+
+
+def test_workers_do_not_overwrite_each_others_additions(tmp_path):
+    url = f"sqlite:///{tmp_path / 'shared.db'}"
+    worker_a, worker_b = DatabaseService(url), DatabaseService(url)
+    try:
+        worker_a.add_user_behavior('u3', '1', 'view', item_type='news')
+        worker_b.get_seen_filter('u3')
+        worker_b.add_user_behavior('u3', '2', 'view', item_type='news')
+        worker_a.add_user_behavior('u3', '3', 'view', item_type='news')
+
+        worker_b.seen_filters.clear()
+        seen = worker_b.get_seen_filter('u3')
+        assert all(f'news:{item_id}' in seen for item_id in (1, 2, 3))
+    finally:
+        worker_a.close()
+        worker_b.close()
@@ -0,0 +1,24 @@
+import math
+
+import pytest
+
+from utils.serialization import loads, iter_json_array
+
+
+def test_loads_accepts_nan_and_infinity():
+    data = loads(b'{"score": NaN, "max": Infinity, "min": -Infinity}')
+    assert math.isnan(data['score'])
+    assert data['max'] == math.inf and data['min'] == -math.inf
+
+
+def test_loads_rejects_invalid_json():
+    with pytest.raises(ValueError):
+        loads('{"score": }')
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 7])
+def test_iter_json_array_keeps_numbers_split_across_chunks(tmp_path, chunk_size):
+    values = [12.5, 1e5, -3.25e-2, 7, True, None, {'id': 1, 'score': 0.75}, 'a,b']
+    path = tmp_path / 'items.json'
+    path.write_text('[12.5, 1e5,-3.25e-2 ,7,true,null,{"id": 1, "score": 0.75},"a,b"]', encoding='utf-8')
+    assert list(iter_json_array(str(path), chunk_size=chunk_size)) == values
@@ -0,0 +1,58 @@
+"""本地向量索引：降维投影与压缩编码组合"""
+import numpy as np
+import pytest
+
+from utils.projection import EmbeddingProjector, recall_at_k
+from utils.vector_index import VectorIndex, normalize
+
+
+def make_corpus(n: int = 400, dim: int = 768, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    # 低秩结构加噪声，接近文本向量的分布
+    return (rng.normal(size=(n, 32)) @ rng.normal(size=(32, dim)) + 0.1 * rng.normal(size=(n, dim))).astype(np.float32)
+
+
+@pytest.mark.parametrize('n_components', [128, 192, 256])
+def test_pq_index_builds_on_projected_dimensions(n_components):
+    vectors = make_corpus()
+    projector = EmbeddingProjector(n_components=n_components).fit(vectors)
+    index = VectorIndex(dim=vectors.shape[1], storage='pq', rerank=True, codec_params={'n_subspaces': 96})
+    index.build([str(i) for i in range(len(vectors))], vectors, [{'type': 'news'}] * len(vectors), ['{}'] * len(vectors),
+                projector=projector)
+    assert index.dim == n_components and n_components % index.codec.n_subspaces == 0
+    assert index.codec.n_subspaces <= 96
+
+    results = index.query(vectors[:5], n_results=1, include=[])
+    assert [ids[0] for ids in results['ids']] == ['0', '1', '2', '3', '4']
+
+
+def projected_recall(vectors: np.ndarray, projector: EmbeddingProjector = None, k: int = 10) -> float:
+    ids = [str(i) for i in range(len(vectors))]
+    index = VectorIndex(dim=vectors.shape[1], storage='float32')
+    index.build(ids, vectors, [{}] * len(ids), ['{}'] * len(ids), projector=projector)
+    positions = np.arange(0, len(vectors), 10)
+    results = index.query(vectors[positions], n_results=k, include=[])
+    return recall_at_k(normalize(vectors), [[int(i) for i in row] for row in results['ids']], positions, k)
+
+
+def test_projection_recall_report(tmp_path):
+    vectors = make_corpus()
+    assert projected_recall(vectors) == 1.0
+
+    projector = EmbeddingProjector(n_components=64).fit(vectors)
+    projector.save(tmp_path / 'projection.npz')
+    loaded = EmbeddingProjector.load(tmp_path / 'projection.npz')
+    assert np.allclose(loaded.transform(vectors[:5]), projector.transform(vectors[:5]))
+
+    # 保留主要方差的投影几乎不损失召回，过度降维时召回率明显下降
+    recall = projected_recall(vectors, loaded)
+    assert recall >= 0.9
+    assert projected_recall(vectors, EmbeddingProjector(n_components=8).fit(vectors)) < recall
+
+
+def test_memory_usage_counts_document_bytes():
+    index = VectorIndex(dim=4, storage='float16')
+    documents = ['{"title": "方言与语音"}', '{"title": "abc"}']
+    index.build(['0', '1'], np.eye(2, 4), [{}, {}], documents)
+    assert index.memory_usage()['documents'] == sum(len(d.encode('utf-8')) for d in documents)
+    assert index.memory_usage()['codes'] == 2 * 4 * 2
@@ -0,0 +1,159 @@
+import asyncio
+import contextvars
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Optional
+
+from utils.metrics import registry
+
+ADMISSION_REQUESTS = registry.counter(
+    'recommend_admission_total', 'Admission decisions for limited stages', ('limiter', 'outcome'))
+ADMISSION_IN_FLIGHT = registry.gauge(
+    'recommend_admission_in_flight', 'Requests currently holding an admission slot', ('limiter',))
+ADMISSION_WAITING = registry.gauge(
+    'recommend_admission_waiting', 'Requests waiting for an admission slot', ('limiter',))
+
+# 当前请求的截止时间（time.monotonic()），由接口层根据请求头或默认预算设置
+_deadline: contextvars.ContextVar = contextvars.ContextVar('request_deadline', default=None)
+
+
+class Overloaded(Exception):
+    """等待队列已满，或在截止时间前没有获得执行名额"""
+
+
+def set_deadline(budget: Optional[float]):
+    """设置当前请求的剩余时间预算（秒），返回用于恢复的 token，budget 为 None 时不设截止时间"""
+    return _deadline.set(None if budget is None else time.monotonic() + budget)
+
+
+def reset_deadline(token):
+    _deadline.reset(token)
+
+
+def remaining(default: Optional[float] = None) -> Optional[float]:
+    """当前请求剩余的时间（秒），未设置截止时间时返回 default
+
+    设置了 default 时返回两者中较小的值，便于直接作为各阶段的超时时间。
+    """
+    deadline = _deadline.get()
+    if deadline is None:
+        return default
+    left = max(deadline - time.monotonic(), 0.0)
+    return left if default is None else min(left, default)
+
+
+def expired() -> bool:
+    """当前请求是否已超过截止时间"""
+    deadline = _deadline.get()
+    return deadline is not None and time.monotonic() >= deadline
+
+
+class AdmissionController:
+    """并发上限加有界等待队列
+
+    同时执行的请求数不超过 max_concurrent，超出的请求最多 max_queue 个排队等待（为 0 时不排队），
+    队列已满或等待超过 max_wait / 请求截止时间时抛出 Overloaded，由调用方降级处理，
+    过载时排队时间有上限，尾延迟不会随并发数无限增长。
+
+    线程（Flask）与事件循环（Quart）两种用法共享同一组计数，一个进程内通常只会用到其中一种。
+    """
+
+    def __init__(self, name: str, max_concurrent: int, max_queue: int, max_wait: float = None):
+        """
+        Args:
+            name (str): 名称，用于监控指标
+            max_concurrent (int): 同时执行的请求数上限
+            max_queue (int): 等待队列长度上限
+            max_wait (float, optional): 最长等待时间（秒），与请求截止时间取较小值
+        """
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.in_flight = 0
+        self.waiting = 0
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._async_slots = None
+        ADMISSION_IN_FLIGHT.set_function(lambda: self.in_flight, limiter=name)
+        ADMISSION_WAITING.set_function(lambda: self.waiting, limiter=name)
+
+    def _enqueue(self) -> bool:
+        """占用一个排队位置，队列已满时返回 False"""
+        with self._lock:
+            if self.waiting >= self.max_queue:
+                return False
+            self.waiting += 1
+            return True
+
+    def _admitted(self, acquired: bool, queued: bool = True):
+        with self._lock:
+            if queued:
+                self.waiting -= 1
+            if acquired:
+                self.in_flight += 1
+        ADMISSION_REQUESTS.inc(limiter=self.name, outcome='admitted' if acquired else 'timeout')
+
+    def _release(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def _reject(self, reason: str):
+        ADMISSION_REQUESTS.inc(limiter=self.name, outcome='rejected')
+        raise Overloaded(f"{self.name}: {reason}")
+
+    @contextmanager
+    def slot(self):
+        """在当前线程中获取执行名额（阻塞等待）
+
+        Raises:
+            Overloaded: 队列已满、请求已超时或等待超时
+        """
+        if expired():
+            self._reject('deadline exceeded')
+        # 有空闲名额时直接执行，只有需要等待的请求占用排队位置
+        if self._slots.acquire(blocking=False):
+            self._admitted(True, queued=False)
+        else:
+            if not self._enqueue():
+                self._reject('queue full')
+            timeout = remaining(self.max_wait)
+            acquired = self._slots.acquire(timeout=timeout) if timeout is not None else self._slots.acquire()
+            self._admitted(acquired)
+            if not acquired:
+                raise Overloaded(f"{self.name}: no slot within {timeout:.3f}s")
+        try:
+            yield
+        finally:
+            self._release()
+            self._slots.release()
+
+    @asynccontextmanager
+    async def async_slot(self):
+        """在事件循环中获取执行名额，语义同 slot"""
+        if self._async_slots is None:
+            self._async_slots = asyncio.Semaphore(self.max_concurrent)
+        if expired():
+            self._reject('deadline exceeded')
+        if not self._async_slots.locked():
+            # 有空闲名额时 acquire 不会挂起
+            await self._async_slots.acquire()
+            self._admitted(True, queued=False)
+        else:
+            if not self._enqueue():
+                self._reject('queue full')
+            timeout = remaining(self.max_wait)
+            try:
+                await asyncio.wait_for(self._async_slots.acquire(), timeout)
+                acquired = True
+            except asyncio.TimeoutError:
+                acquired = False
+            self._admitted(acquired)
+            if not acquired:
+                raise Overloaded(f"{self.name}: no slot within {timeout:.3f}s")
+        try:
+            yield
+        finally:
+            self._release()
+            self._async_slots.release()
@@ -0,0 +1,62 @@
+import hashlib
+import math
+import struct
+
+# 序列化头部：位数组长度、哈希函数个数、设计容量、已插入数量
+_HEADER = struct.Struct('<IIII')
+
+
+class BloomFilter:
+    """布隆过滤器
+
+    用于记录用户已看过的条目，判断是否存在为 O(k)，不会漏判，误判率由 error_rate 控制。
+    """
+
+    def __init__(self, capacity: int = 5000, error_rate: float = 0.01):
+        self.capacity = max(int(capacity), 1)
+        self.error_rate = error_rate
+        self.num_bits = max(int(-self.capacity * math.log(error_rate) / (math.log(2) ** 2)), 8)
+        self.num_hashes = max(int(round(self.num_bits / self.capacity * math.log(2))), 1)
+        self.count = 0
+        self.bits = bytearray((self.num_bits + 7) // 8)
+
+    def _positions(self, key: str):
+        # 双重哈希：h1 + i * h2
+        digest = hashlib.blake2b(str(key).encode('utf-8'), digest_size=16).digest()
+        h1, h2 = struct.unpack('<QQ', digest)
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, key: str):
+        """添加元素"""
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def is_full(self) -> bool:
+        """插入数量超过设计容量后误判率会升高"""
+        return self.count >= self.capacity
+
+    def to_bytes(self) -> bytes:
+        """序列化为紧凑的字节串"""
+        return _HEADER.pack(self.num_bits, self.num_hashes, self.capacity, self.count) + bytes(self.bits)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'BloomFilter':
+        """从字节串恢复"""
+        num_bits, num_hashes, capacity, count = _HEADER.unpack_from(data)
+        bloom = cls.__new__(cls)
+        bloom.capacity = capacity
+        bloom.error_rate = None
+        bloom.num_bits = num_bits
+        bloom.num_hashes = num_hashes
+        bloom.count = count
+        bloom.bits = bytearray(data[_HEADER.size:])
+        return bloom
@@ -0,0 +1,42 @@
+import numpy as np
+from typing import List
+
+
+def mmr_select(relevance: np.ndarray, embeddings: np.ndarray, k: int, lambda_: float = 0.7) -> List[int]:
+    """最大边际相关（MMR）多样化选择
+
+    每一步选择 `lambda_ * 相关度 - (1 - lambda_) * 与已选条目的最大相似度` 最高的候选。
+    相似度矩阵按行增量计算，全部在 NumPy 中完成，不需要额外的模型或向量库调用。
+
+    Args:
+        relevance (np.ndarray): 候选的相关度得分
+        embeddings (np.ndarray): 候选向量矩阵，与 relevance 行对齐
+        k (int): 选择数量
+        lambda_ (float): 相关度与多样性的权衡，1 表示不做多样化
+
+    Returns:
+        List[int]: 选中候选的位置，按选择顺序排列
+    """
+    n = len(relevance)
+    k = min(k, n)
+    if k <= 0:
+        return []
+
+    relevance = np.asarray(relevance, dtype=np.float32)
+    span = relevance.max() - relevance.min()
+    relevance = (relevance - relevance.min()) / span if span > 0 else np.ones_like(relevance)
+
+    vectors = np.asarray(embeddings, dtype=np.float32)
+    vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+    max_similarity = np.zeros(n, dtype=np.float32)
+    available = np.ones(n, dtype=bool)
+    selected = []
+    for _ in range(k):
+        mmr = lambda_ * relevance - (1 - lambda_) * max_similarity
+        mmr[~available] = -np.inf
+        best = int(np.argmax(mmr))
+        selected.append(best)
+        available[best] = False
+        np.maximum(max_similarity, vectors @ vectors[best], out=max_similarity)
+    return selected
@@ -1,18 +1,41 @@
 import torch
 from transformers import AutoTokenizer, AutoModel
-from config.settings import MODEL_CONFIG
+from config.settings import MODEL_CONFIG, MEMORY_CONFIG
+from utils.metrics import timed, observe_batch
+from utils.memory import rss_bytes
 import logging
 import numpy as np
 from pathlib import Path
 import os
 import shutil
-from typing import List
+import threading
+from typing import Dict, List
 
 logger = logging.getLogger(__name__)
 
+# 进程内共享的嵌入服务，见 get_embedding_service
+_shared_service = None
+_shared_lock = threading.Lock()
+
+def get_embedding_service() -> 'EmbeddingService':
+    """返回进程内共享的嵌入服务，首次调用时加载模型
+    
+    导入数据和处理请求的各个服务共用同一份模型权重，一个进程只加载一次模型。
+    """
+    global _shared_service
+    if _shared_service is None:
+        with _shared_lock:
+            if _shared_service is None:
+                _shared_service = EmbeddingService(quantize=MEMORY_CONFIG['quantize_model'])
+    return _shared_service
+
 class EmbeddingService:
-    def __init__(self):
-        """初始化嵌入服务"""
+    def __init__(self, quantize: bool = False):
+        """初始化嵌入服务
+        
+        Args:
+            quantize (bool): 是否把模型的线性层动态量化为 int8（仅 CPU），权重内存约为 float32 的四分之一
+        """
         self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
         logger.info(f"Using device: {self.device}")
         
@@ -20,6 +43,9 @@ class EmbeddingService:
         self.cache_dir = Path("models_cache")
         self.model_name = MODEL_CONFIG['name']
         self.model_cache_dir = self.cache_dir / self.model_name.replace('/', '_')
+        self.quantize = quantize and self.device.type == 'cpu'
+        # 加载各部分时常驻内存的增量（字节），用于内存分析
+        self.load_rss: Dict[str, int] = {}
         
         # 加载模型和分词器
         self._load_model()
@@ -33,8 +59,7 @@ class EmbeddingService:
             if self.model_cache_dir.exists():
                 logger.info("Loading model from local cache...")
                 try:
-                    self.tokenizer = AutoTokenizer.from_pretrained(str(self.model_cache_dir))
-                    self.model = AutoModel.from_pretrained(str(self.model_cache_dir))
+                    self._load_components(str(self.model_cache_dir))
                     logger.info("Successfully loaded model from cache")
                 except Exception as e:
                     logger.error(f"Error loading from cache: {str(e)}")
@@ -49,6 +74,13 @@ class EmbeddingService:
             self.model.to(self.device)
             self.model.eval()
             
+            if self.quantize:
+                # 动态量化：线性层权重以 int8 保存，激活值在推理时按批量化
+                started = rss_bytes()
+                self.model = torch.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8)
+                self.load_rss['quantization'] = rss_bytes() - started
+                logger.info("Quantized model linear layers to int8")
+            
         except Exception as e:
             logger.error(f"Error in model loading: {str(e)}")
             raise
@@ -57,8 +89,7 @@ class EmbeddingService:
         """下载并缓存模型"""
         try:
             logger.info("Downloading model from Hugging Face...")
-            self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
-            self.model = AutoModel.from_pretrained(self.model_name)
+            self._load_components(self.model_name)
             
             # 保存到本地缓存
             logger.info("Saving model to local cache...")
@@ -70,6 +101,31 @@ class EmbeddingService:
             logger.error(f"Error downloading model: {str(e)}")
             raise
             
+    def _load_components(self, source: str):
+        """加载分词器和模型，并记录各自增加的常驻内存"""
+        started = rss_bytes()
+        self.tokenizer = AutoTokenizer.from_pretrained(source)
+        loaded = rss_bytes()
+        self.model = AutoModel.from_pretrained(source)
+        self.load_rss['tokenizer'] = loaded - started
+        self.load_rss['model'] = rss_bytes() - loaded
+        
+    def memory_usage(self) -> Dict[str, int]:
+        """模型权重与缓冲区占用的字节数（量化后的线性层按打包后的 int8 权重计算）"""
+        usage = {'parameters': 0, 'buffers': 0, 'quantized': 0}
+        for tensor in self.model.parameters():
+            usage['parameters'] += tensor.nelement() * tensor.element_size()
+        for tensor in self.model.buffers():
+            usage['buffers'] += tensor.nelement() * tensor.element_size()
+        for module in self.model.modules():
+            packed = getattr(module, '_packed_params', None)
+            if packed is not None and hasattr(packed, '_weight_bias'):
+                weight, bias = packed._weight_bias()
+                usage['quantized'] += weight.nelement() * weight.element_size()
+                if bias is not None:
+                    usage['quantized'] += bias.nelement() * bias.element_size()
+        return usage
+        
     def get_embedding(self, text: str) -> np.ndarray:
         """生成文本嵌入向量
         
@@ -77,23 +133,25 @@ class EmbeddingService:
             text (str): 输入文本
             
         Returns:
-            np.ndarray: 768维的嵌入向量
+            np.ndarray: 768维的 float32 嵌入向量
         """
         try:
             # 文本预处理
-            inputs = self.tokenizer(
-                text,
-                return_tensors="pt",
-                truncation=True,
-                max_length=MODEL_CONFIG['max_length'],
-                padding=True
-            )
+            with timed('embedding.tokenize'):
+                inputs = self.tokenizer(
+                    text,
+                    return_tensors="pt",
+                    truncation=True,
+                    max_length=MODEL_CONFIG['max_length'],
+                    padding=True
+                )
             
             # 移动到正确的设备
             inputs = {k: v.to(self.device) for k, v in inputs.items()}
             
             # 生成嵌入向量
-            with torch.no_grad():
+            observe_batch('embedding', 1)
+            with timed('embedding.forward'), torch.no_grad():
                 outputs = self.model(**inputs)
             
             # 获取最后一层的平均池化结果
@@ -105,7 +163,7 @@ class EmbeddingService:
         except Exception as e:
             logger.error(f"Error generating embedding: {str(e)}")
             # 返回零向量作为后备
-            return np.zeros(768)
+            return np.zeros(768, dtype=np.float32)
             
     def get_batch_embeddings(self, texts: List[str]) -> List[np.ndarray]:
         """批量生成文本嵌入向量
@@ -123,24 +181,28 @@ class EmbeddingService:
             # 批量处理
             for i in range(0, len(texts), batch_size):
                 batch_texts = texts[i:i + batch_size]
-                inputs = self.tokenizer(
-                    batch_texts,
-                    return_tensors="pt",
-                    truncation=True,
-                    max_length=MODEL_CONFIG['max_length'],
-                    padding=True
-                )
+                with timed('embedding.tokenize'):
+                    inputs = self.tokenizer(
+                        batch_texts,
+                        return_tensors="pt",
+                        truncation=True,
+                        max_length=MODEL_CONFIG['max_length'],
+                        padding=True
+                    )
                 
                 inputs = {k: v.to(self.device) for k, v in inputs.items()}
                 
-                with torch.no_grad():
+                observe_batch('embedding', len(batch_texts))
+                with timed('embedding.forward'), torch.no_grad():
                     outputs = self.model(**inputs)
                     
-                batch_embeddings = outputs.last_hidden_state.mean(dim=1)
+                # 按 attention mask 做平均池化，避免填充位置稀释较短文本的向量
+                mask = inputs['attention_mask'].unsqueeze(-1).to(outputs.last_hidden_state.dtype)
+                batch_embeddings = (outputs.last_hidden_state * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1)
                 embeddings.extend(batch_embeddings.cpu().numpy())
                 
             return embeddings
             
         except Exception as e:
             logger.error(f"Error generating batch embeddings: {str(e)}")
-            return [np.zeros(768) for _ in texts] 
\ No newline at end of file
+            return [np.zeros(768, dtype=np.float32) for _ in texts] 
\ No newline at end of file
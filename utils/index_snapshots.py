@@ -0,0 +1,338 @@
+import logging
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from utils.vector_index import VectorIndex, LayeredIndex
+
+logger = logging.getLogger(__name__)
+
+CURRENT_FILE = 'CURRENT'
+VERSIONS_DIR = 'versions'
+
+
+class IndexStore:
+    """按版本保存的本地索引目录
+
+    目录结构::
+
+        <root>/versions/<version>/   每个版本一个完整的 VectorIndex 目录，写入后不再修改
+        <root>/CURRENT               当前版本号，发布新版本时原子替换
+
+    旧版本的索引直接保存在 <root> 下（没有 CURRENT 文件），仍然可以作为 'legacy' 版本读取。
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self.versions_dir = os.path.join(root, VERSIONS_DIR)
+
+    def current_version(self) -> Optional[str]:
+        """当前版本号，没有发布过版本时返回 None"""
+        try:
+            with open(os.path.join(self.root, CURRENT_FILE), 'r', encoding='utf-8') as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            if os.path.exists(os.path.join(self.root, 'meta.json')):
+                return 'legacy'
+            return None
+
+    def version_path(self, version: str) -> str:
+        if version == 'legacy':
+            return self.root
+        return os.path.join(self.versions_dir, version)
+
+    def versions(self) -> List[str]:
+        """已发布的版本，按发布时间升序"""
+        if not os.path.isdir(self.versions_dir):
+            return []
+        return sorted(
+            name for name in os.listdir(self.versions_dir)
+            if not name.endswith('.tmp') and os.path.exists(os.path.join(self.versions_dir, name, 'meta.json'))
+        )
+
+    def load(self, version: str, mmap_rerank: bool = True, mmap_documents: bool = False) -> VectorIndex:
+        return VectorIndex.load(self.version_path(version), mmap_rerank=mmap_rerank, mmap_documents=mmap_documents)
+
+    def publish(self, index: VectorIndex, version: str = None) -> str:
+        """保存为新版本并切换 CURRENT
+
+        先写入临时目录再重命名，CURRENT 通过 os.replace 原子替换，
+        读取方在任何时刻看到的都是完整的某个版本。
+
+        Returns:
+            str: 新版本号
+        """
+        if version is None:
+            version = datetime.now().strftime('%Y%m%d-%H%M%S')
+            suffix = 1
+            while os.path.exists(self.version_path(version)):
+                suffix += 1
+                version = f"{datetime.now():%Y%m%d-%H%M%S}-{suffix}"
+        staging = self.version_path(version) + '.tmp'
+        shutil.rmtree(staging, ignore_errors=True)
+        index.save(staging)
+        os.replace(staging, self.version_path(version))
+        self.activate(version)
+        logger.info(f"Published vector index version {version} ({len(index)} items)")
+        return version
+
+    def activate(self, version: str):
+        """把 CURRENT 指向已发布的版本（也用于回滚）"""
+        if version not in self.versions():
+            raise ValueError(f"Unknown vector index version: {version}")
+        pointer = os.path.join(self.root, CURRENT_FILE + '.tmp')
+        with open(pointer, 'w', encoding='utf-8') as f:
+            f.write(version)
+        os.replace(pointer, os.path.join(self.root, CURRENT_FILE))
+
+    def prune(self, keep: int) -> List[str]:
+        """删除较早的版本，保留最新的 keep 个以及当前版本
+
+        已加载旧版本的进程不受影响（mmap 的文件在删除后仍然可以读取），下次刷新时切换到当前版本。
+
+        Returns:
+            List[str]: 删除的版本
+        """
+        current = self.current_version()
+        versions = self.versions()
+        removed = [v for v in versions[:max(len(versions) - keep, 0)] if v != current]
+        for version in removed:
+            shutil.rmtree(self.version_path(version), ignore_errors=True)
+        if removed:
+            logger.info(f"Removed old vector index versions: {', '.join(removed)}")
+        return removed
+
+
+class IndexSnapshot:
+    """不可变的索引快照，带引用计数
+
+    查询期间持有引用；被新版本替换后标记为退役，最后一个查询释放引用时才真正释放。
+    """
+
+    def __init__(self, index: VectorIndex, version: str):
+        self.index = index
+        self.version = version
+        self.refcount = 0
+        self.retired = False
+
+    def release_resources(self):
+        """释放快照持有的索引（引用计数归零且已退役时调用）"""
+        logger.info(f"Released vector index version {self.version}")
+        self.index = None
+
+
+class SnapshotManager:
+    """管理当前使用的索引快照，支持后台加载新版本并无停顿切换
+
+    新版本在后台线程中完整加载后才替换当前快照，替换只是一次指针赋值，
+    正在进行的查询继续使用旧快照直到结束。
+
+    通过 append 新增的条目写入增量段（以新快照的形式替换，只对新条目编码），原始向量暂存在内存中，
+    切换到新版本时还不在新版本里的条目会重新加入增量段，直到某个发布的版本包含它们。
+
+    后台线程还可以定期执行一个同步任务（如同步其他进程导入的条目），使其不占用查询请求的时间。
+    """
+
+    def __init__(self, store: Optional[IndexStore], mmap_rerank: bool = True, reload_interval: float = 0,
+                 on_swap: Callable[[Optional[IndexSnapshot]], None] = None, mmap_documents: bool = False,
+                 sync: Callable[[], None] = None, sync_interval: float = 0):
+        """
+        Args:
+            store (IndexStore, optional): 索引目录，None 表示只使用手动设置的索引
+            mmap_rerank (bool): 重排向量是否以 mmap 方式加载
+            reload_interval (float): 后台检查新版本的间隔（秒），0 表示不检查
+            on_swap (Callable, optional): 切换索引版本后的回调，参数为新快照（append 不触发）
+            mmap_documents (bool): 文档是否以 mmap 方式加载
+            sync (Callable, optional): 后台线程定期执行的同步任务
+            sync_interval (float): 执行同步任务的间隔（秒），0 表示不执行
+        """
+        self.store = store
+        self.mmap_rerank = mmap_rerank
+        self.mmap_documents = mmap_documents
+        self.reload_interval = reload_interval
+        self.on_swap = on_swap
+        self.sync = sync
+        self.sync_interval = sync_interval if sync is not None else 0
+        self.current: Optional[IndexSnapshot] = None
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._thread_lock = threading.Lock()
+        self._install_lock = threading.Lock()
+        self._pending: Dict[str, list] = {'ids': [], 'embeddings': [], 'metadatas': [], 'documents': []}
+        self._stop = threading.Event()
+        self._thread = None
+        self._thread_pid = None
+
+    @property
+    def version(self) -> Optional[str]:
+        snapshot = self.current
+        return snapshot.version if snapshot is not None else None
+
+    @contextmanager
+    def acquire(self):
+        """获取当前快照的索引，退出时释放引用；没有可用索引时得到 None"""
+        self._ensure_reloader()
+        with self._lock:
+            snapshot = self.current
+            if snapshot is not None:
+                snapshot.refcount += 1
+        try:
+            yield snapshot.index if snapshot is not None else None
+        finally:
+            if snapshot is not None:
+                self._release(snapshot)
+
+    def _release(self, snapshot: IndexSnapshot):
+        with self._lock:
+            snapshot.refcount -= 1
+            drained = snapshot.retired and snapshot.refcount == 0
+        if drained:
+            snapshot.release_resources()
+
+    def swap(self, index: Optional[VectorIndex], version: str = None):
+        """替换当前快照，旧快照在没有查询使用后释放"""
+        with self._install_lock:
+            snapshot = None
+            if index is not None:
+                snapshot = IndexSnapshot(self._with_pending(index), version or 'memory')
+            previous = self._install(snapshot)
+        if previous is not None or snapshot is not None:
+            logger.info(f"Vector index switched from {previous.version if previous else None} "
+                        f"to {snapshot.version if snapshot else None}")
+
+    def append(self, ids: List[str], embeddings, metadatas: List[Dict], documents: List[str]) -> List[str]:
+        """把新条目加入当前快照的增量段
+
+        已有的增量段直接复用，只对新条目编码；已在索引或增量段中的条目跳过。
+
+        Args:
+            ids (List[str]): 条目ID
+            embeddings: 原始维度的向量
+            metadatas (List[Dict]): 元数据
+            documents (List[str]): 文档
+
+        Returns:
+            List[str]: 实际加入的条目ID（没有加载本地索引时为空，查询直接走向量库）
+        """
+        with self._install_lock:
+            snapshot = self.current
+            if snapshot is None:
+                return []
+            index = snapshot.index
+            base = index.base if isinstance(index, LayeredIndex) else index
+            known = set(self._pending['ids']) | set(base.get(list(ids), include=['metadatas'])['ids'])
+            keep = []
+            for i, item_id in enumerate(ids):
+                if item_id not in known:
+                    known.add(item_id)
+                    keep.append(i)
+            if not keep:
+                return []
+            added = {
+                'ids': [ids[i] for i in keep],
+                'embeddings': [np.asarray(embeddings[i], dtype=np.float16) for i in keep],
+                'metadatas': [metadatas[i] for i in keep],
+                'documents': [documents[i] for i in keep]
+            }
+            for key, values in added.items():
+                self._pending[key].extend(values)
+            delta = index.delta if isinstance(index, LayeredIndex) else base.empty_like()
+            delta = delta.extended(added['ids'], np.asarray(added['embeddings'], dtype=np.float32),
+                                   added['metadatas'], added['documents'])
+            self._install(IndexSnapshot(LayeredIndex(base, delta), snapshot.version), notify=False)
+        logger.info(f"Appended {len(keep)} items to vector index version {snapshot.version} "
+                    f"({len(self._pending['ids'])} pending items)")
+        return added['ids']
+
+    def _with_pending(self, base: VectorIndex):
+        """为基础索引加上尚未包含在其中的新增条目（调用方持有 _install_lock）"""
+        if not self._pending['ids']:
+            return base
+        existing = set(base.ids)
+        keep = [i for i, item_id in enumerate(self._pending['ids']) if item_id not in existing]
+        self._pending = {key: [values[i] for i in keep] for key, values in self._pending.items()}
+        if not keep:
+            return base
+        delta = base.empty_like()
+        delta.add(
+            self._pending['ids'],
+            np.asarray(self._pending['embeddings'], dtype=np.float32),
+            self._pending['metadatas'],
+            self._pending['documents']
+        )
+        return LayeredIndex(base, delta)
+
+    def _install(self, snapshot: Optional[IndexSnapshot], notify: bool = True) -> Optional[IndexSnapshot]:
+        """替换当前快照并退役旧快照，返回旧快照；notify 为 False 时不调用 on_swap（只追加了增量段）"""
+        with self._lock:
+            previous, self.current = self.current, snapshot
+            drained = False
+            if previous is not None:
+                previous.retired = True
+                drained = previous.refcount == 0
+        if drained:
+            previous.release_resources()
+        if notify and self.on_swap is not None:
+            self.on_swap(snapshot)
+        return previous
+
+    def refresh(self) -> bool:
+        """CURRENT 指向的版本与当前快照不同时加载并切换
+
+        Returns:
+            bool: 是否切换了版本
+        """
+        if self.store is None:
+            return False
+        with self._refresh_lock:
+            version = self.store.current_version()
+            if version is None or version == self.version:
+                return False
+            try:
+                # 加载期间不持有快照锁，查询继续使用旧快照
+                index = self.store.load(version, mmap_rerank=self.mmap_rerank,
+                                        mmap_documents=self.mmap_documents)
+            except Exception as e:
+                logger.error(f"Error loading vector index version {version}: {str(e)}")
+                return False
+            self.swap(index, version)
+            return True
+
+    def _ensure_reloader(self):
+        """在当前进程中启动后台加载线程（fork 出的子进程不会继承父进程的线程，首次查询时重新启动）"""
+        reload = self.store is not None and self.reload_interval > 0
+        if (not reload and self.sync_interval <= 0) or self._thread_pid == os.getpid():
+            return
+        with self._thread_lock:
+            if self._thread_pid == os.getpid():
+                return
+            self._thread_pid = os.getpid()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._reload_loop, name='index-reloader', daemon=True)
+            self._thread.start()
+
+    def _reload_loop(self):
+        reload = self.store is not None and self.reload_interval > 0
+        interval = min(i for i in (self.reload_interval if reload else 0, self.sync_interval) if i > 0)
+        reloaded_at = time.monotonic()
+        while not self._stop.wait(interval):
+            if reload and time.monotonic() - reloaded_at >= self.reload_interval:
+                reloaded_at = time.monotonic()
+                try:
+                    self.refresh()
+                except Exception as e:
+                    logger.error(f"Error refreshing vector index: {str(e)}")
+            if self.sync_interval > 0:
+                try:
+                    self.sync()
+                except Exception as e:
+                    logger.error(f"Error running index sync: {str(e)}")
+
+    def stop(self):
+        self._stop.set()
@@ -0,0 +1,144 @@
+import ctypes
+import gc
+import logging
+import os
+import resource
+import sys
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+from utils.metrics import registry, registered_caches
+
+logger = logging.getLogger(__name__)
+
+try:
+    import psutil
+except ImportError:  # psutil 为可选依赖，未安装时读取 /proc 或 getrusage
+    psutil = None
+
+RESIDENT_MEMORY = registry.gauge('process_resident_memory_bytes', 'Resident set size of the process')
+MEMORY_BUDGET = registry.gauge('process_memory_budget_bytes', 'Declared resident set size budget (0 = unlimited)')
+MEMORY_RECLAIMS = registry.counter(
+    'memory_budget_reclaims_total', 'Cache trims triggered by exceeding the memory budget', ('outcome',))
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def rss_bytes() -> int:
+    """当前进程的常驻内存（字节）
+
+    依次尝试 psutil、/proc/self/statm；都不可用时返回 getrusage 的峰值常驻内存。
+    """
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # macOS 返回字节，Linux 返回 KB
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def deep_sizeof(obj, _seen: set = None) -> int:
+    """估算对象及其引用的容器、字符串、数组占用的字节数
+
+    按对象 id 去重，mmap 的数组不计入（页面由操作系统按需换入换出）。
+    """
+    seen = _seen if _seen is not None else set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    if isinstance(obj, np.memmap):
+        return 0
+    if isinstance(obj, np.ndarray):
+        return int(obj.nbytes) if obj.base is None else deep_sizeof(obj.base, seen)
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(k, seen) + deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(item, seen) for item in obj)
+    return size
+
+
+def cache_sizes(caches: Dict[str, object] = None) -> Dict[str, int]:
+    """已注册缓存（TTLCache）中条目占用的字节数"""
+    caches = caches if caches is not None else registered_caches()
+    sizes = {}
+    for name, cache in caches.items():
+        entries = getattr(cache, '_data', None)
+        sizes[name] = deep_sizeof(list(entries.values())) if entries is not None else 0
+    return sizes
+
+
+def release_free_memory():
+    """回收循环引用并把空闲的堆内存还给操作系统（glibc 的 malloc_trim，其他平台跳过）"""
+    gc.collect()
+    if sys.platform.startswith('linux'):
+        try:
+            ctypes.CDLL('libc.so.6').malloc_trim(0)
+        except (OSError, AttributeError):
+            pass
+
+
+class MemoryBudget:
+    """常驻内存预算
+
+    每隔 check_interval 秒检查一次进程的常驻内存，超过预算时按比例清理已注册的缓存
+    （最久未使用的条目先淘汰）并把空闲内存还给操作系统；仍然超出时只记录告警，
+    模型与索引的内存需要通过低内存模式的配置（量化模型、mmap 索引）在启动时降下来。
+    """
+
+    def __init__(self, budget_mb: float, check_interval: float = 10, trim_fraction: float = 0.5,
+                 caches: Callable[[], Dict[str, object]] = None):
+        """
+        Args:
+            budget_mb (float): 常驻内存预算（MB），0 表示不限制
+            check_interval (float): 两次检查的最小间隔（秒）
+            trim_fraction (float): 超出预算时每个缓存淘汰的条目比例
+            caches (Callable, optional): 返回待清理的缓存（名称 -> 缓存），默认为所有已注册的缓存
+        """
+        self.budget = int(budget_mb * 1024 * 1024)
+        self.check_interval = check_interval
+        self.trim_fraction = trim_fraction
+        self.caches = caches or registered_caches
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        RESIDENT_MEMORY.set_function(rss_bytes)
+        MEMORY_BUDGET.set(self.budget)
+
+    def maybe_check(self) -> Optional[bool]:
+        """距上次检查超过 check_interval 时检查一次，返回是否在预算内（未检查时返回 None）"""
+        if self.budget <= 0:
+            return None
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval or not self._lock.acquire(blocking=False):
+            return None
+        try:
+            self._checked_at = now
+            return self.check()
+        finally:
+            self._lock.release()
+
+    def check(self) -> bool:
+        """检查常驻内存，超出预算时清理缓存
+
+        Returns:
+            bool: 检查（及清理）后是否在预算内
+        """
+        rss = rss_bytes()
+        if self.budget <= 0 or rss <= self.budget:
+            return True
+        trimmed = sum(cache.trim(self.trim_fraction) for cache in self.caches().values())
+        release_free_memory()
+        after = rss_bytes()
+        within = after <= self.budget
+        MEMORY_RECLAIMS.inc(outcome='within_budget' if within else 'over_budget')
+        log = logger.info if within else logger.warning
+        log(f"Resident memory {rss / 2 ** 20:.0f}MB exceeded budget {self.budget / 2 ** 20:.0f}MB, "
+            f"trimmed {trimmed} cache entries, now {after / 2 ** 20:.0f}MB")
+        return within
+
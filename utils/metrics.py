@@ -0,0 +1,244 @@
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+
+# 默认的耗时分桶（秒）
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# 当前请求的各阶段耗时（毫秒），用于生成 Server-Timing 响应头
+_request_timings: contextvars.ContextVar = contextvars.ContextVar('request_timings', default=None)
+
+# 通过 register_cache 注册的缓存
+_caches: Dict[str, object] = {}
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = '') -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Counter:
+    """单调递增计数器"""
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            return [f'{self.name}{_format_labels(self.labels, key)} {value}' for key, value in self._values.items()]
+
+
+class Gauge:
+    """瞬时值，可以由回调函数在导出时计算"""
+    kind = 'gauge'
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._callbacks: Dict[Tuple[str, ...], Callable[[], float]] = {}
+        self._lock = threading.Lock()
+
+    def set(self, value: float, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labels)
+        with self._lock:
+            self._values[key] = value
+
+    def set_function(self, func: Callable[[], float], **labels):
+        """注册回调，导出时调用"""
+        key = tuple(str(labels.get(name, '')) for name in self.labels)
+        with self._lock:
+            self._callbacks[key] = func
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = dict(self._values)
+            callbacks = dict(self._callbacks)
+        for key, func in callbacks.items():
+            try:
+                values[key] = func()
+            except Exception:
+                continue
+        return [f'{self.name}{_format_labels(self.labels, key)} {value}' for key, value in values.items()]
+
+
+class Histogram:
+    """分桶直方图"""
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # [各分桶计数..., +Inf 计数, 总和]
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def samples(self) -> List[str]:
+        lines = []
+        with self._lock:
+            series_items = [(key, list(series)) for key, series in self._series.items()]
+        for key, series in series_items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), series[:-1]):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float('inf') else f'le="{bound}"'
+                lines.append(f'{self.name}_bucket{_format_labels(self.labels, key, le)} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(self.labels, key)} {series[-1]}')
+            lines.append(f'{self.name}_count{_format_labels(self.labels, key)} {cumulative}')
+        return lines
+
+
+class MetricsRegistry:
+    """指标注册表，以 Prometheus 文本格式导出
+
+    指标保存在进程内，多进程部署时每个工作进程分别导出自己的指标。
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name: str, *args, **kwargs):
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = cls(name, *args, **kwargs)
+            return self._metrics[name]
+
+    def counter(self, name: str, documentation: str, labels: Tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter, name, documentation, labels)
+
+    def gauge(self, name: str, documentation: str, labels: Tuple[str, ...] = ()) -> Gauge:
+        return self._register(Gauge, name, documentation, labels)
+
+    def histogram(self, name: str, documentation: str, labels: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram, name, documentation, labels, buckets)
+
+    def render(self) -> str:
+        """导出 Prometheus 文本格式"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+STAGE_SECONDS = registry.histogram(
+    'recommend_stage_seconds', 'Latency of each pipeline stage in seconds', ('stage',))
+BATCH_SIZE = registry.histogram(
+    'recommend_batch_size', 'Number of items per batch', ('operation',),
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512))
+CACHE_REQUESTS = registry.gauge(
+    'recommend_cache_requests', 'Cache lookups since process start', ('cache', 'result'))
+CACHE_HIT_RATIO = registry.gauge(
+    'recommend_cache_hit_ratio', 'Cache hit ratio since process start', ('cache',))
+QUEUE_DEPTH = registry.gauge(
+    'recommend_queue_depth', 'Tasks waiting in an executor queue', ('executor',))
+
+
+@contextmanager
+def timed(stage: str, timings: Optional[dict] = None, key: Optional[str] = None):
+    """记录一个阶段的耗时
+
+    耗时会写入直方图、当前请求的 Server-Timing 汇总，以及可选的 timings 字典（毫秒）。
+
+    Args:
+        stage (str): 阶段名称
+        timings (dict, optional): 额外写入的字典
+        key (str, optional): 写入 timings 时使用的键，默认为 stage
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.observe(elapsed, stage=stage)
+        collector = _request_timings.get()
+        if collector is not None:
+            collector[stage] = collector.get(stage, 0.0) + elapsed * 1000
+        if timings is not None:
+            timings[key or stage] = elapsed * 1000
+
+
+def observe_batch(operation: str, size: int):
+    """记录批处理大小"""
+    BATCH_SIZE.observe(size, operation=operation)
+
+
+def register_cache(name: str, cache):
+    """注册缓存的命中率指标，cache 需要提供 hits / misses 属性
+
+    注册的缓存同时用于内存统计，超出内存预算时按比例清理（见 utils.memory.MemoryBudget）。
+    """
+    _caches[name] = cache
+    CACHE_REQUESTS.set_function(lambda: cache.hits, cache=name, result='hit')
+    CACHE_REQUESTS.set_function(lambda: cache.misses, cache=name, result='miss')
+    CACHE_HIT_RATIO.set_function(
+        lambda: cache.hits / (cache.hits + cache.misses) if cache.hits + cache.misses else 0.0, cache=name)
+
+
+def registered_caches() -> Dict[str, object]:
+    """已注册的缓存（名称 -> 缓存）"""
+    return dict(_caches)
+
+
+def register_executor(name: str, executor):
+    """注册线程池的排队深度指标"""
+    QUEUE_DEPTH.set_function(lambda: executor._work_queue.qsize(), executor=name)
+
+
+def start_request_timing():
+    """开始收集当前请求的阶段耗时，返回用于恢复的 token"""
+    return _request_timings.set({})
+
+
+def finish_request_timing(token) -> Dict[str, float]:
+    """结束收集并返回当前请求的阶段耗时（毫秒）"""
+    timings = _request_timings.get() or {}
+    _request_timings.reset(token)
+    return timings
+
+
+def server_timing_header(timings: Dict[str, float]) -> str:
+    """生成 Server-Timing 响应头"""
+    return ', '.join(f'{stage.replace(".", "_")};dur={duration:.2f}' for stage, duration in timings.items())
+
+
+def submit_with_context(executor, func, *args, **kwargs):
+    """提交任务到线程池，并把当前上下文（包括请求耗时收集器）带到工作线程"""
+    context = contextvars.copy_context()
+    return executor.submit(context.run, func, *args, **kwargs)
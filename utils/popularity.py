@@ -0,0 +1,253 @@
+import hashlib
+import heapq
+import math
+import struct
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from utils.metrics import registry
+
+POPULARITY_EVENTS = registry.counter(
+    'popularity_events_total', 'Behavior events aggregated into popularity counts', ('origin',))
+
+# 衰减计数相对基准时间最多放大 2^64 倍，超过后整体换算到新的基准时间
+_RESCALE_HALF_LIVES = 64
+
+
+class CountMinSketch:
+    """Count-Min Sketch
+
+    用 depth 行、每行 width 个计数器近似统计任意多个键的计数，估计值只会偏大不会偏小，
+    内存固定为 depth * width 个 float64，与条目数量无关。
+    """
+
+    def __init__(self, width: int = 65536, depth: int = 4):
+        self.width = max(int(width), 1)
+        self.depth = max(int(depth), 1)
+        self.table = np.zeros((self.depth, self.width), dtype=np.float64)
+        self._rows = np.arange(self.depth)
+
+    def _columns(self, key: str) -> List[int]:
+        # 双重哈希：h1 + i * h2，与 BloomFilter 相同
+        digest = hashlib.blake2b(str(key).encode('utf-8'), digest_size=16).digest()
+        h1, h2 = struct.unpack('<QQ', digest)
+        return [(h1 + i * h2) % self.width for i in range(self.depth)]
+
+    def add(self, key: str, value: float) -> float:
+        """累加计数，返回累加后的估计值"""
+        columns = self._columns(key)
+        self.table[self._rows, columns] += value
+        return float(self.table[self._rows, columns].min())
+
+    def estimate(self, key: str) -> float:
+        return float(self.table[self._rows, self._columns(key)].min())
+
+    def scale(self, factor: float):
+        self.table *= factor
+
+
+class TopK:
+    """保留计数最大的 capacity 个键
+
+    计数只会增加（衰减统一体现在基准时间上），堆中被更新过的旧记录在弹出时跳过，
+    排序结果在下次变更前一直复用。
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = max(int(capacity), 1)
+        self.scores: Dict[str, float] = {}
+        self._heap: List[Tuple[float, str]] = []
+        self._ranking: Optional[List[Tuple[str, float]]] = None
+
+    def __len__(self):
+        return len(self.scores)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.scores
+
+    def offer(self, key: str, score: float) -> bool:
+        """更新键的计数，不在其中且计数不超过当前最小值时返回 False"""
+        if key not in self.scores and len(self.scores) >= self.capacity:
+            floor_score, floor_key = self._floor()
+            if score <= floor_score:
+                return False
+            heapq.heappop(self._heap)
+            del self.scores[floor_key]
+        self.scores[key] = score
+        heapq.heappush(self._heap, (score, key))
+        self._ranking = None
+        if len(self._heap) > 4 * self.capacity:
+            self._rebuild()
+        return True
+
+    def remove(self, key: str) -> Optional[float]:
+        score = self.scores.pop(key, None)
+        if score is not None:
+            self._ranking = None
+        return score
+
+    def _floor(self) -> Tuple[float, str]:
+        """当前最小的有效记录"""
+        while self._heap[0][0] != self.scores.get(self._heap[0][1]):
+            heapq.heappop(self._heap)
+        return self._heap[0]
+
+    def _rebuild(self):
+        self._heap = [(score, key) for key, score in self.scores.items()]
+        heapq.heapify(self._heap)
+
+    def ranking(self) -> List[Tuple[str, float]]:
+        """按计数降序排列的 (键, 计数)"""
+        if self._ranking is None:
+            self._ranking = sorted(self.scores.items(), key=lambda entry: entry[1], reverse=True)
+        return self._ranking
+
+    def scale(self, factor: float):
+        self.scores = {key: score * factor for key, score in self.scores.items()}
+        self._rebuild()
+        self._ranking = None
+
+
+class PopularityTracker:
+    """按行为事件流式聚合的条目热度
+
+    每个事件按行为类型加权后计入 Count-Min Sketch，事件的权重随时间指数衰减（半衰期 half_life_hours）。
+    采用前向衰减：事件按 2^((t - 基准时间) / 半衰期) 放大后累加，读取时统一乘以当前时间的衰减系数，
+    已有计数不需要随时间逐个更新。每种类型另外维护计数最大的 top_k 个条目，读取热门列表不需要扫描事件。
+
+    各类型的条目ID分别编号，条目键由调用方用 typed_item_key 生成（"类型:ID"）。类型未知的旧行为只能按ID计数，
+    这些计数只用于排序特征，不进入任何类型的热门列表。catalog 记录排序阶段见过的条目（条目键 -> 向量库ID、类型），
+    用于把热门列表中的条目键换算为向量库ID。
+    """
+
+    def __init__(self, half_life_hours: float = 24, width: int = 65536, depth: int = 4, top_k: int = 500,
+                 action_weights: Dict[str, float] = None, catalog_size: int = 50000):
+        """
+        Args:
+            half_life_hours (float): 热度半衰期（小时）
+            width (int): Count-Min Sketch 每行的计数器数量
+            depth (int): Count-Min Sketch 的行数（哈希函数个数）
+            top_k (int): 每种类型保留的热门条目数量
+            action_weights (Dict[str, float], optional): 各行为类型的权重，未列出的行为权重为 1
+            catalog_size (int): catalog 最多记录的条目数量
+        """
+        self.half_life = half_life_hours * 3600
+        self.rate = math.log(2) / self.half_life
+        self.action_weights = action_weights or {}
+        self.top_k = top_k
+        self.catalog_size = catalog_size
+        self.sketch = CountMinSketch(width, depth)
+        self.landmark = time.time()
+        self.events = 0
+        self._top: Dict[str, TopK] = {}
+        self._type_totals: Dict[str, float] = {}
+        self._catalog: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _decay(self, now: float = None) -> float:
+        """把放大后的计数换算到当前时间的系数"""
+        return math.exp(-self.rate * ((now or time.time()) - self.landmark))
+
+    def _rescale(self, landmark: float):
+        """把基准时间移到 landmark，避免放大系数溢出"""
+        factor = math.exp(-self.rate * (landmark - self.landmark))
+        self.sketch.scale(factor)
+        for top in self._top.values():
+            top.scale(factor)
+        self._type_totals = {t: total * factor for t, total in self._type_totals.items()}
+        self.landmark = landmark
+
+    def _top_for(self, item_type: str) -> TopK:
+        top = self._top.get(item_type)
+        if top is None:
+            top = self._top[item_type] = TopK(self.top_k)
+        return top
+
+    def record(self, item_key: str, action: str = None, timestamp: float = None, item_type: str = None,
+               origin: str = 'request'):
+        """记录一个行为事件
+
+        Args:
+            item_key (str): 条目键（typed_item_key 生成，类型未知时为行为记录中的 item_id）
+            action (str, optional): 行为类型，决定事件权重
+            timestamp (float, optional): 事件时间（Unix 时间戳），默认为当前时间
+            item_type (str, optional): 条目类型，未知时只计入计数，不进入热门列表
+            origin (str): 事件来源，用于监控指标（request 为本进程接收的事件，replay 为从数据库读取的事件）
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        weight = self.action_weights.get(action, 1.0)
+        with self._lock:
+            if timestamp - self.landmark > _RESCALE_HALF_LIVES * self.half_life:
+                self._rescale(timestamp)
+            value = weight * math.exp(self.rate * (timestamp - self.landmark))
+            count = self.sketch.add(item_key, value)
+            if item_type is not None:
+                self._type_totals[item_type] = self._type_totals.get(item_type, 0.0) + value
+                self._top_for(item_type).offer(item_key, count)
+            self.events += 1
+        POPULARITY_EVENTS.inc(origin=origin)
+
+    def scores(self, item_keys: Iterable[str], now: float = None) -> np.ndarray:
+        """条目当前的衰减热度（加权事件数）"""
+        with self._lock:
+            decay = self._decay(now)
+            return np.array([self.sketch.estimate(key) * decay for key in item_keys], dtype=np.float32)
+
+    def trending(self, item_type: str, n: int) -> List[Tuple[str, float]]:
+        """该类型当前最热门的 n 个条目
+
+        Returns:
+            List[Tuple[str, float]]: (条目键, 衰减热度)，按热度降序
+        """
+        with self._lock:
+            top = self._top.get(item_type)
+            if top is None:
+                return []
+            decay = self._decay()
+            return [(key, score * decay) for key, score in top.ranking()[:n]]
+
+    def type_popularity(self) -> Dict[str, float]:
+        """各类型的衰减热度总和"""
+        with self._lock:
+            decay = self._decay()
+            return {t: total * decay for t, total in self._type_totals.items()}
+
+    def remember(self, item_keys: List[str], vector_ids: List[str], item_types: List[Optional[str]]):
+        """记录条目的向量库ID和类型
+
+        Args:
+            item_keys (List[str]): 条目键（typed_item_key 生成）
+            vector_ids (List[str]): 与 item_keys 对齐的向量库ID
+            item_types (List[str]): 与 item_keys 对齐的类型
+        """
+        with self._lock:
+            for key, vector_id, item_type in zip(item_keys, vector_ids, item_types):
+                if key is None or item_type is None:
+                    continue
+                self._catalog[key] = (vector_id, item_type)
+                self._catalog.move_to_end(key)
+            while len(self._catalog) > self.catalog_size:
+                self._catalog.popitem(last=False)
+
+    def vector_id(self, item_key: str) -> str:
+        """条目键对应的向量库ID，catalog 中没有时返回 item_key 本身（没有 id 字段的条目两者相同）"""
+        with self._lock:
+            return self._catalog.get(item_key, (item_key, None))[0]
+
+    def known_vector_id(self, item_key: str) -> Optional[str]:
+        """catalog 中记录的条目向量库ID，没有记录时为 None"""
+        with self._lock:
+            entry = self._catalog.get(item_key)
+            return entry[0] if entry is not None else None
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'events': self.events,
+                'catalog': len(self._catalog),
+                'trending': {str(t): len(top) for t, top in self._top.items()}
+            }
@@ -0,0 +1,228 @@
+import hashlib
+import logging
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from utils.cache import TTLCache
+from utils.metrics import timed, register_cache
+from utils.vector_index import normalize
+
+logger = logging.getLogger(__name__)
+
+
+def weighted_kmeans(vectors: np.ndarray, weights: np.ndarray, k: int, iterations: int = 10) -> tuple:
+    """带权重的球面 k-means（余弦相似度）
+
+    初始中心按确定的方式选取：第一个为权重最大的向量，之后依次选取与已选中心最不相似的向量，
+    同一用户的画像每次计算结果一致。
+
+    Args:
+        vectors (np.ndarray): 已归一化的向量矩阵
+        weights (np.ndarray): 每个向量的权重
+        k (int): 聚类数量
+        iterations (int): 迭代次数上限
+
+    Returns:
+        tuple: (聚类中心矩阵, 每个聚类的权重之和)，按权重降序排列
+    """
+    k = min(k, len(vectors))
+    centers = [int(np.argmax(weights))]
+    closest = vectors @ vectors[centers[0]]
+    for _ in range(1, k):
+        candidate = int(np.argmin(closest))
+        centers.append(candidate)
+        closest = np.maximum(closest, vectors @ vectors[candidate])
+    centroids = vectors[centers]
+
+    assignment = None
+    for _ in range(iterations):
+        new_assignment = np.argmax(vectors @ centroids.T, axis=1)
+        if assignment is not None and np.array_equal(new_assignment, assignment):
+            break
+        assignment = new_assignment
+        for c in range(k):
+            members = assignment == c
+            if members.any():
+                centroids[c] = normalize(weights[members] @ vectors[members])
+
+    cluster_weights = np.bincount(assignment, weights=weights, minlength=k)
+    order = np.argsort(-cluster_weights)
+    return centroids[order], cluster_weights[order]
+
+
+class ProfileBuilder:
+    """由交互条目的向量汇总用户画像
+
+    拼接所有历史文本再编码会在 max_length 处截断，活跃用户的大部分历史被丢弃，且编码成本随文本长度增长。
+    这里逐条取交互条目的向量：由内容类型和内容ID 解析出向量库ID，优先读取向量库中已有的条目向量，
+    没有时编码该条行为的描述文本，三者都经过进程内缓存，按时间衰减和行为类型加权平均得到画像向量；历史足够多时再聚类为几个兴趣向量，
+    分别检索后合并候选。画像的成本与交互数量成正比，且大部分是缓存查找。
+    """
+
+    def __init__(self, embed_texts: Callable[[List[str]], List[np.ndarray]],
+                 fetch_item_vectors: Callable[[List[str]], Dict[str, np.ndarray]],
+                 resolve_vector_ids: Callable[[List[Tuple[str, Optional[str]]]], Dict[Tuple, str]] = None,
+                 max_events: int = 100, half_life_days: float = 14, action_weights: Dict[str, float] = None,
+                 n_interests: int = 1, min_events_per_interest: int = 5, min_interest_share: float = 0.0,
+                 kmeans_iterations: int = 10, cache_size: int = 10000, cache_ttl: float = 3600,
+                 miss_ttl: float = None):
+        """
+        Args:
+            embed_texts (Callable): 批量编码文本，如 EmbeddingService.get_batch_embeddings
+            fetch_item_vectors (Callable): 按向量库ID批量读取条目向量，返回 ID 到向量的映射（不存在的ID省略）
+            resolve_vector_ids (Callable, optional): 把行为记录中的 (内容ID, 内容类型) 批量解析为向量库ID，
+                返回键到向量库ID 的映射（解析不到的省略），默认向量库ID 与内容ID 相同
+            max_events (int): 最多使用的最近交互数量
+            half_life_days (float): 交互权重的时间半衰期（天）
+            action_weights (Dict[str, float], optional): 各行为类型的权重，未列出的行为权重为 1
+            n_interests (int): 兴趣向量数量上限，1 表示只生成一个画像向量
+            min_events_per_interest (int): 每个兴趣向量至少需要的交互数量
+            min_interest_share (float): 权重占比低于该值的兴趣向量被丢弃
+            kmeans_iterations (int): 聚类迭代次数上限
+            cache_size (int): 缓存的向量数量（float16 保存）
+            cache_ttl (float): 缓存有效期（秒）
+            miss_ttl (float, optional): 解析不到或向量库中没有的条目的缓存有效期（秒），默认与 cache_ttl 相同；
+                新导入的条目在该时间后即可使用条目向量
+        """
+        self.embed_texts = embed_texts
+        self.fetch_item_vectors = fetch_item_vectors
+        self.resolve_vector_ids = resolve_vector_ids or (lambda keys: {key: key[0] for key in keys})
+        self.max_events = max_events
+        self.half_life_days = half_life_days
+        self.action_weights = action_weights or {}
+        self.n_interests = n_interests
+        self.min_events_per_interest = min_events_per_interest
+        self.min_interest_share = min_interest_share
+        self.kmeans_iterations = kmeans_iterations
+        self.cache = TTLCache(max_size=cache_size, ttl=cache_ttl)
+        self.miss_ttl = cache_ttl if miss_ttl is None else miss_ttl
+        register_cache('profile_vectors', self.cache)
+
+    def build(self, user_behavior: List[Dict], now: datetime = None,
+              embed_texts: Callable[[List[str]], List[np.ndarray]] = None) -> List[np.ndarray]:
+        """生成画像向量
+
+        Args:
+            user_behavior (List[Dict]): 用户行为记录（按时间倒序，DatabaseService.get_user_behavior 的返回值）
+            now (datetime, optional): 计算时间衰减的当前时间
+            embed_texts (Callable, optional): 本次使用的文本编码函数（如提交到推理线程池），默认为构造时传入的函数
+
+        Returns:
+            List[np.ndarray]: 兴趣向量（已归一化），按权重降序；没有可用的交互时为空列表
+        """
+        events = (user_behavior or [])[:self.max_events]
+        if not events:
+            return []
+        with timed('profile.vectors'):
+            vectors = self._event_vectors(events, embed_texts or self.embed_texts)
+        kept = [i for i, vector in enumerate(vectors) if vector is not None]
+        if not kept:
+            return []
+
+        matrix = normalize(np.stack([vectors[i] for i in kept]))
+        weights = self._event_weights([events[i] for i in kept], now or datetime.now())
+        if weights.sum() <= 0:
+            weights = np.ones(len(kept), dtype=np.float32)
+
+        k = min(self.n_interests, len(kept) // max(self.min_events_per_interest, 1))
+        if k <= 1:
+            return [normalize(weights @ matrix)]
+        with timed('profile.cluster'):
+            centroids, cluster_weights = weighted_kmeans(matrix, weights, k, self.kmeans_iterations)
+        shares = cluster_weights / cluster_weights.sum()
+        return [centroids[c] for c in range(len(centroids)) if c == 0 or shares[c] >= self.min_interest_share]
+
+    def _event_weights(self, events: List[Dict], now: datetime) -> np.ndarray:
+        """按时间衰减和行为类型计算每条交互的权重"""
+        weights = []
+        for event in events:
+            weight = self.action_weights.get(event.get('action'), 1.0)
+            timestamp = event.get('timestamp')
+            if timestamp:
+                age_days = max((now - datetime.fromisoformat(timestamp)).total_seconds(), 0) / 86400
+                weight *= 0.5 ** (age_days / self.half_life_days)
+            weights.append(weight)
+        return np.asarray(weights, dtype=np.float32)
+
+    def _event_vectors(self, events: List[Dict], embed_texts: Callable) -> List[Optional[np.ndarray]]:
+        """每条交互对应的向量：条目向量优先，其次描述文本的编码，都没有时为 None"""
+        vectors: List[Optional[np.ndarray]] = [None] * len(events)
+        vector_ids = self._vector_ids([(str(event['item_id']), event.get('item_type'))
+                                       if event.get('item_id') is not None else None
+                                       for event in events])
+
+        # 1. 缓存中的条目向量
+        missing_ids = []
+        for i, vector_id in enumerate(vector_ids):
+            if vector_id is None:
+                continue
+            cached = self.cache.get(('item', vector_id))
+            if cached is not None:
+                # 空数组表示向量库中没有该条目
+                vectors[i] = cached.astype(np.float32) if cached.size else None
+            elif vector_id not in missing_ids:
+                missing_ids.append(vector_id)
+
+        # 2. 向量库中的条目向量（一次批量读取）
+        if missing_ids:
+            try:
+                fetched = self.fetch_item_vectors(missing_ids)
+                for vector_id in missing_ids:
+                    vector = fetched.get(vector_id)
+                    if vector is not None:
+                        self.cache.set(('item', vector_id), np.asarray(vector, dtype=np.float16))
+                    else:
+                        self.cache.set(('item', vector_id), np.zeros(0, dtype=np.float16), ttl=self.miss_ttl)
+            except Exception as e:
+                logger.error(f"Error fetching item vectors for profile: {str(e)}")
+                fetched = {}
+            for i, vector_id in enumerate(vector_ids):
+                if vectors[i] is None and vector_id in fetched:
+                    vectors[i] = np.asarray(fetched[vector_id], dtype=np.float32)
+
+        # 3. 向量库中没有的条目使用行为描述文本，未缓存的文本一次批量编码
+        texts = {}
+        for i, event in enumerate(events):
+            description = (event.get('description') or '').strip()
+            if vectors[i] is not None or not description:
+                continue
+            key = ('text', hashlib.md5(description.encode('utf-8')).hexdigest())
+            cached = self.cache.get(key)
+            if cached is not None:
+                vectors[i] = cached.astype(np.float32)
+            else:
+                texts.setdefault(key, (description, []))[1].append(i)
+        if texts:
+            embeddings = embed_texts([description for description, _ in texts.values()])
+            for (key, (_, positions)), embedding in zip(texts.items(), embeddings):
+                self.cache.set(key, np.asarray(embedding, dtype=np.float16))
+                for i in positions:
+                    vectors[i] = np.asarray(embedding, dtype=np.float32)
+        return vectors
+
+    def _vector_ids(self, keys: List[Optional[Tuple[str, Optional[str]]]]) -> List[Optional[str]]:
+        """每条交互的 (内容ID, 内容类型) 对应的向量库ID，解析不到时为 None；未缓存的键一次批量解析"""
+        resolved, missing = {}, []
+        for key in keys:
+            if key is None or key in resolved or key in missing:
+                continue
+            cached = self.cache.get(('vector_id',) + key)
+            if cached is None:
+                missing.append(key)
+            else:
+                # 空字符串表示解析不到
+                resolved[key] = cached or None
+        if missing:
+            try:
+                found = self.resolve_vector_ids(missing)
+            except Exception as e:
+                logger.error(f"Error resolving vector ids for profile: {str(e)}")
+                found = None
+            for key in missing:
+                vector_id = found.get(key) if found is not None else None
+                if found is not None:
+                    self.cache.set(('vector_id',) + key, vector_id or '', ttl=None if vector_id else self.miss_ttl)
+                resolved[key] = vector_id
+        return [resolved.get(key) if key is not None else None for key in keys]
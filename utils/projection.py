@@ -0,0 +1,103 @@
+import numpy as np
+import logging
+from pathlib import Path
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingProjector:
+    """嵌入向量降维投影（PCA / PCA 白化）
+
+    在索引构建时用语料训练，查询向量与条目向量必须使用同一个投影。
+    """
+
+    def __init__(self, n_components: int = 192, whiten: bool = False):
+        self.n_components = n_components
+        self.whiten = whiten
+        self.mean = None
+        self.components = None
+        self.scale = None
+
+    def fit(self, vectors: np.ndarray, sample_size: int = 50000, seed: int = 42) -> 'EmbeddingProjector':
+        """训练投影矩阵
+
+        Args:
+            vectors (np.ndarray): 语料向量
+            sample_size (int): 参与训练的最大样本数
+            seed (int): 采样随机种子
+
+        Returns:
+            EmbeddingProjector: 自身
+        """
+        from sklearn.decomposition import PCA
+
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if len(vectors) > sample_size:
+            rng = np.random.default_rng(seed)
+            vectors = vectors[rng.choice(len(vectors), sample_size, replace=False)]
+
+        n_components = min(self.n_components, vectors.shape[0], vectors.shape[1])
+        pca = PCA(n_components=n_components, whiten=self.whiten, random_state=seed)
+        pca.fit(vectors)
+
+        self.n_components = n_components
+        self.mean = pca.mean_.astype(np.float32)
+        self.components = pca.components_.astype(np.float32)
+        if self.whiten:
+            self.scale = (1.0 / np.sqrt(np.maximum(pca.explained_variance_, 1e-12))).astype(np.float32)
+        else:
+            self.scale = np.ones(n_components, dtype=np.float32)
+
+        logger.info(f"Fitted projection to {n_components} dims, "
+                    f"explained variance {pca.explained_variance_ratio_.sum():.3f}")
+        return self
+
+    def transform(self, vectors: np.ndarray) -> np.ndarray:
+        """将向量投影到低维空间"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        return ((vectors - self.mean) @ self.components.T) * self.scale
+
+    def get_state(self) -> Dict[str, np.ndarray]:
+        return {
+            'mean': self.mean,
+            'components': self.components,
+            'scale': self.scale,
+            'whiten': np.array(self.whiten)
+        }
+
+    def save(self, path: str):
+        """保存投影参数到 npz 文件"""
+        np.savez(Path(path), **self.get_state())
+
+    @classmethod
+    def load(cls, path: str) -> 'EmbeddingProjector':
+        """从 npz 文件加载投影参数"""
+        with np.load(Path(path)) as state:
+            projector = cls(n_components=state['components'].shape[0], whiten=bool(state['whiten']))
+            projector.mean = state['mean']
+            projector.components = state['components']
+            projector.scale = state['scale']
+        return projector
+
+
+def recall_at_k(full_vectors: np.ndarray, retrieved_ids, query_positions, k: int = 10) -> float:
+    """以全维度精确检索为基准，计算降维/压缩索引的 recall@k
+
+    Args:
+        full_vectors (np.ndarray): 全维度归一化向量
+        retrieved_ids: 每个查询在待评估索引上返回的行号列表
+        query_positions: 作为查询的向量行号
+        k (int): 评估的结果数量
+
+    Returns:
+        float: 平均召回率
+    """
+    if len(query_positions) == 0:
+        return 0.0
+    queries = full_vectors[query_positions]
+    similarities = queries @ full_vectors.T
+    k = min(k, full_vectors.shape[0])
+    truth = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+    hits = [len(set(t.tolist()) & set(list(r)[:k])) / k for t, r in zip(truth, retrieved_ids)]
+    return float(np.mean(hits))
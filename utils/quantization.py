@@ -0,0 +1,267 @@
+import numpy as np
+import logging
+from typing import Dict, Type
+
+logger = logging.getLogger(__name__)
+
+# 分块计算相似度时每块的行数，避免一次性解码整个索引
+SCORE_CHUNK_SIZE = 65536
+
+
+class VectorCodec:
+    """向量编码器基类
+
+    所有编码器都假定输入向量已做 L2 归一化，`scores` 返回内积（即余弦相似度）的近似值。
+    """
+    name = 'base'
+
+    def fit(self, vectors: np.ndarray) -> 'VectorCodec':
+        """根据语料训练编码参数（无参数的编码器直接返回自身）"""
+        return self
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    def scores(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """计算查询向量与所有编码向量的近似内积
+
+        Args:
+            codes (np.ndarray): 编码后的向量矩阵
+            query (np.ndarray): 归一化后的查询向量
+
+        Returns:
+            np.ndarray: float32 相似度数组
+        """
+        query = np.asarray(query, dtype=np.float32)
+        result = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), SCORE_CHUNK_SIZE):
+            chunk = self.decode(codes[start:start + SCORE_CHUNK_SIZE])
+            result[start:start + len(chunk)] = chunk @ query
+        return result
+
+    def bytes_per_vector(self, dim: int) -> int:
+        """每个向量占用的字节数"""
+        raise NotImplementedError
+
+    def get_state(self) -> Dict[str, np.ndarray]:
+        """导出编码参数，用于持久化"""
+        return {}
+
+    def set_state(self, state: Dict[str, np.ndarray]):
+        """加载编码参数"""
+        pass
+
+
+class Float32Codec(VectorCodec):
+    """不压缩，float32 存储"""
+    name = 'float32'
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        return np.asarray(vectors, dtype=np.float32)
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        return np.asarray(codes, dtype=np.float32)
+
+    def bytes_per_vector(self, dim: int) -> int:
+        return 4 * dim
+
+
+class Float16Codec(VectorCodec):
+    """半精度存储，内存减半，归一化向量的精度损失可以忽略"""
+    name = 'float16'
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        return np.asarray(vectors, dtype=np.float16)
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        return np.asarray(codes, dtype=np.float32)
+
+    def bytes_per_vector(self, dim: int) -> int:
+        return 2 * dim
+
+
+class Int8Codec(VectorCodec):
+    """逐维度的 8 位标量量化
+
+    x ≈ offset + scale * code，code 取值 0~255。
+    """
+    name = 'int8'
+
+    def __init__(self):
+        self.offset = None
+        self.scale = None
+
+    def fit(self, vectors: np.ndarray) -> 'Int8Codec':
+        vectors = np.asarray(vectors, dtype=np.float32)
+        low = vectors.min(axis=0)
+        high = vectors.max(axis=0)
+        self.offset = low
+        self.scale = np.maximum(high - low, 1e-8) / 255.0
+        return self
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        if self.offset is None:
+            raise ValueError("Int8Codec must be fitted before encoding")
+        vectors = np.asarray(vectors, dtype=np.float32)
+        codes = np.rint((vectors - self.offset) / self.scale)
+        return np.clip(codes, 0, 255).astype(np.uint8)
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        return self.offset + self.scale * np.asarray(codes, dtype=np.float32)
+
+    def scores(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        # x·q = offset·q + code·(scale*q)，无需解码整块向量
+        query = np.asarray(query, dtype=np.float32)
+        scaled_query = self.scale * query
+        bias = float(self.offset @ query)
+        result = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), SCORE_CHUNK_SIZE):
+            chunk = np.asarray(codes[start:start + SCORE_CHUNK_SIZE], dtype=np.float32)
+            result[start:start + len(chunk)] = chunk @ scaled_query + bias
+        return result
+
+    def bytes_per_vector(self, dim: int) -> int:
+        return dim
+
+    def get_state(self) -> Dict[str, np.ndarray]:
+        return {'offset': self.offset, 'scale': self.scale}
+
+    def set_state(self, state: Dict[str, np.ndarray]):
+        self.offset = np.asarray(state['offset'], dtype=np.float32)
+        self.scale = np.asarray(state['scale'], dtype=np.float32)
+
+
+def divisor_at_most(dim: int, limit: int) -> int:
+    """不超过 limit 的 dim 的最大约数（至少为 1）"""
+    for n in range(max(min(limit, dim), 1), 0, -1):
+        if dim % n == 0:
+            return n
+    return 1
+
+
+class ProductQuantizer(VectorCodec):
+    """乘积量化（PQ）
+
+    将向量切分为 `n_subspaces` 段，每段用 256 个聚类中心编码为 1 个字节，
+    查询时使用非对称距离（ADC）查表计算近似内积。
+    向量维度（降维后的维度）不能被 `n_subspaces` 整除时，训练时改用不超过它的最大约数。
+    """
+    name = 'pq'
+
+    def __init__(self, n_subspaces: int = 96, n_iter: int = 20, sample_size: int = 20000, seed: int = 42):
+        self.n_subspaces = n_subspaces
+        self.n_iter = n_iter
+        self.sample_size = sample_size
+        self.seed = seed
+        self.codebooks = None
+
+    def fit(self, vectors: np.ndarray) -> 'ProductQuantizer':
+        vectors = np.asarray(vectors, dtype=np.float32)
+        dim = vectors.shape[1]
+        if dim % self.n_subspaces != 0:
+            n_subspaces = divisor_at_most(dim, self.n_subspaces)
+            logger.warning(f"Dimension {dim} is not divisible by n_subspaces {self.n_subspaces}, "
+                           f"using {n_subspaces} subspaces")
+            self.n_subspaces = n_subspaces
+
+        rng = np.random.default_rng(self.seed)
+        if len(vectors) > self.sample_size:
+            vectors = vectors[rng.choice(len(vectors), self.sample_size, replace=False)]
+
+        sub_dim = dim // self.n_subspaces
+        n_centroids = min(256, len(vectors))
+        self.codebooks = np.zeros((self.n_subspaces, 256, sub_dim), dtype=np.float32)
+
+        for m in range(self.n_subspaces):
+            sub_vectors = vectors[:, m * sub_dim:(m + 1) * sub_dim]
+            centroids = self._kmeans(sub_vectors, n_centroids, rng)
+            self.codebooks[m, :n_centroids] = centroids
+            # 样本不足 256 时，多余的中心复制第一个，不会被编码选中
+            self.codebooks[m, n_centroids:] = centroids[0]
+        return self
+
+    def _kmeans(self, data: np.ndarray, k: int, rng) -> np.ndarray:
+        """简单的 Lloyd k-means"""
+        centroids = data[rng.choice(len(data), k, replace=False)].copy()
+        for _ in range(self.n_iter):
+            assignments = self._nearest(data, centroids)
+            counts = np.bincount(assignments, minlength=k)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignments, data)
+            non_empty = counts > 0
+            centroids[non_empty] = sums[non_empty] / counts[non_empty, None]
+        return centroids
+
+    @staticmethod
+    def _nearest(data: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        # ||x-c||² = ||x||² - 2x·c + ||c||²，||x||² 对排序无影响
+        distances = -2 * data @ centroids.T + (centroids ** 2).sum(axis=1)
+        return distances.argmin(axis=1)
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        if self.codebooks is None:
+            raise ValueError("ProductQuantizer must be fitted before encoding")
+        vectors = np.asarray(vectors, dtype=np.float32)
+        sub_dim = self.codebooks.shape[2]
+        codes = np.empty((len(vectors), self.n_subspaces), dtype=np.uint8)
+        for m in range(self.n_subspaces):
+            sub_vectors = vectors[:, m * sub_dim:(m + 1) * sub_dim]
+            codes[:, m] = self._nearest(sub_vectors, self.codebooks[m])
+        return codes
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        codes = np.asarray(codes)
+        parts = [self.codebooks[m][codes[:, m]] for m in range(self.n_subspaces)]
+        return np.concatenate(parts, axis=1)
+
+    def scores(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        query = np.asarray(query, dtype=np.float32)
+        sub_dim = self.codebooks.shape[2]
+        # 查找表：每个子空间中查询与 256 个中心的内积
+        table = np.einsum('mkd,md->mk', self.codebooks, query.reshape(self.n_subspaces, sub_dim))
+        result = np.zeros(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), SCORE_CHUNK_SIZE):
+            chunk = np.asarray(codes[start:start + SCORE_CHUNK_SIZE])
+            partial = np.zeros(len(chunk), dtype=np.float32)
+            for m in range(self.n_subspaces):
+                partial += table[m, chunk[:, m]]
+            result[start:start + len(chunk)] = partial
+        return result
+
+    def bytes_per_vector(self, dim: int) -> int:
+        return self.n_subspaces
+
+    def get_state(self) -> Dict[str, np.ndarray]:
+        return {'codebooks': self.codebooks}
+
+    def set_state(self, state: Dict[str, np.ndarray]):
+        self.codebooks = np.asarray(state['codebooks'], dtype=np.float32)
+        self.n_subspaces = self.codebooks.shape[0]
+
+
+CODECS: Dict[str, Type[VectorCodec]] = {
+    Float32Codec.name: Float32Codec,
+    Float16Codec.name: Float16Codec,
+    Int8Codec.name: Int8Codec,
+    ProductQuantizer.name: ProductQuantizer,
+}
+
+
+def create_codec(name: str, **kwargs) -> VectorCodec:
+    """根据名称创建编码器
+
+    Args:
+        name (str): float32 / float16 / int8 / pq
+        **kwargs: 编码器参数（目前仅 pq 使用）
+
+    Returns:
+        VectorCodec: 编码器实例
+    """
+    if name not in CODECS:
+        raise ValueError(f"Unknown vector storage '{name}'. Must be one of: {', '.join(CODECS)}")
+    if name == ProductQuantizer.name:
+        return ProductQuantizer(**kwargs)
+    return CODECS[name]()
@@ -0,0 +1,77 @@
+import json
+from typing import Any, Iterator
+
+try:
+    import orjson
+except ImportError:  # orjson 为可选依赖，未安装时使用标准库
+    orjson = None
+
+HAS_ORJSON = orjson is not None
+
+
+def loads(data) -> Any:
+    """解析 JSON（str 或 bytes），安装了 orjson 时使用 orjson
+
+    orjson 不接受 NaN / Infinity，解析失败时交给标准库（格式确实有误时由标准库抛出 ValueError）。
+    """
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(data)
+
+
+def dumps(obj: Any) -> bytes:
+    """序列化为 UTF-8 编码的紧凑 JSON
+
+    与标准库的 `json.dumps(obj, ensure_ascii=False, separators=(',', ':'))` 输出一致，
+    NumPy 标量等非标准类型需要调用方先转换。
+    """
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def iter_json_array(path: str, chunk_size: int = 1024 * 1024) -> Iterator[Any]:
+    """逐个读取 JSON 数组文件中的元素
+
+    按 chunk_size 个字符分块读取文件，每解析出一个元素就返回，
+    内存中只保留当前的块和正在解析的元素，而不是整个文件解析后的对象。
+
+    Raises:
+        ValueError: 文件内容不是 JSON 数组
+    """
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding='utf-8') as f:
+        buffer, position, started, eof = '', 0, False, False
+        while True:
+            # 跳过空白和元素之间的逗号
+            while position < len(buffer) and (buffer[position].isspace() or (started and buffer[position] == ',')):
+                position += 1
+            if position < len(buffer):
+                if not started:
+                    if buffer[position] != '[':
+                        raise ValueError(f"{path} is not a JSON array")
+                    started, position = True, position + 1
+                    continue
+                if buffer[position] == ']':
+                    return
+                try:
+                    item, end = decoder.raw_decode(buffer, position)
+                except json.JSONDecodeError:
+                    # 元素跨越了块的边界，读入下一块后重新解析
+                    if eof:
+                        raise
+                else:
+                    # 数字在块的边界处可能被截断（如 "12." 解析为 12），后面读到分隔符时元素才完整
+                    if eof or (end < len(buffer) and (buffer[end] in ',]' or buffer[end].isspace())):
+                        yield item
+                        position = end
+                        continue
+            elif eof:
+                raise ValueError(f"{path} ended before the JSON array was closed")
+            chunk = f.read(chunk_size)
+            eof = not chunk
+            buffer = buffer[position:] + chunk
+            position = 0
@@ -0,0 +1,408 @@
+import numpy as np
+import json
+import logging
+import mmap
+import os
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+from utils.quantization import VectorCodec, create_codec
+from utils.projection import EmbeddingProjector
+
+logger = logging.getLogger(__name__)
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """对向量做 L2 归一化（零向量保持不变）"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class MappedDocuments:
+    """以 mmap 方式读取的 documents.jsonl
+
+    只在内存中保存每行的起始偏移量，按位置读取时才解码对应的行，
+    文档内容由操作系统的页缓存按需换入换出，不占用进程的堆内存。
+    """
+
+    def __init__(self, path: str, chunk_size: int = 16 * 1024 * 1024):
+        self.path = str(path)
+        with open(self.path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+        # 分块查找换行符，避免一次性为整个文件创建临时数组
+        ends = [np.flatnonzero(np.frombuffer(self._data, dtype=np.uint8, count=min(chunk_size, size - start),
+                                             offset=start) == 0x0A) + start
+                for start in range(0, size, chunk_size)]
+        ends = np.concatenate(ends) if ends else np.zeros(0, dtype=np.int64)
+        self.offsets = np.concatenate([[0], ends + 1]).astype(np.int64)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        return self._data[self.offsets[i]:self.offsets[i + 1] - 1].decode('utf-8')
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+
+class VectorIndex:
+    """本地向量索引
+
+    以压缩格式（float16 / int8 / pq）在内存中保存向量，暴力扫描计算余弦相似度。
+    对有损编码（int8 / pq）可额外保存 float16 原始向量，在近似结果的前若干个候选上做精确重排；
+    重排向量和文档在加载时可以使用 mmap 留在磁盘上。
+
+    可选的降维投影（PCA）随索引一起保存，写入和查询时自动应用于输入的原始向量。
+
+    `query` 的参数与返回格式与 Chroma collection 保持一致，可作为其本地替代。
+    """
+
+    def __init__(self, dim: int = 768, storage: str = 'float16', rerank: bool = False,
+                 rerank_factor: int = 4, codec_params: Dict[str, Any] = None):
+        self.dim = dim
+        self.storage = storage
+        self.rerank = rerank
+        self.rerank_factor = rerank_factor
+        self.codec: VectorCodec = create_codec(storage, **(codec_params or {}))
+        self.codes: Optional[np.ndarray] = None
+        self.rerank_vectors: Optional[np.ndarray] = None
+        self.ids: List[str] = []
+        self.metadatas: List[Dict[str, Any]] = []
+        self.documents: List[str] = []
+        self.projector: Optional[EmbeddingProjector] = None
+        self.stats: Dict[str, Any] = {}
+        self._meta_columns: Dict[str, np.ndarray] = {}
+        self._positions: Optional[Dict[str, int]] = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def build(self, ids: List[str], embeddings, metadatas: List[Dict], documents: List[str],
+              projector: EmbeddingProjector = None):
+        """用完整语料训练编码器并构建索引
+
+        Args:
+            ids (List[str]): 条目ID
+            embeddings: 原始维度的向量
+            metadatas (List[Dict]): 元数据
+            documents (List[str]): 文档
+            projector (EmbeddingProjector, optional): 已训练的降维投影
+        """
+        self.projector = projector
+        if projector is not None:
+            self.dim = projector.n_components
+        vectors = self._prepare(embeddings)
+        self.codec.fit(vectors)
+        self.codes = None
+        self.rerank_vectors = None
+        self.ids, self.metadatas, self.documents = [], [], []
+        self._append(ids, vectors, metadatas, documents)
+
+    def add(self, ids: List[str], embeddings, metadatas: List[Dict], documents: List[str]):
+        """向已训练的索引追加向量"""
+        self._append(ids, self._prepare(embeddings), metadatas, documents)
+
+    def extended(self, ids: List[str], embeddings, metadatas: List[Dict], documents: List[str]) -> 'VectorIndex':
+        """返回追加了新向量的副本，本索引不变（只对新向量编码，已有的编码直接复制）"""
+        index = self.empty_like()
+        index.codes = self.codes
+        index.rerank_vectors = self.rerank_vectors
+        index.ids = list(self.ids)
+        index.metadatas = list(self.metadatas)
+        index.documents = list(self.documents)
+        index.add(ids, embeddings, metadatas, documents)
+        return index
+
+    def empty_like(self) -> 'VectorIndex':
+        """创建共用编码器和降维投影的空索引，追加的向量与本索引在同一空间中"""
+        index = VectorIndex(dim=self.dim, storage=self.storage, rerank=self.rerank, rerank_factor=self.rerank_factor)
+        index.codec = self.codec
+        index.projector = self.projector
+        return index
+
+    def _prepare(self, embeddings) -> np.ndarray:
+        """对原始向量做投影（如有）和归一化"""
+        vectors = np.atleast_2d(np.asarray(embeddings, dtype=np.float32))
+        if self.projector is not None:
+            vectors = self.projector.transform(vectors)
+        return normalize(vectors)
+
+    def _append(self, ids, vectors, metadatas, documents):
+        codes = self.codec.encode(vectors)
+        self.codes = codes if self.codes is None else np.concatenate([self.codes, codes])
+        if self.rerank:
+            rerank_vectors = vectors.astype(np.float16)
+            self.rerank_vectors = rerank_vectors if self.rerank_vectors is None \
+                else np.concatenate([self.rerank_vectors, rerank_vectors])
+        self.ids.extend(ids)
+        self.metadatas.extend(metadatas)
+        self.documents.extend(documents)
+        self._meta_columns = {}
+        self._positions = None
+
+    def _column(self, key: str) -> np.ndarray:
+        """按元数据字段缓存的列，用于向量化过滤"""
+        if key not in self._meta_columns:
+            self._meta_columns[key] = np.array([m.get(key) for m in self.metadatas], dtype=object)
+        return self._meta_columns[key]
+
+    def _mask(self, where: Optional[Dict]) -> Optional[np.ndarray]:
+        """将 Chroma 风格的 where 条件转换为布尔掩码，支持等值、$eq、$in、$gt、$gte 和 $and"""
+        if not where:
+            return None
+        mask = np.ones(len(self.ids), dtype=bool)
+        for key, condition in where.items():
+            if key == '$and':
+                for sub in condition:
+                    mask &= self._mask(sub)
+                continue
+            column = self._column(key)
+            if isinstance(condition, dict):
+                if '$in' in condition:
+                    mask &= np.isin(column, list(condition['$in']))
+                elif '$eq' in condition:
+                    mask &= column == condition['$eq']
+                elif '$gt' in condition or '$gte' in condition:
+                    # 缺少该字段的条目不满足条件
+                    present = np.array([value is not None for value in column], dtype=bool)
+                    values = np.where(present, column, 0).astype(np.float64)
+                    if '$gt' in condition:
+                        mask &= present & (values > condition['$gt'])
+                    else:
+                        mask &= present & (values >= condition['$gte'])
+                else:
+                    raise ValueError(f"Unsupported where operator: {condition}")
+            else:
+                mask &= column == condition
+        return mask
+
+    def query(self, query_embeddings, n_results: int = 10, where: Dict = None,
+              include: List[str] = None) -> Dict[str, List]:
+        """查询最相似的向量
+
+        Args:
+            query_embeddings: 查询向量列表
+            n_results (int): 每个查询返回的结果数量
+            where (Dict, optional): 元数据过滤条件
+            include (List[str], optional): 额外返回的字段，默认 documents/metadatas/distances
+
+        Returns:
+            Dict[str, List]: 与 Chroma 查询结果格式一致的字典，distances 为（投影空间中的）余弦距离
+        """
+        include = include or ['documents', 'metadatas', 'distances']
+        queries = self._prepare(query_embeddings)
+        results = {'ids': [], 'distances': [], 'documents': [], 'metadatas': [], 'embeddings': []}
+
+        if not self.ids:
+            for key in results:
+                results[key] = [[] for _ in queries]
+            return results
+
+        mask = self._mask(where)
+        candidates = np.flatnonzero(mask) if mask is not None else None
+
+        for query in queries:
+            indices, similarities = self._search(query, n_results, candidates)
+            results['ids'].append([self.ids[i] for i in indices])
+            results['distances'].append((1.0 - similarities).tolist())
+            results['documents'].append([self.documents[i] for i in indices])
+            results['metadatas'].append([self.metadatas[i] for i in indices])
+            if 'embeddings' in include:
+                results['embeddings'].append(self.get_vectors(indices))
+
+        for key in ('documents', 'metadatas', 'distances', 'embeddings'):
+            if key not in include:
+                results[key] = None
+        return results
+
+    def get(self, ids: List[str], include: List[str] = None) -> Dict[str, List]:
+        """按ID读取条目，返回格式与 Chroma collection.get 一致，不存在的ID直接跳过
+
+        Args:
+            ids (List[str]): 条目ID
+            include (List[str], optional): 返回的字段，默认 documents/metadatas
+        """
+        include = include or ['documents', 'metadatas']
+        if self._positions is None:
+            self._positions = {item_id: i for i, item_id in enumerate(self.ids)}
+        indices = [self._positions[item_id] for item_id in ids if item_id in self._positions]
+        return {
+            'ids': [self.ids[i] for i in indices],
+            'documents': [self.documents[i] for i in indices] if 'documents' in include else None,
+            'metadatas': [self.metadatas[i] for i in indices] if 'metadatas' in include else None,
+            'embeddings': self.get_vectors(indices) if 'embeddings' in include else None
+        }
+
+    def find(self, where: Dict) -> Dict[str, List]:
+        """按元数据条件查找条目，返回 ids 和 metadatas（与 Chroma collection.get(where=...) 的对应字段一致）"""
+        indices = np.flatnonzero(self._mask(where)) if self.ids else []
+        return {'ids': [self.ids[i] for i in indices], 'metadatas': [self.metadatas[i] for i in indices]}
+
+    def _search(self, query: np.ndarray, n_results: int, candidates: Optional[np.ndarray]):
+        codes = self.codes if candidates is None else self.codes[candidates]
+        if len(codes) == 0:
+            return np.array([], dtype=np.int64), np.array([], dtype=np.float32)
+
+        scores = self.codec.scores(codes, query)
+        use_rerank = self.rerank and self.rerank_vectors is not None
+        k = min(len(scores), n_results * self.rerank_factor if use_rerank else n_results)
+        if k <= 0:
+            return np.array([], dtype=np.int64), np.array([], dtype=np.float32)
+        top = np.argpartition(-scores, k - 1)[:k]
+        positions = top if candidates is None else candidates[top]
+
+        if use_rerank:
+            # 使用 float16 原始向量对近似候选做精确重排
+            exact = np.asarray(self.rerank_vectors[positions], dtype=np.float32) @ query
+            order = np.argsort(-exact)[:n_results]
+            return positions[order], exact[order]
+
+        order = np.argsort(-scores[top])[:n_results]
+        return positions[order], scores[top][order]
+
+    def get_vectors(self, indices) -> np.ndarray:
+        """返回指定位置的（近似）归一化向量"""
+        indices = np.asarray(indices, dtype=np.int64)
+        if self.rerank_vectors is not None:
+            return np.asarray(self.rerank_vectors[indices], dtype=np.float32)
+        return self.codec.decode(self.codes[indices])
+
+    def memory_usage(self) -> Dict[str, int]:
+        """估算各部分占用的字节数（mmap 的重排向量和文档只计入常驻的偏移量，文档按 UTF-8 编码的字节数计）"""
+        usage = {
+            'codes': int(self.codes.nbytes) if self.codes is not None else 0,
+            'rerank_vectors': 0,
+            'documents': sum(len(d.encode('utf-8')) for d in self.documents) if isinstance(self.documents, list)
+            else int(self.documents.offsets.nbytes),
+        }
+        if self.rerank_vectors is not None and not isinstance(self.rerank_vectors, np.memmap):
+            usage['rerank_vectors'] = int(self.rerank_vectors.nbytes)
+        return usage
+
+    def save(self, path: str):
+        """保存索引到目录"""
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        np.save(path / 'codes.npy', self.codes)
+        np.savez(path / 'codec.npz', **self.codec.get_state())
+        if self.rerank_vectors is not None:
+            np.save(path / 'rerank.npy', np.asarray(self.rerank_vectors))
+        if self.projector is not None:
+            self.projector.save(path / 'projection.npz')
+        with open(path / 'ids.json', 'w', encoding='utf-8') as f:
+            json.dump(self.ids, f)
+        with open(path / 'metadatas.json', 'w', encoding='utf-8') as f:
+            json.dump(self.metadatas, f, ensure_ascii=False)
+        with open(path / 'documents.jsonl', 'w', encoding='utf-8') as f:
+            for doc in self.documents:
+                f.write(doc.replace('\n', ' ') + '\n')
+        with open(path / 'meta.json', 'w', encoding='utf-8') as f:
+            json.dump({
+                'dim': self.dim,
+                'storage': self.storage,
+                'rerank': self.rerank,
+                'rerank_factor': self.rerank_factor,
+                'count': len(self.ids),
+                'stats': self.stats
+            }, f)
+        logger.info(f"Saved vector index with {len(self.ids)} items to {path}")
+
+    @classmethod
+    def load(cls, path: str, mmap_rerank: bool = True, mmap_documents: bool = False) -> 'VectorIndex':
+        """从目录加载索引
+
+        Args:
+            path (str): 索引目录
+            mmap_rerank (bool): 重排向量是否以 mmap 方式留在磁盘上
+            mmap_documents (bool): 文档是否以 mmap 方式留在磁盘上（见 MappedDocuments）
+        """
+        path = Path(path)
+        with open(path / 'meta.json', 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+
+        index = cls(dim=meta['dim'], storage=meta['storage'], rerank=meta['rerank'],
+                    rerank_factor=meta['rerank_factor'])
+        with np.load(path / 'codec.npz') as state:
+            index.codec.set_state(dict(state))
+        index.codes = np.load(path / 'codes.npy')
+        index.stats = meta.get('stats', {})
+        if os.path.exists(path / 'projection.npz'):
+            index.projector = EmbeddingProjector.load(path / 'projection.npz')
+        if os.path.exists(path / 'rerank.npy'):
+            index.rerank_vectors = np.load(path / 'rerank.npy', mmap_mode='r' if mmap_rerank else None)
+        with open(path / 'ids.json', 'r', encoding='utf-8') as f:
+            index.ids = json.load(f)
+        with open(path / 'metadatas.json', 'r', encoding='utf-8') as f:
+            index.metadatas = json.load(f)
+        if mmap_documents:
+            index.documents = MappedDocuments(path / 'documents.jsonl')
+        else:
+            with open(path / 'documents.jsonl', 'r', encoding='utf-8') as f:
+                index.documents = [line.rstrip('\n') for line in f]
+        logger.info(f"Loaded vector index with {len(index.ids)} items from {path}")
+        return index
+
+
+class LayeredIndex:
+    """基础索引加增量段的组合视图
+
+    基础索引是发布的不可变版本，增量段保存之后通过接口新增的条目，查询时分别检索后按距离合并。
+    query / get 的参数与返回格式与 VectorIndex 一致。
+    """
+
+    def __init__(self, base: VectorIndex, delta: VectorIndex):
+        self.base = base
+        self.delta = delta
+
+    def __len__(self):
+        return len(self.base) + len(self.delta)
+
+    def query(self, query_embeddings, n_results: int = 10, where: Dict = None,
+              include: List[str] = None) -> Dict[str, List]:
+        include = include or ['documents', 'metadatas', 'distances']
+        inner = list(set(include) | {'distances'})
+        layers = [
+            self.base.query(query_embeddings, n_results, where, inner),
+            self.delta.query(query_embeddings, n_results, where, inner)
+        ]
+        results = {'ids': [], 'distances': [], 'documents': [], 'metadatas': [], 'embeddings': []}
+        for q in range(len(layers[0]['ids'])):
+            rows = sorted(
+                ((distance, layer, j) for layer in layers for j, distance in enumerate(layer['distances'][q])),
+                key=lambda row: row[0]
+            )[:n_results]
+            for key in ('ids', 'distances', 'documents', 'metadatas'):
+                if key == 'ids' or key in include:
+                    results[key].append([layer[key][q][j] for _, layer, j in rows])
+            if 'embeddings' in include:
+                results['embeddings'].append(
+                    np.array([layer['embeddings'][q][j] for _, layer, j in rows], dtype=np.float32)
+                    .reshape(len(rows), self.base.dim)
+                )
+        for key in ('documents', 'metadatas', 'distances', 'embeddings'):
+            if key not in include:
+                results[key] = None
+        return results
+
+    def get(self, ids: List[str], include: List[str] = None) -> Dict[str, List]:
+        include = include or ['documents', 'metadatas']
+        first = self.base.get(ids, include)
+        found = set(first['ids'])
+        second = self.delta.get([item_id for item_id in ids if item_id not in found], include)
+        results = {'ids': first['ids'] + second['ids']}
+        for key in ('documents', 'metadatas'):
+            results[key] = first[key] + second[key] if key in include else None
+        results['embeddings'] = None
+        if 'embeddings' in include:
+            results['embeddings'] = np.concatenate([first['embeddings'], second['embeddings']])
+        return results
+
+    def find(self, where: Dict) -> Dict[str, List]:
+        first, second = self.base.find(where), self.delta.find(where)
+        return {key: first[key] + second[key] for key in first}
+
+    def memory_usage(self) -> Dict[str, int]:
+        base, delta = self.base.memory_usage(), self.delta.memory_usage()
+        return {key: base[key] + delta.get(key, 0) for key in base}
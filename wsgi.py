@@ -0,0 +1,4 @@
+from run import create_app
+
+# WSGI 入口：gunicorn -c gunicorn.conf.py wsgi:app
+app = create_app()
\ No newline at end of file